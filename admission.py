@@ -0,0 +1,196 @@
+"""
+Admission Control Module
+Per-client token-bucket rate limits and concurrency caps for expensive routes
+
+Each rule applies to one route template (e.g. "/files"):
+    rate           Requests per second per client (0 = unlimited)
+    burst          Requests a client may make at once (default: max(1, rate))
+    concurrency    Requests served at the same time across all clients (0 = unlimited)
+    queue_timeout  Seconds a request waits for a free slot before it is shed
+
+Requests over the rate get 429, requests that find no free slot in time
+get 503, both with Retry-After. Routes without a rule are never limited,
+so cheap endpoints keep their latency while heavy ones are throttled.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+RULE_FIELDS = ('rate', 'burst', 'concurrency', 'queue_timeout')
+
+# Default rules for the routes that hash files or scan the process table
+DEFAULT_RULES = {
+    '/files': {'rate': 5, 'burst': 10, 'concurrency': 2, 'queue_timeout': 2.0},
+    '/process/list': {'rate': 5, 'burst': 10, 'concurrency': 2, 'queue_timeout': 2.0},
+    '/process/status/<process_name>': {'rate': 10, 'burst': 20, 'concurrency': 4, 'queue_timeout': 2.0},
+    '/process/batch': {'rate': 1, 'burst': 3, 'concurrency': 1, 'queue_timeout': 5.0},
+}
+
+
+def validate_rules(rules):
+    """
+    Check rate limit rules.
+
+    Args:
+        rules: Maps route templates to rule dicts
+
+    Raises:
+        ValueError: If a rule is malformed
+    """
+    for route, rule in rules.items():
+        if not isinstance(rule, dict):
+            raise ValueError(f"rule for {route} must be an object")
+        for field, value in rule.items():
+            if field not in RULE_FIELDS:
+                raise ValueError(f"unknown field {field} in rule for {route}")
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                raise ValueError(f"{field} in rule for {route} must be a non-negative number")
+    return rules
+
+
+class Rejected(Exception):
+    """A request was not admitted."""
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Route:
+    """Limits and concurrency state of one route."""
+
+    def __init__(self, rule):
+        self.active = 0
+        self.condition = threading.Condition()
+        self.update(rule)
+
+    def update(self, rule):
+        self.rate = float(rule.get('rate', 0))
+        self.burst = float(rule.get('burst', max(1.0, self.rate)))
+        self.concurrency = int(rule.get('concurrency', 0))
+        self.queue_timeout = float(rule.get('queue_timeout', 0))
+
+
+class AdmissionControl:
+    """
+    Rate limiter and concurrency limiter for configured routes.
+    """
+
+    def __init__(self, rules=None, max_clients=10000):
+        """
+        Args:
+            rules: Maps route templates to rules (default: DEFAULT_RULES)
+            max_clients: Token buckets kept; the least recently used are dropped
+        """
+        self.max_clients = max_clients
+        self._routes = {}
+        self._buckets = OrderedDict()  # Maps (client, route) to [tokens, last refill]
+        self._lock = threading.Lock()
+        self.configure(DEFAULT_RULES if rules is None else rules)
+
+    def configure(self, rules):
+        """
+        Replace the rules; requests in flight keep their slots.
+
+        Args:
+            rules: Maps route templates to rules
+        """
+        validate_rules(rules)
+        with self._lock:
+            for route, rule in rules.items():
+                if route in self._routes:
+                    self._routes[route].update(rule)
+                else:
+                    self._routes[route] = _Route(rule)
+            for route in set(self._routes) - set(rules):
+                # Unlimited from now on; slots in flight are still released
+                self._routes[route].update({})
+            self._buckets.clear()
+
+    def limited(self, route):
+        """True if a route has a rule."""
+        state = self._routes.get(route)
+        return state is not None and (state.rate > 0 or state.concurrency > 0)
+
+    def admit(self, route, client):
+        """
+        Admit a request or raise Rejected.
+
+        A request that is admitted to a capped route holds a slot until
+        release() is called with the same route.
+
+        Args:
+            route: Route template
+            client: Client identifier (e.g. the remote address)
+
+        Returns:
+            bool: True if a slot was taken (release() required)
+
+        Raises:
+            Rejected: With status 429 (rate) or 503 (no free slot)
+        """
+        state = self._routes.get(route)
+        if state is None:
+            return False
+        if state.rate > 0:
+            self._take_token(state, route, client)
+        if state.concurrency <= 0:
+            return False
+
+        with state.condition:
+            deadline = time.monotonic() + state.queue_timeout
+            while state.active >= state.concurrency:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Rejected(503, 'concurrency', max(1, math.ceil(state.queue_timeout)))
+                state.condition.wait(remaining)
+            state.active += 1
+        return True
+
+    def _take_token(self, state, route, client):
+        """Take one token from the client's bucket for a route."""
+        now = time.monotonic()
+        key = (client, route)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [state.burst, now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(state.burst, bucket[0] + (now - bucket[1]) * state.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                raise Rejected(429, 'rate', max(1, math.ceil((1 - bucket[0]) / state.rate)))
+            bucket[0] -= 1
+
+    def release(self, route):
+        """Free the slot taken by admit()."""
+        state = self._routes[route]
+        with state.condition:
+            state.active -= 1
+            state.condition.notify()
+
+    def status(self):
+        """
+        Describe the rules and current load.
+
+        Returns:
+            dict: Maps routes to their limits and active requests
+        """
+        return {
+            route: {
+                'rate': state.rate,
+                'burst': state.burst,
+                'concurrency': state.concurrency,
+                'queue_timeout': state.queue_timeout,
+                'active': state.active
+            }
+            for route, state in self._routes.items()
+            if state.rate > 0 or state.concurrency > 0
+        }
@@ -0,0 +1,17 @@
+"""
+Python client for the Flask REST API
+
+    from api_client import Client
+
+    with Client() as client:
+        result = client.upload('firmware.bin')
+        client.download(result.filename, '/tmp/firmware.bin')
+        client.type_text('hello', wait=True)
+
+Command line: python -m api_client --help
+"""
+
+from api_client.client import RETRY_STATUSES, APIError, Client
+from api_client.models import (BatchResult, DownloadResult, FileInfo, KeyboardDevice, KeyboardJob, ProcessEvent,
+                               ProcessResult, ProcessStatus, UploadResult)
+from api_client.transfers import TransferError
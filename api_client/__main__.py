@@ -0,0 +1,3 @@
+from api_client.cli import main
+
+main()
@@ -0,0 +1,204 @@
+"""
+Command line client for the Flask REST API
+
+Usage:
+    python -m api_client [--url URL] COMMAND ...
+
+    python -m api_client upload firmware.bin logs.tar
+    python -m api_client download firmware.bin -o /tmp/firmware.bin
+    python -m api_client search log_ --min-size 1048576
+    python -m api_client type "hello" --wait
+    python -m api_client keys KEY_TAB KEY_ENTER
+    python -m api_client start -- chromium --kiosk http://localhost
+    python -m api_client output myapp --follow
+    python -m api_client events
+
+Results are printed as JSON. Errors are printed to stderr and exit with 1.
+"""
+
+import argparse
+import dataclasses
+import json
+import sys
+
+import requests
+
+from api_client.client import APIError, Client
+from api_client.transfers import TransferError
+
+
+def to_json(value):
+    """JSON-serializable form of results (models are printed as received)."""
+    if isinstance(value, list):
+        return [to_json(item) for item in value]
+    if dataclasses.is_dataclass(value):
+        return getattr(value, 'raw', None) or dataclasses.asdict(value)
+    return value
+
+
+def parse_params(pairs):
+    """Turn ['key=value', ...] into a dict."""
+    params = {}
+    for pair in pairs:
+        key, separator, value = pair.partition('=')
+        if not separator:
+            raise SystemExit(f"Expected key=value, got {pair!r}")
+        params[key] = value
+    return params
+
+
+def build_parser():
+    """Argument parser with one subcommand per operation."""
+    parser = argparse.ArgumentParser(prog='python -m api_client', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='API URL (default: FLASK_API_URL, local Unix socket or localhost:5000)')
+    parser.add_argument('--timeout', type=float, default=30, help='Seconds to wait for a response')
+    parser.add_argument('--retries', type=int, default=3, help='Retries of failed requests')
+    parser.add_argument('--workers', type=int, default=4, help='Parallel transfers')
+    parser.add_argument('--chunk-size', type=int, default=8, help='MiB per range of parallel downloads')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('info', help='API information')
+    commands.add_parser('health', help='Health check')
+    commands.add_parser('files', help='List stored files')
+    commands.add_parser('find', help='Find stored files by SHA256').add_argument('hash')
+    search = commands.add_parser('search', help='Find stored files by name prefix, size and modification time')
+    search.add_argument('prefix', nargs='?')
+    search.add_argument('--min-size', type=int)
+    search.add_argument('--max-size', type=int)
+    search.add_argument('--min-modified', type=float)
+    search.add_argument('--max-modified', type=float)
+    search.add_argument('--limit', type=int)
+
+    upload = commands.add_parser('upload', help='Upload files (in parallel)')
+    upload.add_argument('paths', nargs='+')
+    upload.add_argument('--no-verify', dest='verify', action='store_false', help='Skip hash verification')
+
+    download = commands.add_parser('download', help='Download a file')
+    download.add_argument('filename')
+    download.add_argument('-o', '--output', help='Local path (default: filename)')
+    download.add_argument('--no-verify', dest='verify', action='store_false', help='Skip hash verification')
+
+    for name, help_text in (('type', 'Type text'), ('keys', 'Press keys')):
+        command = commands.add_parser(name, help=help_text)
+        if name == 'type':
+            command.add_argument('text')
+        else:
+            command.add_argument('keys', nargs='+')
+        command.add_argument('--device')
+        command.add_argument('--delay', type=float)
+        command.add_argument('--layout')
+        command.add_argument('--wait', action='store_true', help='Wait until the input has been sent')
+
+    commands.add_parser('jobs', help='List keyboard jobs')
+    commands.add_parser('job', help='Show a keyboard job').add_argument('job_id')
+    commands.add_parser('cancel', help='Cancel a keyboard job').add_argument('job_id')
+    commands.add_parser('devices', help='List keyboard devices')
+    commands.add_parser('macros', help='List keyboard macros')
+    macro = commands.add_parser('macro', help='Run a keyboard macro')
+    macro.add_argument('name')
+    macro.add_argument('params', nargs='*', help='Placeholder values as key=value')
+    macro.add_argument('--device')
+    macro.add_argument('--wait', action='store_true')
+
+    start = commands.add_parser('start', help='Start a process')
+    start.add_argument('args', nargs='+', help='Command and arguments (after --)')
+    start.add_argument('--cwd')
+    start.add_argument('--capture', choices=('memory', 'file'), help='Capture stdout/stderr')
+    start.add_argument('--no-check-running', dest='check_running', action='store_false', default=None,
+                       help='Start even if a process with this name is running')
+    stop = commands.add_parser('stop', help='Stop a process')
+    stop.add_argument('process')
+    stop.add_argument('--scope', choices=('process', 'group', 'session'))
+    status = commands.add_parser('status', help='Show a process')
+    status.add_argument('process')
+    status.add_argument('--tree', action='store_true', help='Include descendants')
+    commands.add_parser('processes', help='List managed processes')
+    output = commands.add_parser('output', help='Show captured output')
+    output.add_argument('process')
+    output.add_argument('--offset', type=int, default=0)
+    output.add_argument('--follow', action='store_true', help='Print new lines as they are written')
+    events = commands.add_parser('events', help='Print process events as they happen')
+    events.add_argument('--process', action='append', default=[], help='Only this process (repeatable)')
+    return parser
+
+
+def run(client, args):
+    """Execute a parsed command; streaming commands print as they go."""
+    command = args.command
+    if command == 'info':
+        return client.info()
+    if command == 'health':
+        return client.health()
+    if command == 'files':
+        return client.files()
+    if command == 'find':
+        return client.find_by_hash(args.hash)
+    if command == 'search':
+        files, _ = client.search_files(args.prefix, args.min_size, args.max_size, args.min_modified,
+                                       args.max_modified, args.limit)
+        return files
+    if command == 'upload':
+        return client.upload_many(args.paths, verify=args.verify)
+    if command == 'download':
+        return client.download(args.filename, args.output, verify=args.verify)
+    if command in ('type', 'keys'):
+        options = {'device': args.device, 'delay': args.delay, 'layout': args.layout, 'wait': args.wait}
+        if command == 'type':
+            return client.type_text(args.text, **options)
+        return client.send_keys(args.keys, **options)
+    if command == 'jobs':
+        return client.keyboard_jobs()
+    if command == 'job':
+        return client.keyboard_job(args.job_id)
+    if command == 'cancel':
+        return client.cancel_keyboard_job(args.job_id)
+    if command == 'devices':
+        return client.keyboard_devices()
+    if command == 'macros':
+        return client.macros()
+    if command == 'macro':
+        return client.run_macro(args.name, parse_params(args.params), device=args.device, wait=args.wait)
+    if command == 'start':
+        return client.start_process(args.args, check_running=args.check_running, cwd=args.cwd,
+                                    capture_output=args.capture)
+    if command == 'stop':
+        return client.stop_process(args.process, args.scope)
+    if command == 'status':
+        return client.process_status(args.process, tree=args.tree)
+    if command == 'processes':
+        return client.processes()
+    if command == 'output':
+        if not args.follow:
+            return client.process_output(args.process, args.offset)
+        for line in client.follow_output(args.process, args.offset):
+            print(f"[{line['stream']}] {line['text']}", flush=True)
+        return None
+    if command == 'events':
+        for event in client.process_events(args.process):
+            print(json.dumps(event.raw), flush=True)
+        return None
+    raise SystemExit(f"Unknown command: {command}")
+
+
+def main(argv=None):
+    """Parse the command line, run the command and print its result."""
+    args = build_parser().parse_args(argv)
+    with Client(args.url, timeout=args.timeout, retries=args.retries, workers=args.workers,
+                chunk_size=args.chunk_size * 1024 * 1024) as client:
+        try:
+            result = run(client, args)
+        except APIError as ex:
+            print(json.dumps({'status': ex.status, **ex.payload}, indent=2), file=sys.stderr)
+            sys.exit(1)
+        except (TransferError, requests.RequestException, OSError) as ex:
+            print(f"Error: {ex}", file=sys.stderr)
+            sys.exit(1)
+        except KeyboardInterrupt:
+            sys.exit(130)
+    if result is not None:
+        print(json.dumps(to_json(result), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,425 @@
+"""
+API Client
+Client for the Flask REST API over pooled keep-alive connections
+
+Requests go through one requests.Session whose adapters keep up to
+pool_size connections per host (or Unix socket) open and retry with
+exponential backoff:
+
+    connection errors           every request, nothing was sent yet
+    429, 502, 503, 504          GET, PUT, DELETE and uploads (a file is
+                                stored under the same name again), after
+                                Retry-After when the server sends it
+
+Other POSTs (keyboard input, process control) are not repeated once they
+reached the server.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from urllib3.util.retry import Retry
+
+import unix_adapter
+from api_client import transfers
+from api_client.models import (BatchResult, DownloadResult, FileInfo, KeyboardDevice, KeyboardJob, ProcessEvent,
+                               ProcessResult, ProcessStatus, UploadResult)
+
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class APIError(Exception):
+    """The server answered with an error status."""
+
+    def __init__(self, status, payload):
+        """
+        Args:
+            status: HTTP status code
+            payload: Decoded JSON body (or {'error': text})
+        """
+        super().__init__(f"{status}: {payload.get('error', payload)}")
+        self.status = status
+        self.payload = payload
+
+    @classmethod
+    def from_response(cls, response):
+        """Build the error from a requests.Response."""
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {'error': response.text or response.reason}
+        if not isinstance(payload, dict):
+            payload = {'error': payload}
+        return cls(response.status_code, payload)
+
+
+def _options(**options):
+    """JSON body fields that were given."""
+    return {key: value for key, value in options.items() if value is not None}
+
+
+class Client:
+    """
+    Client for all endpoints; thread-safe, close() (or use as a context
+    manager) to release the connections.
+    """
+
+    def __init__(self, base_url=None, timeout=30, retries=3, backoff=0.5, pool_size=8, workers=4,
+                 chunk_size=8 * 1024 * 1024):
+        """
+        Args:
+            base_url: API URL, http:// or http+unix:// (default: the local
+                Unix socket if a server listens on it, else localhost:5000)
+            timeout: Seconds to wait for a response
+            retries: Attempts after the first one
+            backoff: Base of the exponential delay between attempts
+            pool_size: Connections kept open per host
+            workers: Parallel transfers (ranges of a download, files of
+                upload_many)
+            chunk_size: Bytes per range of parallel downloads
+        """
+        self.base_url = (base_url or unix_adapter.api_url()).rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.workers = workers
+        self.chunk_size = chunk_size
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries, backoff_factor=backoff,
+                      status_forcelist=RETRY_STATUSES, raise_on_status=False)
+        self.session = unix_adapter.session(pool_maxsize=max(pool_size, workers), max_retries=retry)
+
+    def close(self):
+        """Close the pooled connections."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _url(self, path):
+        return self.base_url + path
+
+    def _request(self, method, path, **kwargs):
+        """
+        Send a request.
+
+        Returns:
+            requests.Response: A response with a status below 400
+
+        Raises:
+            APIError: On error statuses (after retries)
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        response = self.session.request(method, self._url(path), **kwargs)
+        if response.status_code >= 400:
+            raise APIError.from_response(response)
+        return response
+
+    def _json(self, method, path, **kwargs):
+        return self._request(method, path, **kwargs).json()
+
+    def _retry_delay(self, response, attempt):
+        """Seconds before repeating a request the server turned away."""
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return int(retry_after)
+        return self.backoff * (2 ** attempt)
+
+    # Service
+
+    def info(self):
+        """API name, version and endpoints (GET /)."""
+        return self._json('GET', '/')
+
+    def health(self):
+        """Health and subsystem status (GET /health)."""
+        return self._json('GET', '/health')
+
+    # Files
+
+    def files(self):
+        """
+        List the stored files.
+
+        Returns:
+            list: FileInfo, newest first
+        """
+        return [FileInfo.from_dict(entry) for entry in self._json('GET', '/files')['files']]
+
+    def find_by_hash(self, file_hash):
+        """
+        Find the stored files with a SHA256.
+
+        Returns:
+            list: FileInfo ordered by name, empty if no file has the hash
+        """
+        try:
+            result = self._json('GET', f'/files/by-hash/{file_hash}')
+        except APIError as ex:
+            if ex.status == 404:
+                return []
+            raise
+        return [FileInfo.from_dict(entry) for entry in result['files']]
+
+    def search_files(self, prefix=None, min_size=None, max_size=None, min_modified=None, max_modified=None,
+                     limit=None):
+        """
+        Find stored files by name prefix, size and modification time.
+
+        Args:
+            prefix: File name prefix
+            min_size, max_size: Size range in bytes (inclusive)
+            min_modified, max_modified: Modification time range in seconds
+                since the epoch (inclusive)
+            limit: Maximum number of files (server default 100)
+
+        Returns:
+            tuple: (list of FileInfo, True if more files matched)
+        """
+        params = {'prefix': prefix, 'min_size': min_size, 'max_size': max_size, 'min_modified': min_modified,
+                  'max_modified': max_modified, 'limit': limit}
+        result = self._json('GET', '/files/search', params={k: v for k, v in params.items() if v is not None})
+        return [FileInfo.from_dict(entry) for entry in result['files']], result['truncated']
+
+    def upload(self, path, filename=None, algorithm='sha256', verify=True):
+        """
+        Upload a file, streamed from disk and hashed while it is sent.
+
+        Args:
+            path: Local file
+            filename: Name on the server (default: base name of path)
+            algorithm: Hash algorithm
+            verify: Have the server verify the hash (it removes the file
+                and answers 400 on a mismatch)
+
+        Returns:
+            UploadResult
+        """
+        body = transfers.StreamingUpload(path, filename, algorithm, verify)
+        for attempt in range(self.retries + 1):
+            response = self.session.post(self._url('/upload'), data=body, timeout=self.timeout,
+                                         headers={'Content-Type': body.content_type})
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                break
+            time.sleep(self._retry_delay(response, attempt))
+        if response.status_code >= 400:
+            raise APIError.from_response(response)
+        return UploadResult.from_dict(response.json())
+
+    def upload_many(self, paths, verify=True):
+        """
+        Upload several files at once over the pooled connections.
+
+        Args:
+            paths: Local files
+            verify: Have the server verify the hashes
+
+        Returns:
+            list: UploadResult in the order of paths
+        """
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            return list(pool.map(lambda path: self.upload(path, verify=verify), paths))
+
+    def download(self, filename, dest=None, verify=True):
+        """
+        Download a file; files larger than chunk_size are fetched in
+        parallel ranges.
+
+        Args:
+            filename: Name on the server
+            dest: Local path (default: filename in the current directory)
+            verify: Compare the SHA256 of the written file with X-File-Hash
+
+        Returns:
+            DownloadResult
+
+        Raises:
+            transfers.TransferError: If the hash does not match (the file is
+                removed) or the file changed during the download
+        """
+        dest = dest or filename
+        url = self._url(f"/download/{quote(filename, safe='')}")
+        try:
+            first, size = transfers.download(self.session, url, dest, self.chunk_size, self.workers, self.timeout)
+        except Exception as ex:
+            if os.path.exists(dest):
+                os.remove(dest)
+            if getattr(ex, 'response', None) is not None and ex.response.status_code >= 400:
+                raise APIError.from_response(ex.response) from None
+            raise
+        expected = first.headers.get('X-File-Hash')
+        actual = transfers.file_hash(dest) if verify or expected is None else None
+        if verify and expected and actual != expected:
+            os.remove(dest)
+            raise transfers.TransferError(f"Hash mismatch for {filename}: expected {expected}, got {actual}")
+        ranges = -(-size // self.chunk_size) if first.status_code == 206 else 1
+        return DownloadResult(filename, dest, size, actual or expected, bool(verify and expected), max(ranges, 1))
+
+    # Keyboard
+
+    def keyboard_input(self, text=None, keys=None, device=None, delay=None, gap=None, layout=None, wait=False,
+                       timeout=None):
+        """
+        Queue text and/or keys (POST /keyboard).
+
+        Returns:
+            KeyboardJob: Queued, or finished when wait is set
+        """
+        body = _options(text=text, keys=keys, device=device, delay=delay, gap=gap, layout=layout, wait=wait,
+                        timeout=timeout)
+        request_timeout = None if wait and timeout is None else self.timeout + (timeout or 0)
+        return KeyboardJob.from_dict(self._json('POST', '/keyboard', json=body, timeout=request_timeout))
+
+    def type_text(self, text, **options):
+        """Type text; options as for keyboard_input()."""
+        return self.keyboard_input(text=text, **options)
+
+    def send_keys(self, keys, **options):
+        """Press keys, e.g. ['KEY_ENTER']; options as for keyboard_input()."""
+        return self.keyboard_input(keys=list(keys), **options)
+
+    def keyboard_jobs(self):
+        """Queued, running and recently finished jobs of all devices."""
+        return [KeyboardJob.from_dict(job) for job in self._json('GET', '/keyboard/jobs')['jobs']]
+
+    def keyboard_job(self, job_id):
+        """A job by ID."""
+        return KeyboardJob.from_dict(self._json('GET', f"/keyboard/jobs/{quote(job_id, safe='')}"))
+
+    def cancel_keyboard_job(self, job_id):
+        """Cancel a queued or running job."""
+        return KeyboardJob.from_dict(self._json('DELETE', f"/keyboard/jobs/{quote(job_id, safe='')}"))
+
+    def keyboard_devices(self):
+        """The virtual keyboard devices."""
+        return [KeyboardDevice.from_dict(device) for device in self._json('GET', '/keyboard/devices')['devices']]
+
+    def macros(self):
+        """Stored macros (GET /keyboard/macros)."""
+        return self._json('GET', '/keyboard/macros')
+
+    def store_macro(self, name, source, layout=None):
+        """Compile and store a macro."""
+        return self._json('PUT', f"/keyboard/macro/{quote(name, safe='')}",
+                          json=_options(source=source, layout=layout))
+
+    def get_macro(self, name):
+        """A stored macro with its source."""
+        return self._json('GET', f"/keyboard/macro/{quote(name, safe='')}")
+
+    def delete_macro(self, name):
+        """Delete a stored macro."""
+        return self._json('DELETE', f"/keyboard/macro/{quote(name, safe='')}")
+
+    def run_macro(self, name, params=None, device=None, delay=None, gap=None, wait=False, timeout=None):
+        """
+        Queue a stored macro.
+
+        Returns:
+            KeyboardJob
+        """
+        body = _options(params=params, device=device, delay=delay, gap=gap, wait=wait, timeout=timeout)
+        request_timeout = None if wait and timeout is None else self.timeout + (timeout or 0)
+        return KeyboardJob.from_dict(self._json('POST', f"/keyboard/macro/{quote(name, safe='')}", json=body,
+                                                timeout=request_timeout))
+
+    # Processes
+
+    def start_process(self, command, check_running=None, cwd=None, env=None, capture_output=None, scheduling=None,
+                      thresholds=None):
+        """
+        Start a process (POST /process/start).
+
+        Args:
+            command: Command line string or argument list
+
+        Returns:
+            ProcessResult
+        """
+        body = _options(command=command, check_running=check_running, cwd=cwd, env=env,
+                        capture_output=capture_output, scheduling=scheduling, thresholds=thresholds)
+        return ProcessResult.from_dict(self._json('POST', '/process/start', json=body))
+
+    def stop_process(self, process, scope=None):
+        """
+        Stop a process (POST /process/stop).
+
+        Args:
+            process: Process name or command
+            scope: 'process', 'group' or 'session'
+
+        Returns:
+            ProcessResult
+        """
+        return ProcessResult.from_dict(self._json('POST', '/process/stop', json=_options(process=process, scope=scope)))
+
+    def batch(self, operations, max_workers=None):
+        """
+        Run start, stop and restart operations concurrently.
+
+        Returns:
+            BatchResult
+        """
+        body = _options(operations=operations, max_workers=max_workers)
+        return BatchResult.from_dict(self._json('POST', '/process/batch', json=body))
+
+    def process_status(self, name, tree=False, uss=False):
+        """State of a process."""
+        params = {'tree': 'true'} if tree else {}
+        if uss:
+            params['uss'] = 'true'
+        return ProcessStatus.from_dict(self._json('GET', f"/process/status/{quote(name, safe='')}", params=params))
+
+    def processes(self, tree=False):
+        """State of all managed processes."""
+        result = self._json('GET', '/process/list', params={'tree': 'true'} if tree else {})
+        return [ProcessStatus.from_dict(entry) for entry in result['processes']]
+
+    def process_output(self, name, offset=0, limit=None):
+        """Captured output lines from offset on."""
+        return self._json('GET', f"/process/output/{quote(name, safe='')}",
+                          params=_options(offset=offset, limit=limit))
+
+    def follow_output(self, name, offset=0):
+        """
+        Yield captured output lines as they are written.
+
+        Yields:
+            dict: Line with offset, stream and text
+        """
+        response = self._request('GET', f"/process/output/{quote(name, safe='')}", stream=True,
+                                 params={'offset': offset, 'follow': 'true'}, timeout=(self.timeout, None))
+        with response:
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def process_events(self, processes=(), last_event_id=None):
+        """
+        Yield process state events (server-sent events).
+
+        Args:
+            processes: Only events of these processes
+            last_event_id: Resume after this event
+
+        Yields:
+            ProcessEvent
+        """
+        params = {'process': list(processes)}
+        if last_event_id is not None:
+            params['last_event_id'] = last_event_id
+        response = self._request('GET', '/process/events', params=params, stream=True,
+                                 headers={'Accept': 'text/event-stream'}, timeout=(self.timeout, None))
+        with response:
+            data = []
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith('data:'):
+                    data.append(line[5:].strip())
+                elif not line and data:
+                    yield ProcessEvent.from_dict(json.loads('\n'.join(data)))
+                    data = []
@@ -0,0 +1,146 @@
+"""
+Client Models
+Typed views of the JSON returned by the API
+
+Every model keeps the complete response in `raw`, so fields added by newer
+servers stay reachable without a client update.
+"""
+
+import dataclasses
+from dataclasses import dataclass, field
+
+
+class Model:
+    """Base class building a dataclass from a response dict."""
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build the model from a JSON object.
+
+        Args:
+            data: Decoded response; unknown keys are only kept in raw
+
+        Returns:
+            An instance of the model
+        """
+        names = [item.name for item in dataclasses.fields(cls) if item.name != 'raw']
+        return cls(**{name: data.get(name) for name in names}, raw=data)
+
+
+@dataclass
+class FileInfo(Model):
+    """A stored file (GET /files)."""
+
+    filename: str
+    size: int
+    modified: float
+    hash: str
+    raw: dict = field(default_factory=dict, repr=False)
+
+
+@dataclass
+class UploadResult(Model):
+    """Result of POST /upload."""
+
+    filename: str
+    size: int
+    hash: str
+    algorithm: str
+    hash_verified: bool
+    raw: dict = field(default_factory=dict, repr=False)
+
+
+@dataclass
+class KeyboardJob(Model):
+    """A keyboard job (POST /keyboard, /keyboard/jobs)."""
+
+    FINISHED_STATES = ('completed', 'failed', 'cancelled')
+
+    job_id: str
+    device: str
+    status: str
+    progress: float
+    chars_total: int
+    chars_sent: int
+    keys_total: int
+    keys_sent: int
+    created: float
+    started: float
+    finished: float
+    error: str
+    raw: dict = field(default_factory=dict, repr=False)
+
+    @property
+    def done(self):
+        """True once the job has completed, failed or was cancelled."""
+        return self.status in self.FINISHED_STATES
+
+
+@dataclass
+class KeyboardDevice(Model):
+    """A virtual keyboard device (GET /keyboard/devices)."""
+
+    name: str
+    layout: str
+    queue_depth: int
+    current_job: str
+    raw: dict = field(default_factory=dict, repr=False)
+
+
+@dataclass
+class ProcessResult(Model):
+    """Result of starting or stopping a process."""
+
+    status: str
+    process: str
+    pid: int
+    message: str
+    raw: dict = field(default_factory=dict, repr=False)
+
+
+@dataclass
+class ProcessStatus(Model):
+    """State of a process (GET /process/status, /process/list)."""
+
+    process: str
+    running: bool
+    pid: int
+    status: str
+    cpu_percent: float
+    memory_mb: float
+    create_time: float
+    raw: dict = field(default_factory=dict, repr=False)
+
+
+@dataclass
+class BatchResult(Model):
+    """Result of POST /process/batch."""
+
+    results: list
+    count: int
+    succeeded: int
+    failed: int
+    raw: dict = field(default_factory=dict, repr=False)
+
+
+@dataclass
+class ProcessEvent(Model):
+    """A process state event (GET /process/events)."""
+
+    id: int
+    type: str
+    process: str
+    raw: dict = field(default_factory=dict, repr=False)
+
+
+@dataclass
+class DownloadResult:
+    """A downloaded file."""
+
+    filename: str
+    path: str
+    size: int
+    hash: str
+    hash_verified: bool
+    ranges: int
@@ -0,0 +1,167 @@
+"""
+Client Transfers
+Streaming uploads and parallel ranged downloads
+
+Uploads are sent as a multipart body generated from the file while it is
+read, so the file is never held in memory and is read once: the hash is
+computed on the way and sent as the last form field, after the file data,
+where the server verifies it against what it stored.
+
+Downloads of large files are split into byte ranges fetched over several
+pooled connections and written in place; servers that ignore Range get a
+plain streaming download.
+"""
+
+import hashlib
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+# Read and write size of streamed file data
+BLOCK_SIZE = 256 * 1024
+
+
+class TransferError(Exception):
+    """A transfer could not be completed as requested."""
+
+
+class StreamingUpload:
+    """
+    multipart/form-data body for POST /upload, hashing the file as it is
+    sent.
+
+    The body can be iterated more than once (a retry sends it again) and
+    has a known length, so it is sent with Content-Length.
+    """
+
+    def __init__(self, path, filename=None, algorithm='sha256', verify=True, block_size=BLOCK_SIZE):
+        """
+        Args:
+            path: File to upload
+            filename: Name on the server (default: base name of path)
+            algorithm: hashlib algorithm, also used by the server
+            verify: Send the hash for the server to verify
+            block_size: Bytes read per chunk
+        """
+        self.path = path
+        self.algorithm = algorithm
+        self.verify = verify
+        self.block_size = block_size
+        self.hexdigest = None
+        self.boundary = uuid.uuid4().hex
+        name = (filename or os.path.basename(path)).replace('"', '%22').replace('\r', '').replace('\n', '')
+        self._head = (
+            self._field('algorithm', algorithm)
+            + f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="file"; filename="{name}"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n'
+        ).encode()
+        digest_length = hashlib.new(algorithm).digest_size * 2
+        self._tail_length = len(self._tail('0' * digest_length))
+        self.size = os.path.getsize(path)
+
+    @property
+    def content_type(self):
+        """Content-Type header of the body."""
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def _field(self, name, value):
+        return f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+
+    def _tail(self, hexdigest):
+        fields = self._field('hash', hexdigest) if self.verify else ''
+        return f'\r\n{fields}--{self.boundary}--\r\n'.encode()
+
+    def __len__(self):
+        return len(self._head) + self.size + self._tail_length
+
+    def __iter__(self):
+        digest = hashlib.new(self.algorithm)
+        sent = 0
+        yield self._head
+        with open(self.path, 'rb') as f:
+            while sent < self.size:
+                chunk = f.read(min(self.block_size, self.size - sent))
+                if not chunk:
+                    raise TransferError(f"{self.path} shrank while it was uploaded")
+                digest.update(chunk)
+                sent += len(chunk)
+                yield chunk
+        self.hexdigest = digest.hexdigest()
+        yield self._tail(self.hexdigest)
+
+
+def file_hash(path, algorithm='sha256', block_size=BLOCK_SIZE):
+    """Hash a local file."""
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(block_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_stream(response, f, offset, expected):
+    """Write a response body at an offset; returns the bytes written."""
+    written = 0
+    for chunk in response.iter_content(BLOCK_SIZE):
+        os.pwrite(f.fileno(), chunk, offset + written)
+        written += len(chunk)
+    if expected is not None and written != expected:
+        raise TransferError(f"Expected {expected} bytes, received {written}")
+    return written
+
+
+def download(session, url, dest, chunk_size=8 * 1024 * 1024, workers=4, timeout=None):
+    """
+    Download a file, in parallel byte ranges if the server supports them.
+
+    The first range also returns the size, the ETag and the X-File-Hash of
+    the file; the remaining ranges are requested with If-Range so a file
+    replaced during the download is detected instead of mixed.
+
+    Args:
+        session: requests.Session (its pool should hold `workers` connections)
+        url: Download URL
+        dest: Local path, written in place
+        chunk_size: Bytes per range; files up to this size take one request
+        workers: Ranges fetched at once
+        timeout: requests timeout per request
+
+    Returns:
+        tuple: (first response, bytes written)
+
+    Raises:
+        TransferError: If the file changed or a range came back incomplete
+        requests.HTTPError: On error responses
+    """
+    first = session.get(url, headers={'Range': f'bytes=0-{chunk_size - 1}'}, stream=True, timeout=timeout)
+    first.raise_for_status()
+    with open(dest, 'wb') as f:
+        match = CONTENT_RANGE.fullmatch(first.headers.get('Content-Range', ''))
+        if first.status_code != 206 or match is None:
+            # Whole file (small, or Range not supported)
+            length = first.headers.get('Content-Length')
+            return first, _write_stream(first, f, 0, int(length) if length else None)
+
+        total = int(match.group(3))
+        f.truncate(total)
+        written = _write_stream(first, f, 0, int(match.group(2)) + 1)
+        validator = first.headers.get('ETag') or first.headers.get('Last-Modified')
+
+        def fetch(start):
+            end = min(start + chunk_size, total) - 1
+            headers = {'Range': f'bytes={start}-{end}'}
+            if validator:
+                headers['If-Range'] = validator
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise TransferError("File changed on the server during the download")
+                return _write_stream(response, f, start, end - start + 1)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            written += sum(pool.map(fetch, range(written, total, chunk_size)))
+    return first, written
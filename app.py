@@ -7,86 +7,434 @@ Provides endpoints for:
 """
 
 import os
+import json
+import time
+import threading
 import hashlib
 import logging
+import pstats
+import shutil
+import string
 from pathlib import Path
-from flask import Flask, request, jsonify, send_file
+from flask import Blueprint, Flask, Response, current_app, g, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import ClosingIterator
 
-# Import keyboard emulation module
-try:
-    from keyboard_emulator import KeyboardEmulator
-    KEYBOARD_AVAILABLE = True
-except ImportError:
-    KEYBOARD_AVAILABLE = False
-    logging.warning("Keyboard emulation not available - evdev module not found")
-
-# Import process manager module
-try:
-    from process_manager import ProcessManager
-    PROCESS_MANAGER_AVAILABLE = True
-except ImportError:
-    PROCESS_MANAGER_AVAILABLE = False
-    logging.warning("Process manager not available - psutil module not found")
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+import json_provider
+import log_pipeline
+import metrics
+import settings
+from admission import AdmissionControl, Rejected
+from drain import EXEMPT_ENVIRON_KEY, Drain, DrainMiddleware
+from file_index import FileIndex
+from profiling import RequestProfiler
+from response_cache import ResponseCache, cached
+from subsystems import Registry, module_available
+from worker_state import INTERNAL_ENVIRON_KEY, StateOwner
+
+# Handlers are installed by log_pipeline.configure() in create_app()
 logger = logging.getLogger(__name__)
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)
+# Optional dependencies; their modules are imported when the keyboard or
+# process subsystem is first used
+KEYBOARD_AVAILABLE = module_available('evdev')
+if not KEYBOARD_AVAILABLE:
+    logger.warning("Keyboard emulation not available - evdev module not found")
 
-# Configuration
-UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
-MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100 MB max file size
-ALLOWED_EXTENSIONS = set()  # Allow all extensions
+PROCESS_MANAGER_AVAILABLE = module_available('psutil')
+if not PROCESS_MANAGER_AVAILABLE:
+    logger.warning("Process manager not available - psutil module not found")
 
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+# Seconds to wait for `sudo reboot` to fail before assuming it works
+REBOOT_COMMAND_TIMEOUT = 30
 
-# Ensure upload folder exists
-Path(UPLOAD_FOLDER).mkdir(parents=True, exist_ok=True)
+# Routes are registered on the application built by create_app()
+api = Blueprint('api', __name__)
+
+# Process-wide subsystems, created on first use
+subsystems = Registry()
+process_cpu_affinity = None
+state_owner = None
+
+
+def keyboard_metrics(attribute):
+    """Read a value of every created keyboard device for /metrics."""
+    def collect():
+        keyboard_pool = subsystems.peek('keyboard_pool')
+        if keyboard_pool is None:
+            return {}
+        return {(device.name,): attribute(device) for device in keyboard_pool.list()}
+    return collect
 
-# Initialize keyboard emulator if available
-keyboard_emulator = None
-if KEYBOARD_AVAILABLE:
-    try:
-        keyboard_emulator = KeyboardEmulator()
-        logger.info("Keyboard emulator initialized successfully")
-    except Exception as e:
-        logger.error(f"Failed to initialize keyboard emulator: {e}")
 
-# Initialize process manager if available
-process_manager = None
-if PROCESS_MANAGER_AVAILABLE:
+metrics.REGISTRY.gauge(
+    'flask_keyboard_queue_depth', 'Keyboard jobs waiting per device', ('device',),
+    function=keyboard_metrics(lambda device: device.jobs.depth))
+metrics.REGISTRY.counter(
+    'flask_keyboard_events_total', 'Input events written to virtual keyboard devices', ('device',),
+    function=keyboard_metrics(lambda device: device.emulator.events_written))
+
+
+class MetricsMiddleware:
+    """
+    WSGI middleware counting requests per route, their duration (until the
+    response is closed, so streams count in full), in-flight requests and
+    downloads once they have been sent.
+    """
+    
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+    
+    def __call__(self, environ, start_response):
+        started = time.perf_counter()
+        status = []
+        
+        def capture_status(status_line, headers, exc_info=None):
+            status[:] = [status_line.split(' ', 1)[0]]
+            return start_response(status_line, headers, exc_info)
+        
+        def finish():
+            method = environ['REQUEST_METHOD']
+            route = environ.get('api.route', 'unmatched')
+            metrics.HTTP_REQUESTS.inc(1, (method, route, status[0] if status else '500'))
+            metrics.HTTP_DURATION.observe(time.perf_counter() - started, (method, route))
+            metrics.HTTP_IN_FLIGHT.dec()
+            if 'api.transfer' in environ:
+                record_transfer(*environ['api.transfer'])
+        
+        metrics.HTTP_IN_FLIGHT.inc()
+        try:
+            response = self.wsgi_app(environ, capture_status)
+        except BaseException:
+            finish()
+            raise
+        return ClosingIterator(response, finish)
+
+
+def register_subsystems(config):
+    """
+    Register the factories of the keyboard and process subsystems.
+    
+    Nothing is created or imported here; each subsystem is built by the
+    first request that needs it, in the process that serves it.
+    
+    Args:
+        config: Application config
+    """
+    def create_keyboard_pool():
+        from keyboard_layouts import load_layout_dir
+        from keyboard_pool import KeyboardPool
+        
+        if os.path.isdir(config['KEYBOARD_LAYOUT_FOLDER']):
+            load_layout_dir(config['KEYBOARD_LAYOUT_FOLDER'])
+        return KeyboardPool(
+            config['KEYBOARD_DEVICES'],
+            layout=config['KEYBOARD_LAYOUT'],
+            unicode_fallback=config['KEYBOARD_UNICODE_FALLBACK'],
+            max_history=config['KEYBOARD_JOB_HISTORY']
+        )
+    
+    def create_keyboard_macros():
+        from keyboard_macros import MacroStore
+        
+        keyboard_pool = subsystems.get('keyboard_pool')
+        if keyboard_pool is None:
+            raise RuntimeError('Keyboard devices not initialized')
+        return MacroStore(keyboard_pool.emulator, config['KEYBOARD_MACRO_FOLDER'])
+    
+    def create_input_channel():
+        from input_channel import InputChannel
+        
+        keyboard_pool = subsystems.get('keyboard_pool')
+        if keyboard_pool is None:
+            raise RuntimeError('Keyboard devices not initialized')
+        input_channel = InputChannel(keyboard_pool)
+        if config['INPUT_CHANNEL_PORT']:
+            input_channel.serve_tcp(config['INPUT_CHANNEL_HOST'], config['INPUT_CHANNEL_PORT'])
+        if config['INPUT_CHANNEL_SOCKET']:
+            input_channel.serve_unix(config['INPUT_CHANNEL_SOCKET'])
+        return input_channel
+    
+    def create_process_manager():
+        from process_manager import ProcessManager
+        
+        return ProcessManager(
+            output_dir=config['PROCESS_LOG_FOLDER'],
+            output_max_lines=config['PROCESS_OUTPUT_MAX_LINES'],
+            output_max_bytes=config['PROCESS_OUTPUT_MAX_BYTES'],
+            default_cpu_affinity=process_cpu_affinity,
+            event_history=config['PROCESS_EVENT_HISTORY']
+        )
+    
+    if config['KEYBOARD_ENABLED']:
+        subsystems.register('keyboard_pool', create_keyboard_pool, requires=('evdev',))
+        subsystems.register('keyboard_macros', create_keyboard_macros, requires=('evdev',))
+        subsystems.register('input_channel', create_input_channel, requires=('evdev',))
+    subsystems.register('process_manager', create_process_manager, requires=('psutil',))
+
+
+def pin_server(config):
+    """Pin the API server to its reserved cores; started processes get the rest."""
+    global process_cpu_affinity
+    
+    if not config['SERVER_CPU_AFFINITY'] or process_cpu_affinity is not None:
+        return
+    from process_scheduling import pin_current_process
+    
     try:
-        process_manager = ProcessManager()
-        logger.info("Process manager initialized successfully")
-    except Exception as e:
-        logger.error(f"Failed to initialize process manager: {e}")
+        _, process_cpu_affinity = pin_current_process(config['SERVER_CPU_AFFINITY'])
+    except (ValueError, OSError) as e:
+        logger.error("Failed to pin API server to CPUs %s: %s", config['SERVER_CPU_AFFINITY'], e)
+
+
+def start_subsystems(config):
+    """Register the subsystems and start those that must listen from the start."""
+    pin_server(config)
+    register_subsystems(config)
+    if config['KEYBOARD_ENABLED'] and (config['INPUT_CHANNEL_PORT'] or config['INPUT_CHANNEL_SOCKET']):
+        subsystems.get('input_channel')
+
+
+def wait_keyboard_idle(timeout):
+    """Wait for the jobs of the keyboard pool of this process, if it was created."""
+    keyboard_pool = subsystems.peek('keyboard_pool')
+    return keyboard_pool is None or keyboard_pool.wait_idle(timeout)
+
+
+def apply_settings(app, changed):
+    """Apply reloaded settings that are not read from app.config per request."""
+    log_pipeline.update(app.config)
+    profiler = app.extensions.get('profiler')
+    if profiler is not None:
+        profiler.max_files = app.config['PROFILE_MAX_FILES']
+        profiler.sample_rate = app.config['PROFILE_SAMPLE_RATE']
+        profiler.slowest = app.config['PROFILE_SLOWEST']
+    if 'RATE_LIMIT_ROUTES' in changed:
+        app.extensions['admission'].configure(changed['RATE_LIMIT_ROUTES'])
+    cache = app.extensions['response_cache']
+    cache.max_entries = app.config['CACHE_MAX_ENTRIES']
+    if 'CACHE_TTLS' in changed:
+        cache.configure(changed['CACHE_TTLS'])
+    else:
+        # Cached responses (e.g. /health) may show the old settings
+        cache.invalidate()
+
 
+def create_app(config=None):
+    """
+    Create the Flask application.
+    
+    Settings come from config.json and the environment (see settings.py);
+    reloadable ones are updated while the app runs. Subsystems are only
+    registered here and created on first use. With
+    STATE_SOCKET set (several worker processes), only the worker that wins
+    the state lock registers the keyboard and process subsystems; the
+    other workers forward /keyboard and /process requests to it.
+    
+    Args:
+        config: Optional dict overriding settings; these keys are never reloaded
+        
+    Returns:
+        Flask: The application
+    
+    Raises:
+        settings.ConfigError: If the config file or environment is invalid
+    """
+    global state_owner
+    
+    app = Flask(__name__)
+    CORS(app)
+    config_path = settings.config_path()
+    app.config.update(settings.load(config_path))
+    app.config.update(config or {})
+    log_pipeline.configure(app.config)
+    
+    # Ensure upload folder exists
+    Path(app.config['UPLOAD_FOLDER']).mkdir(parents=True, exist_ok=True)
+    
+    app.register_blueprint(api)
+    drain = Drain()
+    drain.add_waiter(wait_keyboard_idle)
+    app.extensions['drain'] = drain
+    app.wsgi_app = log_pipeline.RequestLogMiddleware(
+        MetricsMiddleware(DrainMiddleware(app.wsgi_app, drain)), app.config
+    )
+    app.extensions['admission'] = AdmissionControl(app.config['RATE_LIMIT_ROUTES'])
+    app.extensions['response_cache'] = ResponseCache(app.config['CACHE_TTLS'], app.config['CACHE_MAX_ENTRIES'])
+    app.extensions['file_index'] = FileIndex(
+        app.config['UPLOAD_FOLDER'],
+        lambda path: calculate_file_hash(path, buffer_size=app.config['HASH_BUFFER_SIZE'])
+    )
+    backend = json_provider.install(app, app.config['JSON_BACKEND'])
+    logger.debug("JSON backend: %s", backend)
+    
+    if app.config['PROFILING']:
+        app.extensions['profiler'] = RequestProfiler(
+            app.config['PROFILE_FOLDER'],
+            max_files=app.config['PROFILE_MAX_FILES'],
+            sample_rate=app.config['PROFILE_SAMPLE_RATE'],
+            slowest=app.config['PROFILE_SLOWEST']
+        )
+    
+    reloader = settings.ConfigReloader(app.config, config_path, pinned=config or (),
+                                       interval=app.config['CONFIG_WATCH_INTERVAL'])
+    reloader.add_listener(lambda changed: apply_settings(app, changed))
+    reloader.start()
+    app.extensions['config_reloader'] = reloader
+    
+    if not app.config['STATE_SOCKET']:
+        start_subsystems(app.config)
+        return app
+    
+    state_owner = StateOwner(app.config['STATE_SOCKET'])
+    if state_owner.acquire():
+        start_subsystems(app.config)
+        state_owner.serve(app)
+    else:
+        @app.before_request
+        def forward_stateful_request():
+            if state_owner.is_stateful(request.path):
+                return state_owner.forward(request)
+    return app
+
+
+def __getattr__(name):
+    """Create the module-level app on first access (e.g. "app:app")."""
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def calculate_file_hash(filepath, algorithm='sha256'):
-    """Calculate hash of a file."""
+
+def calculate_file_hash(filepath, algorithm='sha256', buffer_size=1024 * 1024):
+    """Calculate hash of a file, reading it into one reused buffer."""
+    started = time.perf_counter()
     hash_func = hashlib.new(algorithm)
-    with open(filepath, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b''):
-            hash_func.update(chunk)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    size = 0
+    with open(filepath, 'rb', buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            hash_func.update(view[:count])
+            size += count
+    elapsed = time.perf_counter() - started
+    metrics.HASH_BYTES.inc(size, (algorithm,))
+    metrics.HASH_DURATION.observe(elapsed, (algorithm,))
+    if elapsed > 0 and size:
+        metrics.HASH_THROUGHPUT.observe(size / elapsed, (algorithm,))
     return hash_func.hexdigest()
 
 
-def verify_hash(filepath, expected_hash, algorithm='sha256'):
+def upload_folder_version():
+    """Modification time of the upload folder, which changes when files are added or removed."""
+    try:
+        return os.stat(current_app.config['UPLOAD_FOLDER']).st_mtime_ns
+    except OSError:
+        return None
+
+
+def process_events_version():
+    """ID of the last process event, which changes when managed processes start or stop."""
+    process_manager = subsystems.peek('process_manager')
+    return process_manager.events.last_id if process_manager is not None else None
+
+
+def record_transfer(direction, size, started):
+    """Count the bytes and throughput of an upload or download."""
+    elapsed = time.perf_counter() - started
+    metrics.TRANSFER_BYTES.inc(size, (direction,))
+    if elapsed > 0 and size:
+        metrics.TRANSFER_THROUGHPUT.observe(size / elapsed, (direction,))
+
+
+@api.before_app_request
+def record_route():
+    """Label request metrics with the route template, not the raw path."""
+    if request.url_rule is not None:
+        request.environ['api.route'] = request.url_rule.rule
+
+
+@api.before_app_request
+def admit_request():
+    """Apply the rate limit and concurrency cap of the route, if it has any."""
+    admission = current_app.extensions['admission']
+    if (not current_app.config['RATE_LIMIT_ENABLED'] or request.url_rule is None
+            or request.environ.get(INTERNAL_ENVIRON_KEY)):
+        return None
+    route = request.url_rule.rule
+    if not admission.limited(route):
+        return None
+    if current_app.config['RATE_LIMIT_TRUST_FORWARDED'] and request.access_route:
+        client = request.access_route[0]
+    else:
+        client = request.remote_addr
+    try:
+        if admission.admit(route, client):
+            g.admission_route = route
+    except Rejected as ex:
+        metrics.ADMISSION_REJECTED.inc(1, (route, ex.reason))
+        response = jsonify({
+            'error': 'Too many requests' if ex.status == 429 else 'Server busy',
+            'retry_after': ex.retry_after
+        })
+        response.status_code = ex.status
+        response.headers['Retry-After'] = str(ex.retry_after)
+        return response
+    return None
+
+
+@api.teardown_app_request
+def release_admission(error=None):
+    """Free the concurrency slot taken by admit_request()."""
+    route = g.pop('admission_route', None)
+    if route is not None:
+        current_app.extensions['admission'].release(route)
+
+
+@api.before_app_request
+def start_profile():
+    """Profile the request if profiling is enabled and it is requested or sampled."""
+    profiler = current_app.extensions.get('profiler')
+    if profiler is not None:
+        g.profile = profiler.start(profiler.requested(request))
+
+
+def stop_profile():
+    """Stop a running request profile and return the stored file name."""
+    state = g.pop('profile', None)
+    if state is None:
+        return None
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    return current_app.extensions['profiler'].stop(state, request.method, route, request.path)
+
+
+@api.after_app_request
+def finish_profile(response):
+    """Name the stored profile in the response."""
+    name = stop_profile()
+    if name is not None:
+        response.headers['X-Profile-File'] = name
+    return response
+
+
+@api.teardown_app_request
+def abort_profile(error=None):
+    """Stop profiling requests that failed before after_request ran."""
+    stop_profile()
+
+
+def verify_hash(filepath, expected_hash, algorithm='sha256', buffer_size=1024 * 1024):
     """Verify file hash matches expected value."""
-    actual_hash = calculate_file_hash(filepath, algorithm)
+    actual_hash = calculate_file_hash(filepath, algorithm, buffer_size)
     return actual_hash.lower() == expected_hash.lower()
 
 
-@app.route('/')
+@api.route('/')
+@cached()
 def index():
     """Root endpoint - API information."""
     return jsonify({
@@ -97,23 +445,88 @@ def index():
             '/upload': 'POST - Upload file with hash verification',
             '/download/<filename>': 'GET - Download file',
             '/files': 'GET - List uploaded files',
-            '/keyboard': 'POST - Send keyboard input',
-            '/health': 'GET - Health check'
+            '/files/by-hash/<hash>': 'GET - Find files by SHA256',
+            '/files/search': 'GET - Find files by name prefix, size and modification time',
+            '/keyboard': 'POST - Queue keyboard input (returns job ID, wait=true blocks)',
+            '/keyboard/jobs/<job_id>': 'GET - Keyboard job progress, DELETE - Cancel job',
+            '/keyboard/devices': 'GET - List virtual keyboard devices',
+            '/keyboard/macros': 'GET - List stored keyboard macros',
+            '/keyboard/macro/<name>': 'PUT - Store macro, GET - Show macro, DELETE - Delete macro, POST - Run macro',
+            '/process/batch': 'POST - Run start/stop/restart operations concurrently',
+            '/process/events': 'GET - Stream process state events (SSE)',
+            '/process/output/<name>': 'GET - Captured process output (follow=true streams)',
+            '/health': 'GET - Health check',
+            '/metrics': 'GET - Prometheus metrics',
+            '/profiles': 'GET - Stored request profiles (profiling enabled)',
+            '/profiles/<name>': 'GET - Download a profile (format=text for a summary)'
         },
         'keyboard_emulation': KEYBOARD_AVAILABLE
     })
 
 
-@app.route('/health')
+@api.route('/health')
+@cached()
 def health():
     """Health check endpoint."""
     return jsonify({
         'status': 'healthy',
-        'keyboard_emulation': KEYBOARD_AVAILABLE
+        'keyboard_emulation': KEYBOARD_AVAILABLE,
+        'subsystems': subsystems.status(),
+        'config': current_app.extensions['config_reloader'].status(),
+        'admission': current_app.extensions['admission'].status(),
+        'cache': current_app.extensions['response_cache'].status(),
+        'file_index': current_app.extensions['file_index'].status(),
+        'logging': log_pipeline.status()
     })
 
 
-@app.route('/upload', methods=['POST'])
+@api.route('/metrics')
+def metrics_endpoint():
+    """Metrics in the Prometheus text format."""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@api.route('/profiles')
+def list_profiles():
+    """
+    List stored request profiles.
+    
+    Returns:
+        JSON with the on-demand profiles and the slowest sampled requests per route
+    """
+    profiler = current_app.extensions.get('profiler')
+    if profiler is None:
+        return jsonify({'error': 'Profiling not enabled'}), 404
+    return jsonify(profiler.list())
+
+
+@api.route('/profiles/<name>')
+def get_profile(name):
+    """
+    Download a stored profile.
+    
+    Query parameters:
+    - format: "prof" (pstats file, default) or "text" (summary)
+    - sort: pstats sort key for the summary (default: cumulative)
+    - limit: Functions shown in the summary (default: 40)
+    """
+    profiler = current_app.extensions.get('profiler')
+    if profiler is None:
+        return jsonify({'error': 'Profiling not enabled'}), 404
+    path = profiler.path(name)
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    if request.args.get('format') != 'text':
+        return send_file(path, as_attachment=True, download_name=name)
+    sort = request.args.get('sort', 'cumulative')
+    limit = request.args.get('limit', 40, type=int)
+    if sort not in pstats.Stats.sort_arg_dict_default:
+        return jsonify({'error': f'Unknown sort key: {sort}'}), 400
+    return Response(profiler.summary(path, sort, limit), content_type='text/plain; charset=utf-8')
+
+
+@api.route('/upload', methods=['POST'])
 def upload_file():
     """
     Upload a file with optional hash verification.
@@ -126,6 +539,7 @@ def upload_file():
     Returns:
         JSON response with upload status and file hash
     """
+    started = time.perf_counter()
     try:
         # Check if file is in request
         if 'file' not in request.files:
@@ -138,16 +552,23 @@ def upload_file():
         
         # Secure the filename
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+        
+        allowed = current_app.config['ALLOWED_EXTENSIONS']
+        extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+        if allowed and extension not in {ext.lower().lstrip('.') for ext in allowed}:
+            return jsonify({'error': 'File type not allowed', 'allowed_extensions': allowed}), 400
         
         # Save the file
         file.save(filepath)
-        logger.info(f"File saved: {filename}")
+        current_app.extensions['response_cache'].invalidate('/files')
+        record_transfer('upload', os.path.getsize(filepath), started)
+        logger.info("File saved: %s", filename)
         
         # Calculate file hash
         algorithm = request.form.get('algorithm', 'sha256')
         try:
-            file_hash = calculate_file_hash(filepath, algorithm)
+            file_hash = calculate_file_hash(filepath, algorithm, current_app.config['HASH_BUFFER_SIZE'])
         except Exception as e:
             os.remove(filepath)
             return jsonify({'error': f'Hash calculation failed: {str(e)}'}), 500
@@ -157,7 +578,7 @@ def upload_file():
         hash_verified = None
         
         if expected_hash:
-            hash_verified = verify_hash(filepath, expected_hash, algorithm)
+            hash_verified = verify_hash(filepath, expected_hash, algorithm, current_app.config['HASH_BUFFER_SIZE'])
             if not hash_verified:
                 os.remove(filepath)
                 return jsonify({
@@ -165,7 +586,9 @@ def upload_file():
                     'expected_hash': expected_hash,
                     'actual_hash': file_hash
                 }), 400
-            logger.info(f"Hash verified successfully for {filename}")
+            logger.info("Hash verified successfully for %s", filename)
+        
+        current_app.extensions['file_index'].add(filename, file_hash if algorithm.lower() == 'sha256' else None)
         
         return jsonify({
             'message': 'File uploaded successfully',
@@ -177,11 +600,11 @@ def upload_file():
         }), 201
         
     except Exception as e:
-        logger.error(f"Upload error: {str(e)}")
+        logger.error("Upload error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/download/<filename>')
+@api.route('/download/<filename>')
 def download_file(filename):
     """
     Download a file.
@@ -195,33 +618,38 @@ def download_file(filename):
     try:
         # Secure the filename
         filename = secure_filename(filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
         
         if not os.path.exists(filepath):
             return jsonify({'error': 'File not found'}), 404
         
-        # Calculate hash for response header
-        file_hash = calculate_file_hash(filepath)
-        
         response = send_file(
             filepath,
             as_attachment=True,
             download_name=filename
         )
         
-        # Add hash to response headers
-        response.headers['X-File-Hash'] = file_hash
-        response.headers['X-Hash-Algorithm'] = 'sha256'
+        # Add hash to response headers; of ranged downloads only the first
+        # range carries it, so parallel ranges do not each hash the file
+        if response.status_code != 206 or response.content_range.start == 0:
+            file_hash = current_app.extensions['file_index'].file_hash(filename)
+            if file_hash:
+                response.headers['X-File-Hash'] = file_hash
+            response.headers['X-Hash-Algorithm'] = 'sha256'
+        
+        # Counted by MetricsMiddleware once the file has been sent
+        request.environ['api.transfer'] = ('download', os.path.getsize(filepath), time.perf_counter())
         
-        logger.info(f"File downloaded: {filename}")
+        logger.info("File downloaded: %s", filename)
         return response
         
     except Exception as e:
-        logger.error(f"Download error: {str(e)}")
+        logger.error("Download error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/files')
+@api.route('/files')
+@cached(version=upload_folder_version)
 def list_files():
     """
     List all uploaded files with their metadata.
@@ -230,44 +658,111 @@ def list_files():
         JSON list of files with size and hash
     """
     try:
-        files = []
-        upload_dir = Path(app.config['UPLOAD_FOLDER'])
-        
-        for filepath in upload_dir.glob('*'):
-            if filepath.is_file():
-                files.append({
-                    'filename': filepath.name,
-                    'size': filepath.stat().st_size,
-                    'modified': filepath.stat().st_mtime,
-                    'hash': calculate_file_hash(str(filepath))
-                })
+        # Hashes come from the file index; only new or changed files are hashed
+        files = [entry.to_dict() for entry in current_app.extensions['file_index'].list()]
         
         return jsonify({
             'count': len(files),
-            'files': sorted(files, key=lambda x: x['modified'], reverse=True)
+            'files': files
         })
         
     except Exception as e:
-        logger.error(f"List files error: {str(e)}")
+        logger.error("List files error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/keyboard', methods=['POST'])
+@api.route('/files/by-hash/<file_hash>')
+def find_files_by_hash(file_hash):
+    """
+    Find the stored files with a SHA256 hash.
+    
+    Args:
+        file_hash: SHA256 hex digest
+        
+    Returns:
+        JSON list of matching files, or 404 if there is none
+    """
+    if len(file_hash) != 64 or not all(c in string.hexdigits for c in file_hash):
+        return jsonify({'error': 'hash must be a SHA256 hex digest'}), 400
+    
+    files = [entry.to_dict() for entry in current_app.extensions['file_index'].by_hash(file_hash)]
+    if not files:
+        return jsonify({'error': 'No file with this hash', 'hash': file_hash.lower()}), 404
+    return jsonify({
+        'hash': file_hash.lower(),
+        'algorithm': 'sha256',
+        'count': len(files),
+        'files': files
+    })
+
+
+@api.route('/files/search')
+def search_files():
+    """
+    Find stored files by name prefix, size and modification time.
+    
+    Query parameters (all optional, combined with AND):
+    - prefix: File name prefix
+    - min_size, max_size: Size range in bytes (inclusive)
+    - min_modified, max_modified: Modification time range in seconds since
+      the epoch (inclusive)
+    - limit: Maximum number of files (default 100)
+    
+    Returns:
+        JSON list of files, ordered by name for prefix searches, otherwise
+        by size or modification time
+    """
+    try:
+        min_size, max_size = (int(request.args[name]) if name in request.args else None
+                              for name in ('min_size', 'max_size'))
+        min_modified, max_modified = (float(request.args[name]) if name in request.args else None
+                                      for name in ('min_modified', 'max_modified'))
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return jsonify({'error': 'Size, time and limit parameters must be numbers'}), 400
+    if limit < 1:
+        return jsonify({'error': 'limit must be positive'}), 400
+    
+    entries, truncated = current_app.extensions['file_index'].search(
+        prefix=request.args.get('prefix') or None,
+        min_size=min_size,
+        max_size=max_size,
+        min_modified=min_modified,
+        max_modified=max_modified,
+        limit=limit
+    )
+    return jsonify({
+        'count': len(entries),
+        'truncated': truncated,
+        'files': [entry.to_dict() for entry in entries]
+    })
+
+
+@api.route('/keyboard', methods=['POST'])
 def keyboard_input():
     """
-    Send keyboard input to emulate keypresses.
+    Queue keyboard input to emulate keypresses.
+    
+    The input is typed by a dedicated writer thread; the request returns a
+    job ID immediately unless "wait" is set.
     
     JSON body:
     {
         "text": "string to type",
         "keys": ["KEY_A", "KEY_ENTER"],
-        "delay": 0.1
+        "delay": 0.1 (optional, default: keyboard_emulation.default_delay),
+        "gap": 0.01 (optional, hold time between press and release, 0 = none),
+        "layout": "de" (optional, overrides the configured keyboard layout),
+        "device": "seat2" (optional, keyboard device; "auto" = least busy),
+        "wait": false (optional, block until the input has been sent),
+        "timeout": 60 (optional, maximum seconds to wait when "wait" is set)
     }
     
     Returns:
-        JSON response with status
+        JSON response with the job (202), or the finished job when waiting
     """
-    if not KEYBOARD_AVAILABLE or keyboard_emulator is None:
+    keyboard_pool = subsystems.get('keyboard_pool')
+    if keyboard_pool is None:
         return jsonify({
             'error': 'Keyboard emulation not available',
             'message': 'evdev module not installed or keyboard device not initialized'
@@ -281,56 +776,373 @@ def keyboard_input():
         
         text = data.get('text')
         keys = data.get('keys', [])
-        delay = data.get('delay', 0.1)
+        delay = data.get('delay', current_app.config['KEYBOARD_DEFAULT_DELAY'])
+        gap = data.get('gap', current_app.config['KEYBOARD_DEFAULT_GAP'])
+        layout = data.get('layout')
+        wait = data.get('wait', request.args.get('wait', 'false').lower() == 'true')
+        timeout = data.get('timeout')
+        if timeout is not None and (not isinstance(timeout, (int, float)) or timeout < 0):
+            return jsonify({'error': 'timeout must be a non-negative number'}), 400
         
-        if not text and not keys:
-            return jsonify({'error': 'Either "text" or "keys" must be provided'}), 400
+        try:
+            device = keyboard_pool.get(data.get('device'))
+        except KeyError as e:
+            return jsonify({'error': e.args[0]}), 404
         
-        # Type text if provided
-        if text:
-            keyboard_emulator.type_text(text, delay)
-            logger.info(f"Typed text: {text[:50]}...")
+        try:
+            job = device.jobs.submit(text, keys, delay, gap, layout)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Send specific keys if provided
-        if keys:
-            for key in keys:
-                keyboard_emulator.send_key(key, delay)
-            logger.info(f"Sent keys: {keys}")
+        logger.info("Queued keyboard job %s on %s: %d chars, %d keys", job.id, device.name, len(job.text), len(job.keys))
         
-        return jsonify({
+        if not wait:
+            result = job.to_dict()
+            result['message'] = 'Keyboard input queued'
+            return jsonify(result), 202
+        
+        if not job.wait(timeout):
+            result = job.to_dict()
+            result['message'] = 'Timed out waiting for keyboard input, job still active'
+            return jsonify(result), 202
+        
+        result = job.to_dict()
+        if job.status == job.FAILED:
+            result['error'] = job.error
+            return jsonify(result), 500
+        
+        result.update({
             'message': 'Keyboard input sent successfully',
             'text': text if text else None,
             'keys': keys if keys else None
         })
+        return jsonify(result)
         
     except Exception as e:
-        logger.error(f"Keyboard input error: {str(e)}")
+        logger.error("Keyboard input error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
-@app.errorhandler(413)
+@api.route('/keyboard/jobs', methods=['GET'])
+def list_keyboard_jobs():
+    """
+    List queued, running and recently finished keyboard jobs.
+    
+    Returns:
+        JSON response with list of jobs
+    """
+    keyboard_pool = subsystems.get('keyboard_pool')
+    if keyboard_pool is None:
+        return jsonify({
+            'error': 'Keyboard emulation not available',
+            'message': 'evdev module not installed or keyboard device not initialized'
+        }), 503
+    
+    from keyboard_layouts import LAYOUTS
+    
+    jobs = [job.to_dict() for job in keyboard_pool.jobs()]
+    return jsonify({
+        'jobs': jobs,
+        'count': len(jobs),
+        'queue_depth': keyboard_pool.depth,
+        'layout': keyboard_pool.emulator.layout,
+        'layouts': sorted(LAYOUTS)
+    })
+
+
+@api.route('/keyboard/devices', methods=['GET'])
+def list_keyboard_devices():
+    """
+    List the virtual keyboard devices with their queue state.
+    
+    Returns:
+        JSON response with list of devices
+    """
+    keyboard_pool = subsystems.get('keyboard_pool')
+    if keyboard_pool is None:
+        return jsonify({
+            'error': 'Keyboard emulation not available',
+            'message': 'evdev module not installed or keyboard device not initialized'
+        }), 503
+    
+    devices = [device.to_dict() for device in keyboard_pool.list()]
+    return jsonify({
+        'devices': devices,
+        'count': len(devices),
+        'default': keyboard_pool.default
+    })
+
+
+@api.route('/keyboard/jobs/<job_id>', methods=['GET'])
+def get_keyboard_job(job_id):
+    """
+    Get status and progress of a keyboard job.
+    
+    Args:
+        job_id: Job ID returned by /keyboard
+        
+    Returns:
+        JSON response with job status
+    """
+    keyboard_pool = subsystems.get('keyboard_pool')
+    if keyboard_pool is None:
+        return jsonify({
+            'error': 'Keyboard emulation not available',
+            'message': 'evdev module not installed or keyboard device not initialized'
+        }), 503
+    
+    job = keyboard_pool.find_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+
+@api.route('/keyboard/jobs/<job_id>', methods=['DELETE'])
+def cancel_keyboard_job(job_id):
+    """
+    Cancel a queued or running keyboard job.
+    
+    Args:
+        job_id: Job ID returned by /keyboard
+        
+    Returns:
+        JSON response with job status
+    """
+    keyboard_pool = subsystems.get('keyboard_pool')
+    if keyboard_pool is None:
+        return jsonify({
+            'error': 'Keyboard emulation not available',
+            'message': 'evdev module not installed or keyboard device not initialized'
+        }), 503
+    
+    job = keyboard_pool.find_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if not job.cancel():
+        result = job.to_dict()
+        result['message'] = 'Job already finished'
+        return jsonify(result), 409
+    
+    job.wait(1.0)
+    result = job.to_dict()
+    result['message'] = 'Job cancellation requested'
+    return jsonify(result)
+
+
+@api.route('/keyboard/macros', methods=['GET'])
+def list_keyboard_macros():
+    """
+    List stored keyboard macros.
+    
+    Returns:
+        JSON response with list of macros
+    """
+    keyboard_macros = subsystems.get('keyboard_macros')
+    if keyboard_macros is None:
+        return jsonify({
+            'error': 'Keyboard emulation not available',
+            'message': 'evdev module not installed or keyboard device not initialized'
+        }), 503
+    
+    macros = [macro.to_dict() for macro in keyboard_macros.list()]
+    return jsonify({
+        'macros': macros,
+        'count': len(macros)
+    })
+
+
+@api.route('/keyboard/macro/<name>', methods=['PUT'])
+def store_keyboard_macro(name):
+    """
+    Compile and store a keyboard macro.
+    
+    The body is either the macro source as text/plain or JSON:
+    {
+        "source": "key ctrl+alt+t; wait 500ms; type \"ls {path}\\n\"",
+        "layout": "de" (optional, layout used for "type" statements)
+    }
+    
+    Args:
+        name: Macro name
+        
+    Returns:
+        JSON response with the compiled macro (201 if new)
+    """
+    keyboard_macros = subsystems.get('keyboard_macros')
+    if keyboard_macros is None:
+        return jsonify({
+            'error': 'Keyboard emulation not available',
+            'message': 'evdev module not installed or keyboard device not initialized'
+        }), 503
+    
+    if request.is_json:
+        data = request.get_json()
+        source = data.get('source') if isinstance(data, dict) else None
+        layout = data.get('layout') if isinstance(data, dict) else None
+    else:
+        source = request.get_data(as_text=True)
+        layout = request.args.get('layout')
+    
+    if not source or not isinstance(source, str):
+        return jsonify({'error': 'Macro source is required'}), 400
+    
+    from keyboard_macros import MacroSyntaxError
+    
+    try:
+        macro, replaced = keyboard_macros.put(name, source, layout)
+    except MacroSyntaxError as e:
+        return jsonify({'error': str(e), 'line': e.line}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except OSError as e:
+        logger.error("Failed to store macro %s: %s", name, e)
+        return jsonify({'error': str(e)}), 500
+    
+    logger.info("Stored keyboard macro %s (%s events)", name, macro.to_dict()['events'])
+    result = macro.to_dict()
+    result['message'] = 'Macro updated' if replaced else 'Macro created'
+    return jsonify(result), 200 if replaced else 201
+
+
+@api.route('/keyboard/macro/<name>', methods=['GET'])
+def get_keyboard_macro(name):
+    """
+    Get a stored keyboard macro.
+    
+    Args:
+        name: Macro name
+        
+    Returns:
+        JSON response with the macro source and parameters
+    """
+    keyboard_macros = subsystems.get('keyboard_macros')
+    if keyboard_macros is None:
+        return jsonify({
+            'error': 'Keyboard emulation not available',
+            'message': 'evdev module not installed or keyboard device not initialized'
+        }), 503
+    
+    macro = keyboard_macros.get(name)
+    if macro is None:
+        return jsonify({'error': 'Macro not found'}), 404
+    return jsonify(macro.to_dict())
+
+
+@api.route('/keyboard/macro/<name>', methods=['DELETE'])
+def delete_keyboard_macro(name):
+    """
+    Delete a stored keyboard macro.
+    
+    Args:
+        name: Macro name
+        
+    Returns:
+        JSON response with result
+    """
+    keyboard_macros = subsystems.get('keyboard_macros')
+    if keyboard_macros is None:
+        return jsonify({
+            'error': 'Keyboard emulation not available',
+            'message': 'evdev module not installed or keyboard device not initialized'
+        }), 503
+    
+    if not keyboard_macros.delete(name):
+        return jsonify({'error': 'Macro not found'}), 404
+    return jsonify({'name': name, 'message': 'Macro deleted'})
+
+
+@api.route('/keyboard/macro/<name>', methods=['POST'])
+def run_keyboard_macro(name):
+    """
+    Queue a stored keyboard macro.
+    
+    JSON body (optional):
+    {
+        "params": {"path": "/tmp"} (values for {param} placeholders),
+        "delay": 0.0 (optional, delay between characters/keys),
+        "gap": 0.01 (optional, hold time between press and release),
+        "device": "seat2" (optional, keyboard device; "auto" = least busy),
+        "wait": false (optional, block until the macro has been sent),
+        "timeout": 60 (optional, maximum seconds to wait when "wait" is set)
+    }
+    
+    Args:
+        name: Macro name
+        
+    Returns:
+        JSON response with the job (202), or the finished job when waiting
+    """
+    keyboard_macros = subsystems.get('keyboard_macros')
+    if keyboard_macros is None:
+        return jsonify({
+            'error': 'Keyboard emulation not available',
+            'message': 'evdev module not installed or keyboard device not initialized'
+        }), 503
+    
+    macro = keyboard_macros.get(name)
+    if macro is None:
+        return jsonify({'error': 'Macro not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    params = data.get('params') or {}
+    wait = data.get('wait', request.args.get('wait', 'false').lower() == 'true')
+    timeout = data.get('timeout')
+    if not isinstance(params, dict):
+        return jsonify({'error': 'params must be an object'}), 400
+    if timeout is not None and (not isinstance(timeout, (int, float)) or timeout < 0):
+        return jsonify({'error': 'timeout must be a non-negative number'}), 400
+    
+    try:
+        device = subsystems.get('keyboard_pool').get(data.get('device'))
+    except KeyError as e:
+        return jsonify({'error': e.args[0]}), 404
+    
+    try:
+        events = macro.render(params)
+        job = device.jobs.submit_events(events, data.get('delay', 0.0), data.get('gap'), macro=name)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    logger.info("Queued keyboard macro %s as job %s on %s: %d units", name, job.id, device.name, job.units_total)
+    
+    if not wait or not job.wait(timeout):
+        result = job.to_dict()
+        result['message'] = 'Keyboard macro queued' if not wait else \
+            'Timed out waiting for keyboard macro, job still active'
+        return jsonify(result), 202
+    
+    result = job.to_dict()
+    if job.status == job.FAILED:
+        result['error'] = job.error
+        return jsonify(result), 500
+    result['message'] = 'Keyboard macro sent successfully'
+    return jsonify(result)
+
+
+@api.app_errorhandler(413)
 def request_entity_too_large(error):
     """Handle file too large error."""
     return jsonify({
         'error': 'File too large',
-        'max_size': f'{MAX_CONTENT_LENGTH / (1024*1024)} MB'
+        'max_size': f"{current_app.config['MAX_CONTENT_LENGTH'] / (1024*1024)} MB"
     }), 413
 
 
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found(error):
     """Handle 404 errors."""
     return jsonify({'error': 'Endpoint not found'}), 404
 
 
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def internal_error(error):
     """Handle 500 errors."""
-    logger.error(f"Internal error: {str(error)}")
+    logger.error("Internal error: %s", error)
     return jsonify({'error': 'Internal server error'}), 500
 
 
-@app.route('/process/start', methods=['POST'])
+@api.route('/process/start', methods=['POST'])
 def start_process():
     """
     Start a process and check if it's already running.
@@ -340,13 +1152,22 @@ def start_process():
         "command": "command to run" or ["command", "arg1", "arg2"],
         "check_running": true (optional, default true),
         "cwd": "/path/to/working/dir" (optional),
-        "env": {"VAR": "value"} (optional)
+        "env": {"VAR": "value"} (optional),
+        "capture_output": "memory" or "file" (optional, default: not captured),
+        "scheduling": {
+            "cpu_affinity": [4, 5, 6, 7] or "4-7",
+            "nice": 10,
+            "ionice": {"class": "best_effort", "value": 7},
+            "rlimits": {"nofile": 4096, "as": [soft, hard]}
+        } (optional),
+        "thresholds": {"cpu_percent": 80, "memory_mb": 512} (optional, for events)
     }
     
     Returns:
         JSON response with process status
     """
-    if not PROCESS_MANAGER_AVAILABLE or process_manager is None:
+    process_manager = subsystems.get('process_manager')
+    if process_manager is None:
         return jsonify({
             'error': 'Process management not available',
             'message': 'psutil module not installed'
@@ -365,37 +1186,47 @@ def start_process():
         check_running = data.get('check_running', True)
         cwd = data.get('cwd')
         env = data.get('env')
+        capture_output = data.get('capture_output')
+        scheduling = data.get('scheduling')
+        thresholds = data.get('thresholds')
         
         result = process_manager.start_process(
             command=command,
             check_running=check_running,
             cwd=cwd,
-            env=env
+            env=env,
+            capture_output=capture_output,
+            scheduling=scheduling,
+            thresholds=thresholds
         )
         
         return jsonify(result)
         
     except FileNotFoundError as e:
         return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Process start error: {str(e)}")
+        logger.error("Process start error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/process/stop', methods=['POST'])
+@api.route('/process/stop', methods=['POST'])
 def stop_process():
     """
     Stop a running process.
     
     JSON body:
     {
-        "process": "process name or command"
+        "process": "process name or command",
+        "scope": "process", "group" or "session" (optional, default "process")
     }
     
     Returns:
         JSON response with status
     """
-    if not PROCESS_MANAGER_AVAILABLE or process_manager is None:
+    process_manager = subsystems.get('process_manager')
+    if process_manager is None:
         return jsonify({
             'error': 'Process management not available',
             'message': 'psutil module not installed'
@@ -411,71 +1242,265 @@ def stop_process():
         if not process_name:
             return jsonify({'error': '"process" is required'}), 400
         
-        result = process_manager.stop_process(process_name)
+        scope = data.get('scope', 'process')
+        result = process_manager.stop_process(process_name, scope=scope)
         return jsonify(result)
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Process stop error: {str(e)}")
+        logger.error("Process stop error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/process/status/<process_name>', methods=['GET'])
+@api.route('/process/batch', methods=['POST'])
+def batch_processes():
+    """
+    Run several process operations concurrently.
+    
+    JSON body:
+    {
+        "operations": [
+            {"action": "stop", "process": "app1", "scope": "group"},
+            {"action": "start", "command": ["app2", "--flag"]},
+            {"action": "restart", "command": "app3", "scope": "session"}
+        ],
+        "max_workers": 8 (optional, default: tuning.batch_max_workers)
+    }
+    
+    Returns:
+        JSON response with per-operation results
+    """
+    process_manager = subsystems.get('process_manager')
+    if process_manager is None:
+        return jsonify({
+            'error': 'Process management not available',
+            'message': 'psutil module not installed'
+        }), 503
+    
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'No JSON data provided'}), 400
+        
+        operations = data.get('operations')
+        if not isinstance(operations, list) or not operations:
+            return jsonify({'error': '"operations" must be a non-empty list'}), 400
+        if not all(isinstance(op, dict) for op in operations):
+            return jsonify({'error': 'Each operation must be an object'}), 400
+        
+        max_workers = data.get('max_workers', current_app.config['BATCH_MAX_WORKERS'])
+        if not isinstance(max_workers, int) or max_workers < 1:
+            return jsonify({'error': 'max_workers must be a positive integer'}), 400
+        
+        results = process_manager.run_batch(operations, max_workers=max_workers)
+        succeeded = sum(1 for entry in results if entry['ok'])
+        
+        return jsonify({
+            'results': results,
+            'count': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded
+        })
+        
+    except Exception as e:
+        logger.error("Process batch error: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/process/status/<process_name>', methods=['GET'])
 def get_process_status(process_name):
     """
     Get status of a process.
     
     Args:
         process_name: Name of the process
+    
+    Query parameters:
+    - tree: (optional) Include aggregated CPU/RSS/threads of all descendants
+    - uss: (optional) Also include USS in the tree (slower)
         
     Returns:
         JSON response with process status
     """
-    if not PROCESS_MANAGER_AVAILABLE or process_manager is None:
+    process_manager = subsystems.get('process_manager')
+    if process_manager is None:
         return jsonify({
             'error': 'Process management not available',
             'message': 'psutil module not installed'
         }), 503
     
     try:
-        result = process_manager.get_process_status(process_name)
+        result = process_manager.get_process_status(
+            process_name,
+            include_tree=request.args.get('tree', 'false').lower() == 'true',
+            include_uss=request.args.get('uss', 'false').lower() == 'true'
+        )
         return jsonify(result)
         
     except Exception as e:
-        logger.error(f"Process status error: {str(e)}")
+        logger.error("Process status error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/process/list', methods=['GET'])
+@api.route('/process/output/<process_name>', methods=['GET'])
+def get_process_output(process_name):
+    """
+    Get captured output of a process.
+    
+    Query parameters:
+    - offset: (optional) First line offset to return (default: 0)
+    - limit: (optional) Maximum number of lines (non-follow mode only)
+    - follow: (optional) Keep the connection open and stream new lines
+    - format: (optional) 'sse' for server-sent events, otherwise NDJSON when following
+    
+    Server-sent event streams resume from the Last-Event-ID header.
+    
+    Returns:
+        JSON response with output lines, or a streaming response when following
+    """
+    process_manager = subsystems.get('process_manager')
+    if process_manager is None:
+        return jsonify({
+            'error': 'Process management not available',
+            'message': 'psutil module not installed'
+        }), 503
+    
+    buffer = process_manager.get_output(process_name)
+    if buffer is None:
+        return jsonify({'error': 'No captured output for process', 'process': process_name}), 404
+    
+    try:
+        offset = int(request.headers.get('Last-Event-ID', request.args.get('offset', 0)))
+        limit = request.args.get('limit', type=int)
+    except ValueError:
+        return jsonify({'error': 'offset must be an integer'}), 400
+    
+    if request.args.get('follow', 'false').lower() != 'true':
+        result = buffer.read(offset, limit)
+        result['process'] = process_name
+        return jsonify(result)
+    
+    use_sse = (request.args.get('format') == 'sse'
+               or 'text/event-stream' in request.headers.get('Accept', ''))
+    
+    from output_capture import follow as follow_output
+    
+    def generate():
+        for line in follow_output(buffer, offset):
+            if line is None:
+                yield ': keep-alive\n\n' if use_sse else '\n'
+            elif use_sse:
+                yield f"id: {line['offset'] + 1}\nevent: {line['stream']}\ndata: {line['text']}\n\n"
+            else:
+                yield json.dumps(line) + '\n'
+    
+    # Endless; clients resume from their offset after a restart
+    request.environ[EXEMPT_ENVIRON_KEY] = True
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api.route('/process/events', methods=['GET'])
+def process_events():
+    """
+    Stream process state events as server-sent events.
+    
+    Event types: started, stopped, restarted, exited (with exit_code),
+    threshold_exceeded and threshold_cleared. One connection replaces
+    polling /process/status for every process.
+    
+    Query parameters:
+    - process: (optional, repeatable) Only send events for these processes
+    - last_event_id: (optional) Resume after this event ID; the
+      Last-Event-ID header sent by EventSource takes precedence
+    
+    Returns:
+        text/event-stream response
+    """
+    process_manager = subsystems.get('process_manager')
+    if process_manager is None:
+        return jsonify({
+            'error': 'Process management not available',
+            'message': 'psutil module not installed'
+        }), 503
+    
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    try:
+        last_event_id = int(last_event_id) if last_event_id is not None else None
+    except ValueError:
+        return jsonify({'error': 'last_event_id must be an integer'}), 400
+    
+    events = process_manager.listen_events(last_event_id, request.args.getlist('process'))
+    
+    def generate():
+        yield 'retry: 3000\n\n'
+        for event in events:
+            if event is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    
+    # Endless; EventSource reconnects with Last-Event-ID after a restart
+    request.environ[EXEMPT_ENVIRON_KEY] = True
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api.route('/process/list', methods=['GET'])
+@cached(version=process_events_version)
 def list_processes():
     """
     List all managed processes.
     
+    Query parameters:
+    - tree: (optional) Include aggregated CPU/RSS/threads of all descendants
+    - uss: (optional) Also include USS in the trees (slower)
+    
     Returns:
         JSON response with list of processes
     """
-    if not PROCESS_MANAGER_AVAILABLE or process_manager is None:
+    process_manager = subsystems.get('process_manager')
+    if process_manager is None:
         return jsonify({
             'error': 'Process management not available',
             'message': 'psutil module not installed'
         }), 503
     
     try:
-        processes = process_manager.list_managed_processes()
+        processes = process_manager.list_managed_processes(
+            include_tree=request.args.get('tree', 'false').lower() == 'true',
+            include_uss=request.args.get('uss', 'false').lower() == 'true'
+        )
         return jsonify({
             'processes': processes,
             'count': len(processes)
         })
         
     except Exception as e:
-        logger.error(f"Process list error: {str(e)}")
+        logger.error("Process list error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/system/reboot', methods=['POST'])
+@api.route('/system/reboot', methods=['POST'])
 def reboot_system():
     """
     Reboot the system.
     
+    Delays of a minute or more are scheduled with `shutdown -r +N` (whole
+    minutes), so the reboot happens even if the API restarts meanwhile; the
+    service then drains on SIGTERM. Shorter delays are waited for here, then
+    the API drains like on SIGTERM: new requests are refused, and requests
+    in flight (e.g. uploads) and queued keyboard jobs get up to
+    drain_timeout seconds to finish before the reboot. If the reboot
+    command fails, the drain ends and the API keeps serving.
+    
     JSON body:
     {
         "delay": 0 (optional, delay in seconds before reboot, default 0)
@@ -493,41 +1518,77 @@ def reboot_system():
             return jsonify({'error': 'delay must be a non-negative number'}), 400
         
         # Log the reboot request
-        logger.warning(f"System reboot requested with {delay} second delay")
+        logger.warning("System reboot requested with %s second delay", delay)
         
-        # Schedule the reboot
         import subprocess
-        if delay == 0:
-            subprocess.Popen(['sudo', 'reboot'], 
-                           stdin=subprocess.DEVNULL,
-                           stdout=subprocess.DEVNULL,
-                           stderr=subprocess.DEVNULL)
-        else:
-            subprocess.Popen(['sudo', 'shutdown', '-r', f'+{int(delay//60)}'],
-                           stdin=subprocess.DEVNULL,
-                           stdout=subprocess.DEVNULL,
-                           stderr=subprocess.DEVNULL)
+        drain = current_app.extensions['drain']
+        drain_timeout = current_app.config['DRAIN_TIMEOUT']
+        
+        if delay >= 60:
+            # Scheduled by the OS; stopping the service for the reboot drains it
+            subprocess.Popen(['sudo', 'shutdown', '-r', f'+{int(delay // 60)}'],
+                             stdin=subprocess.DEVNULL,
+                             stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL)
+            return jsonify({
+                'message': 'System reboot scheduled',
+                'delay_seconds': delay,
+                'drain_timeout': drain_timeout
+            })
+        
+        # Fail now rather than after draining
+        if shutil.which('sudo') is None:
+            raise FileNotFoundError("sudo not found")
+        
+        def reboot():
+            time.sleep(delay)
+            drain.begin()
+            if not drain.wait(drain_timeout):
+                logger.warning("Rebooting before all requests and keyboard jobs finished")
+            try:
+                process = subprocess.Popen(['sudo', 'reboot'],
+                                           stdin=subprocess.DEVNULL,
+                                           stdout=subprocess.DEVNULL,
+                                           stderr=subprocess.DEVNULL)
+                if process.wait(timeout=REBOOT_COMMAND_TIMEOUT) == 0:
+                    return
+                error = f"exit status {process.returncode}"
+            except subprocess.TimeoutExpired:
+                # Still running: the system is going down
+                return
+            except OSError as e:
+                error = str(e)
+            logger.error("Reboot failed (%s), taking requests again", error)
+            drain.end()
+        
+        # The drain also waits for this response to be sent
+        threading.Thread(target=reboot, name='reboot', daemon=True).start()
         
         return jsonify({
             'message': 'System reboot initiated',
-            'delay_seconds': delay
+            'delay_seconds': delay,
+            'drain_timeout': drain_timeout
         })
         
     except Exception as e:
-        logger.error(f"Reboot error: {str(e)}")
+        logger.error("Reboot error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
 if __name__ == '__main__':
-    # Run the server
-    # For production, use a proper WSGI server like gunicorn
-    host = os.environ.get('FLASK_HOST', '0.0.0.0')
-    port = int(os.environ.get('FLASK_PORT', 5000))
-    debug = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
-    
-    logger.info(f"Starting Flask REST API on {host}:{port}")
-    logger.info(f"Upload folder: {UPLOAD_FOLDER}")
-    logger.info(f"Keyboard emulation: {'enabled' if KEYBOARD_AVAILABLE else 'disabled'}")
-    logger.info(f"Process management: {'enabled' if PROCESS_MANAGER_AVAILABLE else 'disabled'}")
+    # Run the development server
+    # For production, use the launcher: python server.py
+    try:
+        app = create_app()
+    except settings.ConfigError as e:
+        raise SystemExit(str(e))
+    host = app.config['HOST']
+    port = app.config['PORT']
+    debug = app.config['DEBUG']
+    
+    logger.info("Starting Flask REST API on %s:%s", host, port)
+    logger.info("Upload folder: %s", app.config['UPLOAD_FOLDER'])
+    logger.info("Keyboard emulation: %s", 'enabled' if KEYBOARD_AVAILABLE else 'disabled')
+    logger.info("Process management: %s", 'enabled' if PROCESS_MANAGER_AVAILABLE else 'disabled')
     
     app.run(host=host, port=port, debug=debug)
@@ -0,0 +1,4 @@
+"""
+Benchmarks for the Flask REST API
+Run from the repository root, e.g.: python -m benchmarks.keyboard_throughput
+"""
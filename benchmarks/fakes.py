@@ -0,0 +1,25 @@
+"""
+Fake devices for benchmarks
+"""
+
+
+class FakeUInput:
+    """
+    UInput-compatible sink that only counts events.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Initialize counters."""
+        self.events = 0
+        self.syns = 0
+
+    def write(self, event_type, code, value):
+        """Count a written event."""
+        self.events += 1
+
+    def syn(self):
+        """Count a sync frame."""
+        self.syns += 1
+
+    def close(self):
+        """Nothing to release."""
@@ -0,0 +1,103 @@
+"""
+Input Latency Benchmark
+Measures the round trip of a single key press through POST /keyboard
+(wait=true, delay=0, gap=0) and through the input channel over TCP and a
+Unix socket ("press a" followed by "ping"), using fake UInput devices.
+
+Usage:
+    python -m benchmarks.input_latency [--requests 500]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+import keyboard_emulator
+from benchmarks.fakes import FakeUInput
+
+
+def summarize(name, samples):
+    """Return latency figures in milliseconds."""
+    samples = sorted(samples)
+    return {
+        'name': name,
+        'requests': len(samples),
+        'mean_ms': round(statistics.mean(samples) * 1000, 3),
+        'p50_ms': round(samples[len(samples) // 2] * 1000, 3),
+        'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3)
+    }
+
+
+def measure_http(port, count):
+    """Time POST /keyboard requests, one connection each like a plain client."""
+    body = json.dumps({'keys': ['KEY_A'], 'wait': True, 'delay': 0, 'gap': 0})
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        connection.request('POST', '/keyboard', body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        samples.append(time.perf_counter() - started)
+        assert response.status == 200
+    return samples
+
+
+def measure_channel(sock, count):
+    """Time press + ping round trips on one persistent connection."""
+    reader = sock.makefile('rb')
+    samples = []
+    for i in range(count):
+        started = time.perf_counter()
+        sock.sendall(f"press a\nping {i}\n".encode())
+        reply = reader.readline()
+        samples.append(time.perf_counter() - started)
+        assert reply == f"pong {i}\n".encode(), reply
+    sock.close()
+    return samples
+
+
+def main():
+    """Run the benchmark and print results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500, help='Key presses per transport')
+    args = parser.parse_args()
+
+    keyboard_emulator.UInput = FakeUInput
+    from werkzeug.serving import make_server
+    import app as api
+    from input_channel import InputChannel
+
+    server = make_server('127.0.0.1', 0, api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    channel = InputChannel(api.subsystems.get('keyboard_pool'), pointer_factory=lambda: None)
+    tcp = channel.serve_tcp('127.0.0.1', 0)
+    socket_path = os.path.join(tempfile.mkdtemp(), 'input.sock')
+    channel.serve_unix(socket_path)
+
+    tcp_sock = socket.create_connection(tcp.server_address)
+    tcp_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    unix_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    unix_sock.connect(socket_path)
+
+    results = [
+        summarize('http POST /keyboard', measure_http(server.server_port, args.requests)),
+        summarize('input channel (tcp)', measure_channel(tcp_sock, args.requests)),
+        summarize('input channel (unix)', measure_channel(unix_sock, args.requests)),
+    ]
+    channel.close()
+    server.shutdown()
+    os.remove(socket_path)
+    print(json.dumps({'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Keyboard Pacing Benchmark
+Compares how closely chained time.sleep() calls and the deadline scheduler
+hit a requested per-character delay, using a fake UInput sink.
+
+Usage:
+    python -m benchmarks.keyboard_pacing [--chars 200] [--delay 0.005] [--gap 0.002]
+"""
+
+import argparse
+import json
+import time
+
+from keyboard_emulator import KeyboardEmulator
+from keyboard_timing import PacingStats
+from benchmarks.fakes import FakeUInput
+
+SAMPLE = "The quick brown fox jumps over the lazy dog. "
+
+
+def chained_sleep_emit(emulator, events, delay, gap):
+    """Emit events pacing with relative sleeps, as before the scheduler."""
+    from keyboard_emulator import EV_MARK
+    write = emulator.ui.write
+    syn = emulator.ui.syn
+    pending_gap = False
+    for event_type, code, value in events:
+        if event_type == EV_MARK:
+            pending_gap = False
+            time.sleep(delay)
+        elif event_type == 0:
+            syn()
+            pending_gap = True
+        else:
+            if pending_gap:
+                time.sleep(gap)
+            pending_gap = False
+            write(event_type, code, value)
+
+
+def measure(name, func, requested):
+    """Run an emission and compare its duration with the requested time."""
+    started = time.monotonic()
+    func()
+    achieved = time.monotonic() - started
+    return {
+        'name': name,
+        'requested_seconds': round(requested, 4),
+        'achieved_seconds': round(achieved, 4),
+        'drift_percent': round((achieved - requested) / requested * 100, 2)
+    }
+
+
+def main():
+    """Run the benchmark and print results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chars', type=int, default=200, help='Characters to type')
+    parser.add_argument('--delay', type=float, default=0.005, help='Delay per character in seconds')
+    parser.add_argument('--gap', type=float, default=0.002, help='Hold time between press and release')
+    args = parser.parse_args()
+
+    emulator = KeyboardEmulator(ui=FakeUInput())
+    text = (SAMPLE * (args.chars // len(SAMPLE) + 1))[:args.chars]
+    events = emulator.compile_text(text)
+    # Frames within a unit minus one gap each, plus one delay per unit
+    frames = sum(1 for event in events if event[0] == 0)
+    requested = (frames - len(text)) * args.gap + len(text) * args.delay
+
+    stats = PacingStats()
+    results = [
+        measure('chained sleep', lambda: chained_sleep_emit(emulator, events, args.delay, args.gap), requested),
+        measure('deadline scheduler', lambda: emulator.emit(events, args.delay, args.gap, stats=stats), requested),
+    ]
+    results[1]['stats'] = stats.to_dict()
+    print(json.dumps({'chars': len(text), 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
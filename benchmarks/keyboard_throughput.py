@@ -0,0 +1,99 @@
+"""
+Keyboard Throughput Benchmark
+Compares the compiled event-stream engine with the previous per-character
+path (write + syn + sleep(0.01) per event) using a fake UInput sink.
+
+Usage:
+    python -m benchmarks.keyboard_throughput [--chars 2000] [--legacy-chars 200]
+"""
+
+import argparse
+import json
+import time
+
+from evdev import ecodes as e
+
+from keyboard_emulator import KeyboardEmulator
+from keyboard_layouts import MOD_SHIFT, get_layout
+from benchmarks.fakes import FakeUInput
+
+SAMPLE = "The Quick Brown Fox jumps over the LAZY dog! 0123456789 {}[]();:'\",.<>/?\n"
+
+
+def legacy_type_text(emulator, text, delay=0.0):
+    """Type text the way type_char() did before the compiled engine (US layout)."""
+    ui = emulator.ui
+    table = get_layout('us')
+    for char in text:
+        key_code, mask = table.get(char, (None, 0))
+        if key_code is None:
+            pass
+        elif mask == MOD_SHIFT:
+            ui.write(e.EV_KEY, e.KEY_LEFTSHIFT, 1)
+            ui.syn()
+            time.sleep(0.01)
+            ui.write(e.EV_KEY, key_code, 1)
+            ui.syn()
+            time.sleep(0.01)
+            ui.write(e.EV_KEY, key_code, 0)
+            ui.syn()
+            time.sleep(0.01)
+            ui.write(e.EV_KEY, e.KEY_LEFTSHIFT, 0)
+            ui.syn()
+        else:
+            ui.write(e.EV_KEY, key_code, 1)
+            ui.syn()
+            time.sleep(0.01)
+            ui.write(e.EV_KEY, key_code, 0)
+            ui.syn()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def measure(name, func, emulator, chars):
+    """Run a typing function and return throughput figures."""
+    emulator.ui = FakeUInput()
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    return {
+        'name': name,
+        'chars': chars,
+        'events': emulator.ui.events,
+        'syn_frames': emulator.ui.syns,
+        'seconds': round(elapsed, 4),
+        'chars_per_sec': round(chars / elapsed, 1),
+        'events_per_sec': round(emulator.ui.events / elapsed, 1)
+    }
+
+
+def main():
+    """Run the benchmark and print results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chars', type=int, default=20000, help='Characters for the compiled engine')
+    parser.add_argument('--legacy-chars', type=int, default=200, help='Characters for the legacy path')
+    args = parser.parse_args()
+
+    emulator = KeyboardEmulator(ui=FakeUInput())
+    text = (SAMPLE * (args.chars // len(SAMPLE) + 1))[:args.chars]
+    legacy_text = text[:args.legacy_chars]
+
+    results = [
+        measure('legacy (delay=0)', lambda: legacy_type_text(emulator, legacy_text), emulator, len(legacy_text)),
+        measure('compiled, default gap', lambda: emulator.type_text(legacy_text, delay=0), emulator, len(legacy_text)),
+        measure('compiled, gap=0', lambda: emulator.type_text(text, delay=0, gap=0), emulator, len(text)),
+    ]
+
+    started = time.perf_counter()
+    events = emulator.compile_text(text)
+    compile_seconds = time.perf_counter() - started
+    results.append(measure('emit only, gap=0', lambda: emulator.emit(events, 0, 0), emulator, len(text)))
+
+    print(json.dumps({
+        'compile_chars_per_sec': round(len(text) / compile_seconds, 1),
+        'results': results
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
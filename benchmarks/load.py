@@ -0,0 +1,428 @@
+"""
+Load Benchmark
+Drives concurrent load against the API endpoints and reports throughput,
+p50/p99 latency and peak RSS of the server per scenario.
+
+The app runs in-process (threaded Werkzeug server, temporary folders, fake
+UInput devices) unless --url points to a local instance. Results can be
+saved as a JSON baseline and compared against one to catch regressions.
+
+Scenarios:
+    upload     POST /upload at each --upload-sizes
+    download   GET /download of a file of each --upload-sizes
+    files      GET /files with each --file-counts files in the upload
+               folder (needs --upload-folder with --url)
+    process    GET /process/list and /process/status, start/stop cycles
+    keyboard   POST /keyboard wait=true (in-process only: fake devices)
+
+Usage:
+    python -m benchmarks.load [--concurrency 8] [--requests 200] [--save base.json]
+    python -m benchmarks.load --compare base.json [--tolerance 0.15]
+    python -m benchmarks.load --url http://127.0.0.1:5000 --pid 1234 --scenarios upload,download
+
+Rate limits and the response cache are disabled in-process; against
+--url, start the instance with FLASK_RATE_LIMIT=false FLASK_CACHE=false
+or the files and process scenarios measure the limiter and the cache
+instead of the endpoints.
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+SCENARIOS = ('upload', 'download', 'files', 'process', 'keyboard')
+
+# Name of the sleep copy started by the process scenario, so stopping it
+# never matches other processes
+SLEEPER = 'bench-sleeper'
+
+
+def parse_size(value):
+    """Parse a size like 4K, 1M or 16M into bytes."""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = value.strip().upper()
+    if value[-1:] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def percentile(samples, fraction):
+    """Return a percentile of sorted samples."""
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class Server:
+    """
+    The API under test: an in-process server or a local instance.
+    """
+
+    def __init__(self, url=None, pid=None, upload_folder=None):
+        """
+        Args:
+            url: Base URL of a running instance (None = start in-process)
+            pid: PID of the running instance for RSS measurements
+            upload_folder: Upload folder of the running instance
+        """
+        self.scratch = tempfile.mkdtemp(prefix='flask-api-bench-')
+        self.in_process = url is None
+        if self.in_process:
+            import keyboard_emulator
+            from benchmarks.fakes import FakeUInput
+            keyboard_emulator.UInput = FakeUInput
+            from werkzeug.serving import make_server
+            from app import create_app
+
+            self.upload_folder = os.path.join(self.scratch, 'uploads')
+            app = create_app({
+                'UPLOAD_FOLDER': self.upload_folder,
+                'PROCESS_LOG_FOLDER': os.path.join(self.scratch, 'process_logs'),
+                'KEYBOARD_MACRO_FOLDER': os.path.join(self.scratch, 'macros'),
+                'MAX_CONTENT_LENGTH': None,
+                'RATE_LIMIT_ENABLED': False,
+                'CACHE_ENABLED': False,
+            })
+            self._server = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+            self.host, self.port = '127.0.0.1', self._server.server_port
+            self.pid = os.getpid()
+        else:
+            parts = urlsplit(url)
+            self.host, self.port = parts.hostname, parts.port or 80
+            self.pid = pid
+            self.upload_folder = upload_folder
+
+    def connect(self):
+        """Open a keep-alive connection to the server."""
+        return http.client.HTTPConnection(self.host, self.port, timeout=300)
+
+    def reset_peak_rss(self):
+        """Reset the peak RSS of the server process (Linux 4.0+)."""
+        if self.pid is None:
+            return
+        try:
+            with open(f'/proc/{self.pid}/clear_refs', 'w') as f:
+                f.write('5')
+        except OSError:
+            pass
+
+    def peak_rss_mb(self):
+        """Peak RSS of the server process in MB (None if unknown)."""
+        if self.pid is None:
+            return None
+        try:
+            with open(f'/proc/{self.pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            pass
+        return None
+
+    def close(self):
+        """Stop the in-process server and remove temporary files."""
+        if self.in_process:
+            self._server.shutdown()
+        shutil.rmtree(self.scratch, ignore_errors=True)
+
+
+def request(connection, method, path, body=None, headers=None):
+    """Send a request and read the whole response; returns (status, bytes read)."""
+    connection.request(method, path, body=body, headers=headers or {})
+    response = connection.getresponse()
+    size = 0
+    while True:
+        chunk = response.read(1024 * 1024)
+        if not chunk:
+            break
+        size += len(chunk)
+    return response.status, size
+
+
+def run_load(server, name, send, requests, concurrency, payload_bytes=0):
+    """
+    Run send(connection, index) requests times from concurrent clients.
+
+    Args:
+        server: Server under test
+        name: Scenario name in the results
+        send: Callable returning (status, response bytes)
+        requests: Total number of requests
+        concurrency: Number of client threads, each with one connection
+        payload_bytes: Request body bytes per request (for MB/s)
+
+    Returns:
+        dict: Throughput, latency percentiles, errors and peak RSS
+    """
+    counter = itertools.count()
+    latencies = []
+    errors = []
+    received = [0]
+    lock = threading.Lock()
+
+    def client():
+        connection = server.connect()
+        own_latencies, own_errors, own_received = [], 0, 0
+        while True:
+            index = next(counter)
+            if index >= requests:
+                break
+            started = time.perf_counter()
+            try:
+                status, size = send(connection, index)
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = server.connect()
+                status, size = 0, 0
+            own_latencies.append(time.perf_counter() - started)
+            own_received += size
+            if not 200 <= status < 300:
+                own_errors += 1
+        connection.close()
+        with lock:
+            latencies.extend(own_latencies)
+            errors.append(own_errors)
+            received[0] += own_received
+
+    server.reset_peak_rss()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(min(concurrency, requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    result = {
+        'name': name,
+        'requests': requests,
+        'concurrency': len(threads),
+        'errors': sum(errors),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'peak_rss_mb': server.peak_rss_mb(),
+    }
+    transferred = payload_bytes * requests + received[0]
+    if payload_bytes or received[0] > requests * 4096:
+        result['mb_per_second'] = round(transferred / elapsed / 1024 ** 2, 1)
+    print(f"{name:40} {result['requests_per_second']:>9} req/s  p50 {result['p50_ms']:>8} ms  "
+          f"p99 {result['p99_ms']:>8} ms  errors {result['errors']}", flush=True)
+    return result
+
+
+def multipart(filename, data):
+    """Build a multipart/form-data upload body; returns (body, content type)."""
+    boundary = uuid.uuid4().hex
+    body = b''.join([
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'.encode(),
+        b'Content-Type: application/octet-stream\r\n\r\n',
+        data,
+        f'\r\n--{boundary}--\r\n'.encode(),
+    ])
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def scale(requests, size, budget=512 * 1024 ** 2):
+    """Reduce the request count of large payloads to a byte budget."""
+    return max(8, min(requests, budget // max(size, 1)))
+
+
+def bench_upload(server, args):
+    """POST /upload at several sizes; clients overwrite their own file."""
+    results = []
+    for size in args.upload_sizes:
+        data = os.urandom(size)
+        bodies = [multipart(f'bench-upload-{size}-{i}.bin', data) for i in range(args.concurrency)]
+
+        def send(connection, index, bodies=bodies):
+            body, content_type = bodies[index % len(bodies)]
+            return request(connection, 'POST', '/upload', body, {'Content-Type': content_type})
+
+        results.append(run_load(server, f'upload {size} B', send, scale(args.requests, size),
+                                args.concurrency, payload_bytes=len(bodies[0][0])))
+    return results
+
+
+def bench_download(server, args):
+    """GET /download of one file per size."""
+    results = []
+    connection = server.connect()
+    for size in args.upload_sizes:
+        filename = f'bench-download-{size}.bin'
+        body, content_type = multipart(filename, os.urandom(size))
+        status, _ = request(connection, 'POST', '/upload', body, {'Content-Type': content_type})
+        if status != 201:
+            raise RuntimeError(f"Upload for the download scenario failed: {status}")
+        results.append(run_load(
+            server, f'download {size} B',
+            lambda c, i, filename=filename: request(c, 'GET', f'/download/{filename}'),
+            scale(args.requests, size), args.concurrency
+        ))
+    connection.close()
+    return results
+
+
+def bench_files(server, args):
+    """GET /files with increasing numbers of files in the upload folder."""
+    if server.upload_folder is None:
+        print("files: skipped, --upload-folder is required with --url")
+        return []
+    directory = server.upload_folder
+    os.makedirs(directory, exist_ok=True)
+    results = []
+    created = 0
+    for count in args.file_counts:
+        for i in range(created, count):
+            with open(os.path.join(directory, f'bench-file-{i:06d}.txt'), 'wb') as f:
+                f.write(f'file {i}\n'.encode())
+        created = max(created, count)
+        results.append(run_load(
+            server, f'files {count} files',
+            lambda c, i: request(c, 'GET', '/files'),
+            max(3, min(args.requests, args.requests * 100 // count)), args.concurrency
+        ))
+    for i in range(created):
+        os.remove(os.path.join(directory, f'bench-file-{i:06d}.txt'))
+    return results
+
+
+def bench_process(server, args):
+    """Process listing/status under load and start/stop cycles."""
+    sleeper = os.path.join(server.scratch, SLEEPER)
+    shutil.copy(shutil.which('sleep'), sleeper)
+    headers = {'Content-Type': 'application/json'}
+    connection = server.connect()
+    status, _ = request(connection, 'POST', '/process/start',
+                        json.dumps({'command': [sleeper, '600']}), headers)
+    if status == 503:
+        print("process: skipped, process management not available")
+        return []
+
+    results = [
+        run_load(server, 'process list', lambda c, i: request(c, 'GET', '/process/list'),
+                 args.requests, args.concurrency),
+        run_load(server, 'process status', lambda c, i: request(c, 'GET', f'/process/status/{SLEEPER}'),
+                 args.requests, args.concurrency),
+    ]
+    request(connection, 'POST', '/process/stop', json.dumps({'process': SLEEPER}), headers)
+
+    def cycle(c, i):
+        status, size = request(c, 'POST', '/process/start',
+                               json.dumps({'command': [sleeper, '600'], 'check_running': False}), headers)
+        if status in (200, 201):
+            status, size = request(c, 'POST', '/process/stop', json.dumps({'process': SLEEPER}), headers)
+        return status, size
+
+    results.append(run_load(server, 'process start+stop', cycle, max(5, args.requests // 20), 1))
+    connection.close()
+    return results
+
+
+def bench_keyboard(server, args):
+    """POST /keyboard with wait=true on fake devices."""
+    if not server.in_process:
+        print("keyboard: skipped, only runs in-process with fake devices")
+        return []
+    body = json.dumps({'text': 'hello world', 'delay': 0, 'gap': 0, 'wait': True})
+    return [run_load(
+        server, 'keyboard 11 chars',
+        lambda c, i: request(c, 'POST', '/keyboard', body, {'Content-Type': 'application/json'}),
+        args.requests, args.concurrency
+    )]
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results with a baseline.
+
+    Returns:
+        list: Descriptions of regressions beyond the tolerance
+    """
+    previous = {result['name']: result for result in baseline['results']}
+    regressions = []
+    print(f"\n{'scenario':40} {'req/s':>16} {'p99 ms':>18}")
+    for result in results:
+        before = previous.get(result['name'])
+        if before is None:
+            continue
+        throughput = result['requests_per_second'] / before['requests_per_second'] - 1
+        p99 = result['p99_ms'] / before['p99_ms'] - 1 if before['p99_ms'] else 0
+        print(f"{result['name']:40} {result['requests_per_second']:>9} {throughput:>+6.1%} "
+              f"{result['p99_ms']:>10} {p99:>+6.1%}")
+        if throughput < -tolerance:
+            regressions.append(f"{result['name']}: throughput {throughput:+.1%}")
+        if p99 > tolerance:
+            regressions.append(f"{result['name']}: p99 latency {p99:+.1%}")
+    return regressions
+
+
+def main():
+    """Run the selected scenarios and print, save or compare the results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Base URL of a running local instance (default: in-process)')
+    parser.add_argument('--pid', type=int, help='PID of the running instance (for peak RSS)')
+    parser.add_argument('--upload-folder', help='Upload folder of the running instance (files scenario)')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma-separated scenarios')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+    parser.add_argument('--upload-sizes', default='1K,1M,16M', help='Upload/download sizes')
+    parser.add_argument('--file-counts', default='100,1000,10000', help='File counts for /files (up to 100000)')
+    parser.add_argument('--save', help='Write the results to a JSON baseline')
+    parser.add_argument('--compare', help='Compare with a JSON baseline; exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed relative regression')
+    args = parser.parse_args()
+    args.upload_sizes = [parse_size(size) for size in args.upload_sizes.split(',')]
+    args.file_counts = sorted(int(count) for count in args.file_counts.split(','))
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    server = Server(args.url, args.pid, args.upload_folder)
+    results = []
+    try:
+        for name in scenarios:
+            results.extend(globals()[f'bench_{name}'](server, args))
+    finally:
+        server.close()
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'in_process': args.url is None,
+            'concurrency': args.concurrency,
+        },
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            raise SystemExit(1)
+        print("\nNo regressions beyond the tolerance")
+    if not args.save and not args.compare:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Metrics Overhead Benchmark
+Measures the cost of Counter.inc() and Histogram.observe() from several
+threads, compared with a counter guarded by a shared lock.
+
+Usage:
+    python -m benchmarks.metrics_overhead [--threads 8] [--iterations 200000]
+"""
+
+import argparse
+import json
+import threading
+import time
+
+from metrics import Counter, Histogram
+
+
+class LockedCounter:
+    """Counter updated under one lock, for comparison."""
+
+    def __init__(self):
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, labels=()):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+
+def measure(name, update, threads, iterations):
+    """Run update() iterations times on each thread and return ns per call."""
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for _ in range(iterations):
+            update()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {'name': name, 'ns_per_call': round(elapsed / (threads * iterations) * 1e9, 1)}
+
+
+def main():
+    """Run the benchmark and print results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8, help='Updating threads')
+    parser.add_argument('--iterations', type=int, default=200000, help='Updates per thread')
+    args = parser.parse_args()
+
+    labels = ('GET', '/files', '200')
+    counter = Counter('bench_total', 'Benchmark counter', ('method', 'route', 'status'))
+    locked = LockedCounter()
+    histogram = Histogram('bench_seconds', 'Benchmark histogram', ('method', 'route'))
+
+    results = [
+        measure('noop', lambda: None, args.threads, args.iterations),
+        measure('Counter.inc', lambda: counter.inc(1, labels), args.threads, args.iterations),
+        measure('locked counter', lambda: locked.inc(1, labels), args.threads, args.iterations),
+        measure('Histogram.observe', lambda: histogram.observe(0.042, labels[:2]), args.threads, args.iterations),
+    ]
+    assert counter.values()[labels] == args.threads * args.iterations
+    print(json.dumps({'threads': args.threads, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
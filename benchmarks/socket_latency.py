@@ -0,0 +1,136 @@
+"""
+Socket Latency Benchmark
+Compares the latency of small requests over TCP (127.0.0.1) and a Unix
+domain socket: GET /health and POST /keyboard (one key, wait=true,
+delay=0, gap=0, fake UInput devices), each with a new connection per
+request, over one keep-alive connection, and through a requests session
+as the bundled client uses it.
+
+Usage:
+    python -m benchmarks.socket_latency [--requests 1000]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+import keyboard_emulator
+from benchmarks.fakes import FakeUInput
+from benchmarks.input_latency import summarize
+from worker_state import UnixHTTPConnection
+
+KEYBOARD_BODY = json.dumps({'keys': ['KEY_A'], 'wait': True, 'delay': 0, 'gap': 0})
+
+REQUESTS = {
+    'GET /health': ('GET', '/health', None),
+    'POST /keyboard': ('POST', '/keyboard', KEYBOARD_BODY),
+}
+
+
+def tcp_connection(port):
+    """Connection to the TCP listener without Nagle delays, like most clients."""
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    connection.connect()
+    connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return connection
+
+
+def send(connection, method, path, body):
+    """Send one request and read the response."""
+    headers = {'Content-Type': 'application/json'} if body else {}
+    connection.request(method, path, body, headers)
+    response = connection.getresponse()
+    response.read()
+    assert response.status == 200, response.status
+
+
+def measure_connections(connect, method, path, body, count, keep_alive):
+    """Time requests on one keep-alive connection or on a new one each."""
+    samples = []
+    connection = connect() if keep_alive else None
+    for _ in range(count):
+        started = time.perf_counter()
+        if not keep_alive:
+            connection = connect()
+        send(connection, method, path, body)
+        if not keep_alive:
+            connection.close()
+        samples.append(time.perf_counter() - started)
+    if keep_alive:
+        connection.close()
+    return samples
+
+
+def measure_session(base_url, method, path, body, count):
+    """Time requests through a requests session (connection pool)."""
+    import unix_adapter
+
+    session = unix_adapter.session()
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        response = session.request(method, base_url + path, data=body,
+                                   headers={'Content-Type': 'application/json'} if body else None)
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+    session.close()
+    return samples
+
+
+def main():
+    """Run the benchmark and print results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per case')
+    args = parser.parse_args()
+
+    keyboard_emulator.UInput = FakeUInput
+    from werkzeug.serving import make_server
+    from app import create_app
+    import unix_adapter
+
+    scratch = tempfile.mkdtemp(prefix='flask-api-bench-')
+    app = create_app({
+        'UPLOAD_FOLDER': os.path.join(scratch, 'uploads'),
+        'PROCESS_LOG_FOLDER': os.path.join(scratch, 'process_logs'),
+        'KEYBOARD_MACRO_FOLDER': os.path.join(scratch, 'macros'),
+        'LOG_LEVEL': 'WARNING',
+    })
+    socket_path = os.path.join(scratch, 'api.sock')
+    servers = [
+        make_server('127.0.0.1', 0, app, threaded=True),
+        make_server(f"unix://{socket_path}", 0, app, threaded=True),
+    ]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = servers[0].server_port
+
+    transports = {
+        'tcp': (lambda: tcp_connection(port), f"http://127.0.0.1:{port}"),
+        'unix': (lambda: UnixHTTPConnection(socket_path), unix_adapter.unix_url(socket_path)),
+    }
+    results = []
+    for name, (method, path, body) in REQUESTS.items():
+        for transport, (connect, base_url) in transports.items():
+            # Warm up caches and the keyboard device
+            measure_connections(connect, method, path, body, 20, keep_alive=True)
+            results.append(summarize(f"{name} {transport} new connection",
+                                     measure_connections(connect, method, path, body, args.requests, False)))
+            results.append(summarize(f"{name} {transport} keep-alive",
+                                     measure_connections(connect, method, path, body, args.requests, True)))
+            results.append(summarize(f"{name} {transport} requests session",
+                                     measure_session(base_url, method, path, body, args.requests)))
+
+    for server in servers:
+        server.shutdown()
+    shutil.rmtree(scratch, ignore_errors=True)
+    print(json.dumps({'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
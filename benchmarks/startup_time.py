@@ -0,0 +1,86 @@
+"""
+Startup Time Benchmark
+Times importing the app module, create_app() and the first use of each
+subsystem in fresh interpreters, using fake UInput devices, and reports
+which subsystem modules were imported before the first request (evdev
+itself is always loaded here to install the fake).
+
+Usage:
+    python -m benchmarks.startup_time [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter and prints one JSON line of timings
+PROBE = r'''
+import json, sys, time
+started = time.perf_counter()
+import keyboard_emulator
+from benchmarks.fakes import FakeUInput
+keyboard_emulator.UInput = FakeUInput
+import app as api
+imported = time.perf_counter()
+flask_app = api.create_app({'PROCESS_LOG_FOLDER': sys.argv[1], 'KEYBOARD_MACRO_FOLDER': sys.argv[1]})
+created = time.perf_counter()
+loaded = {module: module in sys.modules
+          for module in ('keyboard_pool', 'keyboard_macros', 'process_manager', 'psutil')}
+first_use = {}
+for name in ('keyboard_pool', 'keyboard_macros', 'process_manager'):
+    t = time.perf_counter()
+    api.subsystems.get(name)
+    first_use[name] = time.perf_counter() - t
+print(json.dumps({
+    'import_s': imported - started,
+    'create_app_s': created - imported,
+    'first_use_s': first_use,
+    'loaded_after_create_app': loaded,
+}))
+'''
+
+
+def probe(scratch):
+    """Run the probe once and return its timings."""
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, scratch],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    """Run the benchmark and print results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to time')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp()
+    runs = [probe(scratch) for _ in range(args.runs)]
+
+    def median_ms(values):
+        return round(statistics.median(values) * 1000, 2)
+
+    ready = [run['import_s'] + run['create_app_s'] for run in runs]
+    eager = [value + sum(run['first_use_s'].values()) for value, run in zip(ready, runs)]
+    print(json.dumps({
+        'runs': args.runs,
+        'import_ms': median_ms([run['import_s'] for run in runs]),
+        'create_app_ms': median_ms([run['create_app_s'] for run in runs]),
+        'ready_ms': median_ms(ready),
+        'first_use_ms': {name: median_ms([run['first_use_s'][name] for run in runs])
+                         for name in runs[0]['first_use_s']},
+        # Time to ready if every subsystem were created at startup
+        'eager_ready_ms': median_ms(eager),
+        'loaded_after_create_app': runs[0]['loaded_after_create_app'],
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
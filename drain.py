@@ -0,0 +1,139 @@
+"""
+Drain Module
+Graceful shutdown: stop taking new requests, then wait for the requests in
+flight and for background work (queued keyboard jobs) up to a timeout
+
+Used on SIGTERM by server.py and by /system/reboot before it reboots.
+Requests arriving while draining (e.g. on kept-alive connections) get 503
+with Retry-After and Connection: close. Endless streams (server-sent
+events, followed output) mark themselves exempt and are not waited for:
+their clients reconnect after the restart.
+"""
+
+import logging
+import threading
+import time
+
+from flask import json
+from werkzeug.wsgi import ClosingIterator
+
+from worker_state import INTERNAL_ENVIRON_KEY
+
+logger = logging.getLogger(__name__)
+
+# WSGI environ key marking requests that a drain does not wait for
+EXEMPT_ENVIRON_KEY = 'drain.exempt'
+
+
+class Drain:
+    """
+    Tracks requests in flight and background work to wait for.
+    """
+    
+    def __init__(self):
+        self.draining = False
+        self._active = {}  # Maps id(environ) to the environs of requests in flight
+        self._condition = threading.Condition()
+        self._waiters = []
+    
+    def add_waiter(self, waiter):
+        """
+        Register background work to wait for after the requests.
+        
+        Args:
+            waiter: Function(timeout) returning True once the work is done
+        """
+        self._waiters.append(waiter)
+    
+    def enter(self, environ):
+        """Track a request."""
+        with self._condition:
+            self._active[id(environ)] = environ
+    
+    def leave(self, environ):
+        """Stop tracking a request once its response is closed."""
+        with self._condition:
+            self._active.pop(id(environ), None)
+            self._condition.notify_all()
+    
+    def _pending(self):
+        return sum(1 for environ in self._active.values() if not environ.get(EXEMPT_ENVIRON_KEY))
+    
+    def in_flight(self):
+        """Number of requests in flight that a drain waits for."""
+        with self._condition:
+            return self._pending()
+    
+    def begin(self):
+        """Reject new requests from now on."""
+        if not self.draining:
+            self.draining = True
+            logger.info("Draining: %d requests in flight", self.in_flight())
+    
+    def end(self):
+        """Take new requests again after a drain that did not end in a shutdown."""
+        if self.draining:
+            self.draining = False
+            logger.info("Drain ended, taking requests again")
+    
+    def wait(self, timeout):
+        """
+        Wait for the requests in flight, then for the registered work.
+        
+        Args:
+            timeout: Seconds to wait in total
+            
+        Returns:
+            bool: True if everything finished in time
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._pending() == 0, timeout):
+                logger.warning("Drain timed out with %d requests in flight", self._pending())
+                return False
+        for waiter in self._waiters:
+            if not waiter(max(0.0, deadline - time.monotonic())):
+                logger.warning("Drain timed out waiting for background work")
+                return False
+        logger.info("Drained")
+        return True
+    
+    def status(self):
+        """
+        Describe the drain.
+        
+        Returns:
+            dict: Whether draining and the number of requests waited for
+        """
+        return {'draining': self.draining, 'in_flight': self.in_flight()}
+
+
+class DrainMiddleware:
+    """
+    WSGI middleware tracking requests for a Drain and rejecting new ones
+    while it drains.
+    """
+    
+    def __init__(self, wsgi_app, drain):
+        self.wsgi_app = wsgi_app
+        self.drain = drain
+    
+    def __call__(self, environ, start_response):
+        # Forwarded keyboard work from other workers is still served
+        if self.drain.draining and not environ.get(INTERNAL_ENVIRON_KEY):
+            body = json.dumps({'error': 'Server is shutting down', 'retry_after': 1}).encode()
+            start_response('503 SERVICE UNAVAILABLE', [
+                ('Content-Type', 'application/json'),
+                ('Content-Length', str(len(body))),
+                ('Retry-After', '1'),
+                ('Connection', 'close'),
+            ])
+            return [body]
+        
+        self.drain.enter(environ)
+        try:
+            response = self.wsgi_app(environ, start_response)
+        except BaseException:
+            self.drain.leave(environ)
+            raise
+        return ClosingIterator(response, lambda: self.drain.leave(environ))
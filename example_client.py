@@ -5,12 +5,17 @@ Demonstriert alle verfügbaren Funktionen
 """
 
 import requests
-import hashlib
 import sys
 import os
 
-# API-Konfiguration
-API_URL = "http://localhost:5000"
+import unix_adapter
+from api_client import APIError, Client, TransferError
+
+# API-Konfiguration: lokaler Unix-Socket, falls der Server darauf lauscht,
+# sonst TCP (überschreibbar mit FLASK_API_URL)
+API_URL = unix_adapter.api_url()
+session = unix_adapter.session()
+client = Client(API_URL)
 
 def print_section(title):
     """Drucke Abschnittsüberschrift"""
@@ -22,7 +27,7 @@ def test_api_info():
     """API-Informationen abrufen"""
     print_section("API Informationen")
     
-    response = requests.get(f"{API_URL}/")
+    response = session.get(f"{API_URL}/")
     print(f"Status: {response.status_code}")
     
     if response.status_code == 200:
@@ -44,48 +49,30 @@ def upload_file(filepath, verify_hash=True):
         print(f"Fehler: Datei nicht gefunden: {filepath}")
         return None
     
-    # Hash berechnen
-    sha256_hash = hashlib.sha256()
-    with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(chunk)
-    file_hash = sha256_hash.hexdigest()
-    
-    print(f"Berechne SHA256-Hash...")
-    print(f"Hash: {file_hash}")
-    
-    # Datei hochladen
-    with open(filepath, 'rb') as f:
-        files = {'file': f}
-        data = {}
-        
-        if verify_hash:
-            data['hash'] = file_hash
-            print(f"Upload mit Hash-Verifizierung...")
-        else:
-            print(f"Upload ohne Hash-Verifizierung...")
-        
-        response = requests.post(f"{API_URL}/upload", files=files, data=data)
-    
-    print(f"Status: {response.status_code}")
-    
-    if response.status_code == 201:
-        result = response.json()
-        print(f"✓ Upload erfolgreich!")
-        print(f"  Dateiname: {result['filename']}")
-        print(f"  Größe: {result['size']} Bytes")
-        print(f"  Hash: {result['hash']}")
-        print(f"  Hash verifiziert: {result['hash_verified']}")
-        return result['filename']
+    # Die Datei wird gestreamt und dabei gehasht; der Hash folgt den Daten
+    if verify_hash:
+        print(f"Upload mit Hash-Verifizierung...")
     else:
-        print(f"✗ Upload fehlgeschlagen: {response.json()}")
+        print(f"Upload ohne Hash-Verifizierung...")
+    
+    try:
+        result = client.upload(filepath, verify=verify_hash)
+    except APIError as e:
+        print(f"✗ Upload fehlgeschlagen: {e.payload}")
         return None
+    
+    print(f"✓ Upload erfolgreich!")
+    print(f"  Dateiname: {result.filename}")
+    print(f"  Größe: {result.size} Bytes")
+    print(f"  Hash: {result.hash}")
+    print(f"  Hash verifiziert: {result.hash_verified}")
+    return result.filename
 
 def list_files():
     """Alle hochgeladenen Dateien auflisten"""
     print_section("Dateiliste")
     
-    response = requests.get(f"{API_URL}/files")
+    response = session.get(f"{API_URL}/files")
     print(f"Status: {response.status_code}")
     
     if response.status_code == 200:
@@ -107,40 +94,19 @@ def download_file(filename, save_as=None):
     if save_as is None:
         save_as = f"downloaded_{filename}"
     
-    response = requests.get(f"{API_URL}/download/{filename}")
-    print(f"Status: {response.status_code}")
-    
-    if response.status_code == 200:
-        # Hash aus Header
-        expected_hash = response.headers.get('X-File-Hash')
-        algorithm = response.headers.get('X-Hash-Algorithm', 'sha256')
-        
-        print(f"Server-Hash ({algorithm}): {expected_hash}")
-        
-        # Datei speichern
-        with open(save_as, 'wb') as f:
-            f.write(response.content)
-        
-        # Hash berechnen und verifizieren
-        if algorithm == 'sha256':
-            hash_func = hashlib.sha256()
-        else:
-            hash_func = hashlib.new(algorithm)
-        
-        hash_func.update(response.content)
-        actual_hash = hash_func.hexdigest()
-        
-        print(f"Lokaler Hash: {actual_hash}")
-        
-        if expected_hash == actual_hash:
-            print(f"✓ Hash verifiziert! Datei gespeichert als: {save_as}")
-            return True
-        else:
-            print(f"✗ Hash-Fehler! Datei könnte beschädigt sein.")
-            return False
-    else:
-        print(f"✗ Download fehlgeschlagen: {response.json()}")
+    # Große Dateien werden in parallelen Byte-Bereichen geladen
+    try:
+        result = client.download(filename, save_as)
+    except APIError as e:
+        print(f"✗ Download fehlgeschlagen: {e.payload}")
         return False
+    except TransferError as e:
+        print(f"✗ Hash-Fehler! Datei könnte beschädigt sein: {e}")
+        return False
+    
+    print(f"Hash (sha256): {result.hash}")
+    print(f"✓ Hash verifiziert! Datei gespeichert als: {save_as} ({result.ranges} Bereich(e))")
+    return True
 
 def send_keyboard_text(text):
     """Text über Tastatur-Emulation senden"""
@@ -149,13 +115,13 @@ def send_keyboard_text(text):
     print(f"Text: '{text}'")
     
     data = {"text": text, "delay": 0.05}
-    response = requests.post(f"{API_URL}/keyboard", json=data)
+    response = session.post(f"{API_URL}/keyboard", json=data)
     
     print(f"Status: {response.status_code}")
     result = response.json()
     
-    if response.status_code == 200:
-        print(f"✓ Text erfolgreich gesendet!")
+    if response.status_code == 202:
+        print(f"✓ Text in Warteschlange! Job-ID: {result['job_id']}")
     elif response.status_code == 503:
         print(f"⚠ Tastatur-Emulation nicht verfügbar")
         print(f"  Grund: {result['message']}")
@@ -168,8 +134,8 @@ def send_keyboard_keys(keys):
     
     print(f"Tasten: {keys}")
     
-    data = {"keys": keys, "delay": 0.1}
-    response = requests.post(f"{API_URL}/keyboard", json=data)
+    data = {"keys": keys, "delay": 0.1, "wait": True}
+    response = session.post(f"{API_URL}/keyboard", json=data)
     
     print(f"Status: {response.status_code}")
     result = response.json()
@@ -191,7 +157,7 @@ def main():
     # Server-Erreichbarkeit prüfen
     try:
         print(f"\nVerbinde mit {API_URL}...")
-        requests.get(f"{API_URL}/health", timeout=2)
+        session.get(f"{API_URL}/health", timeout=2)
         print("✓ Server erreichbar\n")
     except requests.exceptions.ConnectionError:
         print(f"✗ Fehler: Kann nicht mit {API_URL} verbinden")
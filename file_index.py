@@ -0,0 +1,303 @@
+"""
+File Index Module
+In-memory index of the upload folder for lookups without hashing
+
+Secondary indexes, maintained incrementally:
+
+    hash        SHA256 -> file names
+    name        sorted file names (prefix search)
+    size        sorted (size, name)
+    modified    sorted (mtime in ns, name)
+
+Files are hashed once, when they are uploaded or first seen, and again
+only when their size or modification time changes. Uploads update the
+index directly. Changes made outside the API are picked up when the
+folder's modification time changes (files added, removed or renamed),
+and every file returned is checked with a stat() so in-place changes are
+never reported stale.
+"""
+
+import bisect
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Sorts after every file name in the name index
+NAME_MAX = '\U0010ffff'
+
+
+class IndexEntry:
+    """An indexed file."""
+
+    __slots__ = ('filename', 'size', 'mtime_ns', 'modified', 'hash')
+
+    def __init__(self, filename, stat, file_hash):
+        self.filename = filename
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.modified = stat.st_mtime
+        self.hash = file_hash
+
+    def matches(self, stat):
+        """True if the file still has the indexed size and modification time."""
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+    def to_dict(self):
+        """Return the file as listed by /files."""
+        return {
+            'filename': self.filename,
+            'size': self.size,
+            'modified': self.modified,
+            'hash': self.hash
+        }
+
+
+class FileIndex:
+    """
+    Index of the files in one folder.
+    """
+
+    def __init__(self, folder, hash_file):
+        """
+        Args:
+            folder: Folder to index (not recursive)
+            hash_file: Function(path) returning the SHA256 hex digest
+        """
+        self.folder = folder
+        self.hash_file = hash_file
+        self.hashed = 0
+        self._entries = {}
+        self._by_hash = {}
+        self._names = []
+        self._by_size = []
+        self._by_modified = []
+        self._version = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    def _path(self, filename):
+        return os.path.join(self.folder, filename)
+
+    def _insert(self, entry):
+        """Add an entry to all indexes, replacing one of the same name (lock held)."""
+        self._remove(entry.filename)
+        self._entries[entry.filename] = entry
+        self._by_hash.setdefault(entry.hash, set()).add(entry.filename)
+        bisect.insort(self._names, entry.filename)
+        bisect.insort(self._by_size, (entry.size, entry.filename))
+        bisect.insort(self._by_modified, (entry.mtime_ns, entry.filename))
+
+    def _remove(self, filename):
+        """Drop an entry from all indexes (lock held)."""
+        entry = self._entries.pop(filename, None)
+        if entry is None:
+            return
+        names = self._by_hash[entry.hash]
+        names.discard(filename)
+        if not names:
+            del self._by_hash[entry.hash]
+        for index, key in ((self._names, filename), (self._by_size, (entry.size, filename)),
+                           (self._by_modified, (entry.mtime_ns, filename))):
+            del index[bisect.bisect_left(index, key)]
+
+    def _hash(self, filename):
+        """Hash a file and build its entry; None if it cannot be read."""
+        path = self._path(filename)
+        try:
+            # Stat first: a file changed while it is hashed no longer matches
+            # its entry and is hashed again when it is returned
+            stat = os.stat(path)
+            file_hash = self.hash_file(path)
+        except OSError as ex:
+            logger.warning("Cannot index %s: %s", filename, ex)
+            return None
+        self.hashed += 1
+        return IndexEntry(filename, stat, file_hash)
+
+    def sync(self):
+        """
+        Bring the index up to date if the folder changed.
+
+        Only new files and files whose size or modification time changed
+        are hashed. Lookups made meanwhile do not wait; they see the index
+        as it was.
+        """
+        try:
+            version = os.stat(self.folder).st_mtime_ns
+        except FileNotFoundError:
+            version = None
+        if version == self._version or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            if version == self._version:
+                return
+            listing = {}
+            if version is not None:
+                with os.scandir(self.folder) as entries:
+                    for item in entries:
+                        try:
+                            if item.is_file():
+                                listing[item.name] = item.stat()
+                        except OSError:
+                            continue
+            with self._lock:
+                for filename in [name for name in self._entries if name not in listing]:
+                    self._remove(filename)
+                changed = [name for name, stat in listing.items()
+                           if name not in self._entries or not self._entries[name].matches(stat)]
+            for filename in changed:
+                entry = self._hash(filename)
+                with self._lock:
+                    if entry is not None:
+                        self._insert(entry)
+                    else:
+                        self._remove(filename)
+            if changed:
+                logger.debug("Indexed %d changed files in %s", len(changed), self.folder)
+            self._version = version
+        finally:
+            self._sync_lock.release()
+
+    def add(self, filename, file_hash=None):
+        """
+        Index a file that was just written.
+
+        Args:
+            filename: Name in the folder
+            file_hash: SHA256 if already known (hashed otherwise)
+
+        Returns:
+            IndexEntry or None if the file is gone
+        """
+        if file_hash:
+            try:
+                entry = IndexEntry(filename, os.stat(self._path(filename)), file_hash)
+            except FileNotFoundError:
+                entry = None
+        else:
+            entry = self._hash(filename)
+        with self._lock:
+            if entry is not None:
+                self._insert(entry)
+            else:
+                self._remove(filename)
+        return entry
+
+    def current(self, filename):
+        """
+        Entry of a file, checked against the file itself.
+
+        Returns:
+            IndexEntry, rehashed if the file changed, or None if it is gone
+        """
+        entry = self._entries.get(filename)
+        try:
+            stat = os.stat(self._path(filename))
+        except FileNotFoundError:
+            if entry is not None:
+                with self._lock:
+                    self._remove(filename)
+            return None
+        if entry is not None and entry.matches(stat):
+            return entry
+        return self.add(filename)
+
+    def file_hash(self, filename):
+        """SHA256 of a file, hashed only if it changed since it was indexed."""
+        entry = self.current(filename)
+        return entry.hash if entry is not None else None
+
+    def list(self):
+        """
+        All files.
+
+        Returns:
+            list: IndexEntry, newest first
+        """
+        self.sync()
+        entries = [self.current(name) for name in list(self._entries)]
+        return sorted((entry for entry in entries if entry is not None), key=lambda entry: entry.modified,
+                      reverse=True)
+
+    def by_hash(self, file_hash):
+        """
+        Files with a SHA256.
+
+        Returns:
+            list: IndexEntry ordered by name
+        """
+        self.sync()
+        with self._lock:
+            names = sorted(self._by_hash.get(file_hash.lower(), ()))
+        entries = [self.current(name) for name in names]
+        return [entry for entry in entries if entry is not None and entry.hash == file_hash.lower()]
+
+    def search(self, prefix=None, min_size=None, max_size=None, min_modified=None, max_modified=None, limit=None):
+        """
+        Files matching all given conditions.
+
+        The name index serves prefix searches, else the size or the
+        modification time index; the other conditions filter its range.
+
+        Args:
+            prefix: File name prefix
+            min_size, max_size: Size range in bytes (inclusive)
+            min_modified, max_modified: Modification time range in seconds
+                since the epoch (inclusive)
+            limit: Maximum number of files
+
+        Returns:
+            tuple: (list of IndexEntry, True if limit cut the result)
+        """
+        self.sync()
+        min_ns = None if min_modified is None else int(min_modified * 1e9)
+        max_ns = None if max_modified is None else int(max_modified * 1e9)
+
+        def wanted(entry):
+            return ((prefix is None or entry.filename.startswith(prefix))
+                    and (min_size is None or entry.size >= min_size)
+                    and (max_size is None or entry.size <= max_size)
+                    and (min_ns is None or entry.mtime_ns >= min_ns)
+                    and (max_ns is None or entry.mtime_ns <= max_ns))
+
+        with self._lock:
+            if prefix:
+                start = bisect.bisect_left(self._names, prefix)
+                end = bisect.bisect_left(self._names, prefix + NAME_MAX)
+                candidates = self._names[start:end]
+            elif min_size is not None or max_size is not None:
+                start = bisect.bisect_left(self._by_size, (min_size or 0,))
+                end = len(self._by_size) if max_size is None else bisect.bisect_left(self._by_size, (max_size + 1,))
+                candidates = [name for _, name in self._by_size[start:end]]
+            elif min_ns is not None or max_ns is not None:
+                start = 0 if min_ns is None else bisect.bisect_left(self._by_modified, (min_ns,))
+                end = len(self._by_modified) if max_ns is None else bisect.bisect_left(self._by_modified,
+                                                                                       (max_ns + 1,))
+                candidates = [name for _, name in self._by_modified[start:end]]
+            else:
+                candidates = list(self._names)
+
+        results = []
+        for name in candidates:
+            entry = self._entries.get(name)
+            if entry is None or not wanted(entry):
+                continue
+            # Changed in place: the fresh entry may no longer match
+            entry = self.current(name)
+            if entry is None or not wanted(entry):
+                continue
+            if limit is not None and len(results) == limit:
+                return results, True
+            results.append(entry)
+        return results, False
+
+    def status(self):
+        """
+        Describe the index.
+
+        Returns:
+            dict: Files indexed and files hashed since start
+        """
+        return {'files': len(self._entries), 'hashed': self.hashed}
@@ -0,0 +1,285 @@
+"""
+Input Channel Module
+Persistent socket channel forwarding a line protocol straight to uinput
+
+Each line is one command; arguments are separated by whitespace:
+    down <key>            Key down (e.g. "down ctrl", "d KEY_A")
+    up <key>              Key up
+    press <key>           Key down and up
+    type <text>           Type the rest of the line using the device layout
+    move <dx> <dy>        Relative pointer movement
+    button <name> <0|1>   Pointer button (left, right, middle) up/down
+    wheel <steps>         Scroll wheel
+    device <name>         Select the keyboard device of this connection
+    release               Release all keys and buttons held by this connection
+    ping [token]          Reply "pong [token]" once all previous input is written
+
+Commands are answered only on error ("err <message>") and by ping, so a
+client can pipeline input without waiting for round trips.
+"""
+
+import logging
+import os
+import socket
+import socketserver
+import threading
+
+from evdev import UInput, ecodes as e
+
+from keyboard_macros import resolve_key_name
+
+logger = logging.getLogger(__name__)
+
+# Single-letter aliases of the commands
+COMMAND_ALIASES = {
+    'd': 'down', 'u': 'up', 'p': 'press', 't': 'type',
+    'm': 'move', 'b': 'button', 'w': 'wheel',
+}
+
+POINTER_BUTTONS = {
+    'left': e.BTN_LEFT, 'right': e.BTN_RIGHT, 'middle': e.BTN_MIDDLE,
+}
+
+# Longest accepted command line in bytes
+MAX_LINE_LENGTH = 65536
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class PointerDevice:
+    """
+    Virtual relative pointer (mouse) device.
+    """
+
+    def __init__(self, ui=None):
+        """
+        Create the device.
+
+        Args:
+            ui: Optional UInput-compatible sink to use instead of creating a device
+        """
+        self.lock = threading.Lock()
+        if ui is None:
+            ui = UInput(
+                {e.EV_KEY: list(POINTER_BUTTONS.values()), e.EV_REL: [e.REL_X, e.REL_Y, e.REL_WHEEL]},
+                name='virtual-pointer'
+            )
+            logger.info("Virtual pointer device created successfully")
+        self.ui = ui
+
+
+class InputChannel:
+    """
+    Line protocol handler shared by all transports.
+
+    Keyboard input is written to the devices of a KeyboardPool under the
+    device lock, so it never interleaves with queued keyboard jobs.
+    """
+
+    def __init__(self, pool, pointer_factory=PointerDevice):
+        """
+        Args:
+            pool: KeyboardPool with the target keyboard devices
+            pointer_factory: Callable creating the pointer device on first use
+        """
+        self.pool = pool
+        self._pointer_factory = pointer_factory
+        self._pointer = None
+        self._pointer_lock = threading.Lock()
+        self._servers = []
+        self._connections_lock = threading.Lock()
+        self.connections = 0
+
+    @property
+    def pointer(self):
+        """Pointer device, created on first use."""
+        with self._pointer_lock:
+            if self._pointer is None:
+                self._pointer = self._pointer_factory()
+            return self._pointer
+
+    def handle(self, rfile, wfile):
+        """
+        Process commands until the client disconnects.
+
+        Args:
+            rfile: Binary file object to read lines from
+            wfile: Binary file object for replies
+        """
+        device = self.pool.get()
+        keys = {}  # Resolved key names of this connection
+        held = set()
+        buttons = set()
+        with self._connections_lock:
+            self.connections += 1
+        try:
+            while True:
+                line = rfile.readline(MAX_LINE_LENGTH)
+                if not line:
+                    break
+                try:
+                    reply = self._command(line.decode('utf-8').rstrip('\r\n'), device, keys, held, buttons)
+                except (ValueError, KeyError, IndexError) as ex:
+                    message = ex.args[0] if ex.args else type(ex).__name__
+                    reply = f"err {message}"
+                if isinstance(reply, tuple):
+                    # Device switch: release keys held on the previous device
+                    self._release(device, held)
+                    device, reply = reply
+                if reply is not None:
+                    wfile.write(reply.encode('utf-8') + b'\n')
+                    wfile.flush()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._release(device, held)
+            if buttons:
+                self._release_buttons(buttons)
+            with self._connections_lock:
+                self.connections -= 1
+
+    def _command(self, line, device, keys, held, buttons):
+        """Execute one command line and return the reply (or None)."""
+        command, _, argument = line.lstrip().partition(' ')
+        command = COMMAND_ALIASES.get(command, command)
+        if not command:
+            return None
+
+        if command in ('down', 'up', 'press'):
+            key_code = keys.get(argument)
+            if key_code is None:
+                key_code = keys[argument] = resolve_key_name(argument.strip())
+            ui = device.emulator.ui
+            with device.emulator.lock:
+                if command != 'up':
+                    ui.write(e.EV_KEY, key_code, 1)
+                    ui.syn()
+                if command != 'down':
+                    ui.write(e.EV_KEY, key_code, 0)
+                    ui.syn()
+                device.emulator.events_written += 2 if command == 'press' else 1
+            if command == 'down':
+                held.add(key_code)
+            else:
+                held.discard(key_code)
+        elif command == 'type':
+            emulator = device.emulator
+            events = emulator.compile_text(argument)
+            with emulator.lock:
+                emulator.emit(events, delay=0, gap=0)
+        elif command in ('move', 'button', 'wheel'):
+            args = argument.split()
+            pointer = self.pointer
+            with pointer.lock:
+                if command == 'move':
+                    pointer.ui.write(e.EV_REL, e.REL_X, int(args[0]))
+                    pointer.ui.write(e.EV_REL, e.REL_Y, int(args[1]))
+                elif command == 'button':
+                    if args[0] not in POINTER_BUTTONS:
+                        raise ValueError(f"Unknown button: {args[0]}")
+                    button, pressed = POINTER_BUTTONS[args[0]], args[1] == '1'
+                    pointer.ui.write(e.EV_KEY, button, 1 if pressed else 0)
+                    if pressed:
+                        buttons.add(button)
+                    else:
+                        buttons.discard(button)
+                else:
+                    pointer.ui.write(e.EV_REL, e.REL_WHEEL, int(args[0]))
+                pointer.ui.syn()
+        elif command == 'device':
+            return self.pool.get(argument.strip()), f"ok {argument.strip()}"
+        elif command == 'release':
+            self._release(device, held)
+            if buttons:
+                self._release_buttons(buttons)
+        elif command == 'ping':
+            return f"pong {argument}".rstrip()
+        else:
+            raise ValueError(f"Unknown command: {command}")
+        return None
+
+    @staticmethod
+    def _release(device, held):
+        """Release keys a connection still holds."""
+        if not held:
+            return
+        ui = device.emulator.ui
+        with device.emulator.lock:
+            for key_code in held:
+                ui.write(e.EV_KEY, key_code, 0)
+            ui.syn()
+            device.emulator.events_written += len(held)
+        held.clear()
+
+    def _release_buttons(self, buttons):
+        """Release pointer buttons a connection still holds."""
+        pointer = self.pointer
+        with pointer.lock:
+            for button in buttons:
+                pointer.ui.write(e.EV_KEY, button, 0)
+            pointer.ui.syn()
+        buttons.clear()
+
+    def _handler(self):
+        """Build a socketserver handler bound to this channel."""
+        channel = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def setup(self):
+                if self.request.family in (socket.AF_INET, socket.AF_INET6):
+                    self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                super().setup()
+
+            def handle(self):
+                channel.handle(self.rfile, self.wfile)
+
+        return Handler
+
+    def _start(self, server, address):
+        """Serve a server on a daemon thread."""
+        thread = threading.Thread(target=server.serve_forever, name='input-channel', daemon=True)
+        thread.start()
+        self._servers.append(server)
+        logger.info("Input channel listening on %s", address)
+        return server
+
+    def serve_tcp(self, host='127.0.0.1', port=5001):
+        """
+        Listen on a TCP port.
+
+        Returns:
+            socketserver.ThreadingTCPServer
+        """
+        server = _TCPServer((host, port), self._handler())
+        return self._start(server, f"{host}:{server.server_address[1]}")
+
+    def serve_unix(self, path, mode=0o660):
+        """
+        Listen on a Unix domain socket.
+
+        Args:
+            path: Socket path (an existing socket file is replaced)
+            mode: Permissions of the socket file
+
+        Returns:
+            socketserver.ThreadingUnixStreamServer
+        """
+        if os.path.exists(path):
+            os.remove(path)
+        server = _UnixServer(path, self._handler())
+        os.chmod(path, mode)
+        return self._start(server, path)
+
+    def close(self):
+        """Stop all listeners."""
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
@@ -68,6 +68,14 @@ if [ "$SCRIPT_DIR" != "$INSTALL_DIR" ]; then
     else
         echo "Warning: flask-api.service not found"
     fi
+    
+    # Copy socket unit (listening sockets kept open across restarts)
+    if [ -f "$SCRIPT_DIR/flask-api.socket" ]; then
+        cp "$SCRIPT_DIR/flask-api.socket" /etc/systemd/system/
+        echo "✓ Copied flask-api.socket"
+    else
+        echo "Warning: flask-api.socket not found"
+    fi
 fi
 
 # Change to installation directory
@@ -110,6 +118,7 @@ fi
 if [ -f "/etc/systemd/system/flask-api.service" ]; then
     echo "Installing systemd service..."
     systemctl daemon-reload
+    systemctl enable flask-api.socket
     systemctl enable flask-api.service
     
     echo ""
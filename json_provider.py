@@ -0,0 +1,91 @@
+"""
+JSON Provider Module
+Flask JSON provider backed by orjson when it is installed
+
+orjson serializes the dicts and lists returned by the API several times
+faster than the stdlib encoder and produces bytes directly. Values it
+cannot handle (e.g. integers beyond 64 bits) fall back to the stdlib
+provider, so responses are the same with and without orjson.
+"""
+
+import logging
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('auto', 'orjson', 'stdlib')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    DefaultJSONProvider that serializes with orjson.
+    """
+
+    def _options(self, indent=None):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def _encode(self, obj, indent=None):
+        """Serialize to bytes, or return None if orjson cannot handle obj."""
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(indent))
+        except TypeError:
+            return None
+
+    def dumps(self, obj, **kwargs):
+        """Serialize obj to a JSON string."""
+        if set(kwargs) <= {'indent', 'separators'}:
+            data = self._encode(obj, kwargs.get('indent'))
+            if data is not None:
+                return data.decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        """Deserialize a JSON string or bytes."""
+        if kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # Same error type and message as the stdlib provider
+            return super().loads(s)
+
+    def response(self, *args, **kwargs):
+        """Build a JSON response without an intermediate str."""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        data = self._encode(obj, indent)
+        if data is None:
+            return super().response(obj)
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
+
+
+def install(app, backend='auto'):
+    """
+    Select the JSON backend of an app.
+
+    Args:
+        app: Flask application
+        backend: 'auto' (orjson if installed), 'orjson' or 'stdlib'
+
+    Returns:
+        str: Backend in use
+    """
+    if backend == 'stdlib':
+        return 'stdlib'
+    if orjson is None:
+        if backend == 'orjson':
+            logger.warning("orjson is not installed (pip install orjson), using the stdlib JSON encoder")
+        return 'stdlib'
+    app.json = OrjsonProvider(app)
+    return 'orjson'
@@ -4,12 +4,34 @@ Uses Linux evdev/uinput to emulate keyboard input
 Works on Armbian Linux kernel (Radxa Rock 5b compatible)
 """
 
-import time
 import logging
+import threading
 from evdev import UInput, ecodes as e
 
+from keyboard_layouts import (
+    MOD_SHIFT, MOD_ALTGR, MOD_CTRL, MOD_DEAD, MODIFIER_KEYS, UNICODE_FALLBACKS, get_layout
+)
+from keyboard_timing import DeadlineScheduler
+
 logger = logging.getLogger(__name__)
 
+# Pseudo event type in compiled event streams, never written to the device.
+# Marks the end of one logical input unit (a character or key); emission
+# applies the per-unit delay and reports progress there.
+EV_MARK = -1
+
+# Pseudo event type for an explicit pause; the value is in milliseconds
+EV_WAIT = -2
+
+# Default hold time between frames of one unit (e.g. key press and release)
+DEFAULT_GAP = 0.01
+
+SYN_EVENT = (e.EV_SYN, e.SYN_REPORT, 0)
+MARK_EVENT = (EV_MARK, 0, 0)
+
+# Modifier bits that are held while a key is pressed
+HELD_MODIFIERS = MOD_SHIFT | MOD_ALTGR | MOD_CTRL
+
 
 class KeyboardEmulator:
     """
@@ -17,47 +39,42 @@ class KeyboardEmulator:
     Requires permissions to access /dev/uinput (usually root or input group).
     """
     
-    # Mapping of common characters to key codes
-    CHAR_TO_KEY = {
-        'a': e.KEY_A, 'b': e.KEY_B, 'c': e.KEY_C, 'd': e.KEY_D, 'e': e.KEY_E,
-        'f': e.KEY_F, 'g': e.KEY_G, 'h': e.KEY_H, 'i': e.KEY_I, 'j': e.KEY_J,
-        'k': e.KEY_K, 'l': e.KEY_L, 'm': e.KEY_M, 'n': e.KEY_N, 'o': e.KEY_O,
-        'p': e.KEY_P, 'q': e.KEY_Q, 'r': e.KEY_R, 's': e.KEY_S, 't': e.KEY_T,
-        'u': e.KEY_U, 'v': e.KEY_V, 'w': e.KEY_W, 'x': e.KEY_X, 'y': e.KEY_Y,
-        'z': e.KEY_Z,
-        '0': e.KEY_0, '1': e.KEY_1, '2': e.KEY_2, '3': e.KEY_3, '4': e.KEY_4,
-        '5': e.KEY_5, '6': e.KEY_6, '7': e.KEY_7, '8': e.KEY_8, '9': e.KEY_9,
-        ' ': e.KEY_SPACE, '\n': e.KEY_ENTER, '\t': e.KEY_TAB,
-        '-': e.KEY_MINUS, '=': e.KEY_EQUAL, '[': e.KEY_LEFTBRACE,
-        ']': e.KEY_RIGHTBRACE, ';': e.KEY_SEMICOLON, "'": e.KEY_APOSTROPHE,
-        '`': e.KEY_GRAVE, '\\': e.KEY_BACKSLASH, ',': e.KEY_COMMA,
-        '.': e.KEY_DOT, '/': e.KEY_SLASH,
-    }
-    
-    # Characters that require shift key
-    SHIFT_CHARS = {
-        'A': 'a', 'B': 'b', 'C': 'c', 'D': 'd', 'E': 'e', 'F': 'f', 'G': 'g',
-        'H': 'h', 'I': 'i', 'J': 'j', 'K': 'k', 'L': 'l', 'M': 'm', 'N': 'n',
-        'O': 'o', 'P': 'p', 'Q': 'q', 'R': 'r', 'S': 's', 'T': 't', 'U': 'u',
-        'V': 'v', 'W': 'w', 'X': 'x', 'Y': 'y', 'Z': 'z',
-        '!': '1', '@': '2', '#': '3', '$': '4', '%': '5', '^': '6', '&': '7',
-        '*': '8', '(': '9', ')': '0',
-        '_': '-', '+': '=', '{': '[', '}': ']', '|': '\\',
-        ':': ';', '"': "'", '<': ',', '>': '.', '?': '/',
-        '~': '`',
-    }
-    
-    def __init__(self):
-        """Initialize the virtual keyboard device."""
+    def __init__(self, ui=None, layout='us', unicode_fallback=None, device_name=None):
+        """
+        Initialize the virtual keyboard device.
+        
+        Args:
+            ui: Optional UInput-compatible sink to use instead of creating
+                a device (e.g. a fake sink for benchmarks)
+            layout: Keyboard layout of the target (e.g. 'us', 'de', 'fr')
+            unicode_fallback: How to type characters the layout lacks:
+                None to skip them or 'ctrl_shift_u' for the IBus/GTK
+                Ctrl+Shift+U hex entry sequence
+            device_name: Name of the created input device (None = evdev default)
+        """
+        if unicode_fallback is not None and unicode_fallback not in UNICODE_FALLBACKS:
+            raise ValueError(f"Unknown Unicode fallback: {unicode_fallback}")
+        self.layout = layout
+        self.layout_table = get_layout(layout)
+        self.unicode_fallback = unicode_fallback
+        # Held by every writer (job queue, input channel) for the duration
+        # of its input so streams from different sources never interleave
+        self.lock = threading.Lock()
+        # Input events written to the device (updated under lock)
+        self.events_written = 0
+        
+        if ui is not None:
+            self.ui = ui
+            return
         try:
             # Create a virtual keyboard device
-            self.ui = UInput()
+            self.ui = UInput(name=device_name) if device_name else UInput()
             logger.info("Virtual keyboard device created successfully")
         except PermissionError:
             logger.error("Permission denied to access /dev/uinput. Run as root or add user to input group.")
             raise
         except Exception as ex:
-            logger.error(f"Failed to create virtual keyboard: {ex}")
+            logger.error("Failed to create virtual keyboard: %s", ex)
             raise
     
     def __del__(self):
@@ -68,148 +85,296 @@ class KeyboardEmulator:
             except Exception:
                 pass
     
-    def send_key(self, key_name, delay=0.1):
+    @staticmethod
+    def resolve_key(key_name):
         """
-        Send a single key press and release.
+        Resolve a key name to an evdev key code.
         
         Args:
-            key_name: Key name (e.g., 'KEY_A', 'KEY_ENTER') or evdev key code
-            delay: Delay after keypress in seconds
+            key_name: Key name (e.g., 'KEY_A') or evdev key code
+            
+        Returns:
+            int: Key code
         """
-        try:
-            # Get key code
-            if isinstance(key_name, str):
-                if hasattr(e, key_name):
-                    key_code = getattr(e, key_name)
-                else:
-                    raise ValueError(f"Unknown key: {key_name}")
+        if isinstance(key_name, str):
+            if hasattr(e, key_name):
+                return getattr(e, key_name)
+            raise ValueError(f"Unknown key: {key_name}")
+        return key_name
+    
+    def compile_text(self, text, layout=None):
+        """
+        Compile text into a flat event stream.
+        
+        The stream is a list of (type, code, value) tuples: EV_KEY events,
+        SYN_REPORT events closing each frame and EV_MARK after every
+        character. Modifier changes share a frame with the following key
+        press, and a run of characters on the same level (e.g. capitals)
+        holds its modifiers only once. Characters missing from the layout
+        use the Unicode fallback or are skipped.
+        
+        Args:
+            text: Text to compile
+            layout: Layout name overriding the emulator's layout
+            
+        Returns:
+            list: Event stream for emit()
+        """
+        table = self.layout_table if layout is None else get_layout(layout)
+        events = []
+        held = 0
+        unsupported = set()
+        
+        for char in text:
+            entry = table.get(char)
+            if entry is not None:
+                held = self._append_key(events, entry[0], entry[1], held)
+            elif self.unicode_fallback is not None:
+                held = self._append_unicode(events, char, table, held)
             else:
-                key_code = key_name
+                unsupported.add(char)
+                continue
+            events.append(MARK_EVENT)
+        
+        if held:
+            # Release modifiers before the final mark so the stream ends clean
+            mark = events.pop()
+            self._append_modifiers(events, held, 0)
+            events.append(SYN_EVENT)
+            events.append(mark)
+        
+        for char in unsupported:
+            logger.warning("Character '%s' not supported by layout %s", char, layout or self.layout)
+        return events
+    
+    @staticmethod
+    def _append_modifiers(events, held, wanted):
+        """Append modifier releases/presses to go from held to wanted."""
+        for bit, key_code in MODIFIER_KEYS:
+            if held & bit and not wanted & bit:
+                events.append((e.EV_KEY, key_code, 0))
+        for bit, key_code in MODIFIER_KEYS:
+            if wanted & bit and not held & bit:
+                events.append((e.EV_KEY, key_code, 1))
+    
+    def _append_key(self, events, key_code, mask, held):
+        """
+        Append one key stroke with its modifiers.
+        
+        Args:
+            events: Event stream to extend
+            key_code: Key code to press
+            mask: Modifier mask from the layout table
+            held: Modifier mask currently held
+            
+        Returns:
+            int: Modifier mask held afterwards
+        """
+        wanted = mask & HELD_MODIFIERS
+        if wanted != held:
+            self._append_modifiers(events, held, wanted)
+        events.extend(((e.EV_KEY, key_code, 1), SYN_EVENT, (e.EV_KEY, key_code, 0), SYN_EVENT))
+        
+        if mask & MOD_DEAD:
+            # Dead key: Space without modifiers produces the character itself
+            self._append_modifiers(events, wanted, 0)
+            events.extend(((e.EV_KEY, e.KEY_SPACE, 1), SYN_EVENT, (e.EV_KEY, e.KEY_SPACE, 0), SYN_EVENT))
+            return 0
+        return wanted
+    
+    def _append_unicode(self, events, char, table, held):
+        """
+        Append the Ctrl+Shift+U hex entry sequence for a character.
+        
+        Args:
+            events: Event stream to extend
+            char: Character to enter
+            table: Layout table used for the hex digits
+            held: Modifier mask currently held
             
-            # Press key
-            self.ui.write(e.EV_KEY, key_code, 1)
-            self.ui.syn()
+        Returns:
+            int: Modifier mask held afterwards
+        """
+        self._append_modifiers(events, held, MOD_CTRL | MOD_SHIFT)
+        events.extend(((e.EV_KEY, e.KEY_U, 1), SYN_EVENT, (e.EV_KEY, e.KEY_U, 0)))
+        self._append_modifiers(events, MOD_CTRL | MOD_SHIFT, 0)
+        events.append(SYN_EVENT)
+        
+        held = 0
+        for digit in f"{ord(char):x}":
+            key_code, mask = table[digit]
+            held = self._append_key(events, key_code, mask, held)
+        return self._append_key(events, e.KEY_SPACE, 0, held)
+    
+    def compile_keys(self, keys):
+        """
+        Compile a list of keys, each pressed and released on its own.
+        
+        Args:
+            keys: Key names or evdev key codes
             
-            # Small delay
-            time.sleep(0.01)
+        Returns:
+            list: Event stream for emit()
+        """
+        events = []
+        for key_name in keys:
+            key_code = self.resolve_key(key_name)
+            events.extend((
+                (e.EV_KEY, key_code, 1), SYN_EVENT,
+                (e.EV_KEY, key_code, 0), SYN_EVENT,
+                MARK_EVENT
+            ))
+        return events
+    
+    def compile_combination(self, keys):
+        """
+        Compile a key combination: press all keys, release in reverse order.
+        
+        Args:
+            keys: Key names or evdev key codes
             
-            # Release key
-            self.ui.write(e.EV_KEY, key_code, 0)
-            self.ui.syn()
+        Returns:
+            list: Event stream for emit()
+        """
+        key_codes = [self.resolve_key(key_name) for key_name in keys]
+        events = []
+        for key_code in key_codes:
+            events.extend(((e.EV_KEY, key_code, 1), SYN_EVENT))
+        for key_code in reversed(key_codes):
+            events.extend(((e.EV_KEY, key_code, 0), SYN_EVENT))
+        events.append(MARK_EVENT)
+        return events
+    
+    def emit(self, events, delay=0.0, gap=DEFAULT_GAP, on_mark=None, on_wait=None, stats=None):
+        """
+        Write a compiled event stream to the device.
+        
+        Pauses are scheduled against absolute monotonic deadlines, so the
+        time spent writing and sleep overshoot do not add up over long texts.
+        Keys still held when the emission stops early (a cancelled job, a
+        failed write) are released, so modifiers held across a run of
+        characters do not stay stuck.
+        
+        Args:
+            events: Event stream from one of the compile methods
+            delay: Delay after each unit (EV_MARK) in seconds
+            gap: Delay between frames within a unit in seconds (0 = none)
+            on_mark: Optional callback invoked at every EV_MARK; it may
+                raise to abort the emission
+            on_wait: Optional callback replacing time.sleep for EV_WAIT
+                pauses (e.g. to make them interruptible)
+            stats: Optional PacingStats updated with requested and
+                achieved timing
             
-            # Delay before next key
-            if delay > 0:
-                time.sleep(delay)
-                
+        Returns:
+            int: Number of units emitted
+        """
+        write = self.ui.write
+        syn = self.ui.syn
+        scheduler = DeadlineScheduler(stats)
+        advance = scheduler.advance
+        syn_type = e.EV_SYN
+        key_type = e.EV_KEY
+        held = {}  # Pressed key codes in press order
+        pending_gap = False
+        units = 0
+        written = 0
+        
+        try:
+            for event in events:
+                event_type = event[0]
+                if event_type == EV_MARK:
+                    units += 1
+                    pending_gap = False
+                    if on_mark is not None:
+                        on_mark()
+                    if delay > 0:
+                        advance(delay)
+                elif event_type == EV_WAIT:
+                    pending_gap = False
+                    advance(event[2] / 1000, on_wait)
+                elif event_type == syn_type:
+                    syn()
+                    pending_gap = True
+                else:
+                    if pending_gap and gap > 0:
+                        advance(gap)
+                    pending_gap = False
+                    write(event_type, event[1], event[2])
+                    written += 1
+                    if event_type == key_type:
+                        if event[2]:
+                            held[event[1]] = True
+                        else:
+                            held.pop(event[1], None)
+        finally:
+            scheduler.finish()
+            if held:
+                try:
+                    for key_code in reversed(list(held)):
+                        write(key_type, key_code, 0)
+                        written += 1
+                    syn()
+                except OSError as ex:
+                    logger.error("Failed to release held keys: %s", ex)
+            self.events_written += written
+        
+        return units
+    
+    def send_key(self, key_name, delay=0.1, gap=DEFAULT_GAP):
+        """
+        Send a single key press and release.
+        
+        Args:
+            key_name: Key name (e.g., 'KEY_A', 'KEY_ENTER') or evdev key code
+            delay: Delay after keypress in seconds
+            gap: Hold time between press and release in seconds
+        """
+        try:
+            self.emit(self.compile_keys([key_name]), delay, gap)
         except Exception as ex:
-            logger.error(f"Error sending key {key_name}: {ex}")
+            logger.error("Error sending key %s: %s", key_name, ex)
             raise
     
-    def send_key_combination(self, keys, delay=0.1):
+    def send_key_combination(self, keys, delay=0.1, gap=DEFAULT_GAP):
         """
         Send a key combination (e.g., Ctrl+C).
         
         Args:
             keys: List of key names to press simultaneously
             delay: Delay after the combination in seconds
+            gap: Delay between individual presses/releases in seconds
         """
         try:
-            # Get key codes
-            key_codes = []
-            for key_name in keys:
-                if hasattr(e, key_name):
-                    key_codes.append(getattr(e, key_name))
-                else:
-                    raise ValueError(f"Unknown key: {key_name}")
-            
-            # Press all keys
-            for key_code in key_codes:
-                self.ui.write(e.EV_KEY, key_code, 1)
-                self.ui.syn()
-                time.sleep(0.01)
-            
-            # Release all keys in reverse order
-            for key_code in reversed(key_codes):
-                self.ui.write(e.EV_KEY, key_code, 0)
-                self.ui.syn()
-                time.sleep(0.01)
-            
-            # Delay
-            if delay > 0:
-                time.sleep(delay)
-                
+            self.emit(self.compile_combination(keys), delay, gap)
         except Exception as ex:
-            logger.error(f"Error sending key combination {keys}: {ex}")
+            logger.error("Error sending key combination %s: %s", keys, ex)
             raise
     
-    def type_char(self, char, delay=0.05):
+    def type_char(self, char, delay=0.05, gap=DEFAULT_GAP):
         """
         Type a single character.
         
         Args:
             char: Character to type
             delay: Delay after typing in seconds
+            gap: Hold time between press and release in seconds
         """
         try:
-            # Check if character requires shift
-            if char in self.SHIFT_CHARS:
-                base_char = self.SHIFT_CHARS[char]
-                if base_char in self.CHAR_TO_KEY:
-                    key_code = self.CHAR_TO_KEY[base_char]
-                    
-                    # Press shift
-                    self.ui.write(e.EV_KEY, e.KEY_LEFTSHIFT, 1)
-                    self.ui.syn()
-                    time.sleep(0.01)
-                    
-                    # Press key
-                    self.ui.write(e.EV_KEY, key_code, 1)
-                    self.ui.syn()
-                    time.sleep(0.01)
-                    
-                    # Release key
-                    self.ui.write(e.EV_KEY, key_code, 0)
-                    self.ui.syn()
-                    time.sleep(0.01)
-                    
-                    # Release shift
-                    self.ui.write(e.EV_KEY, e.KEY_LEFTSHIFT, 0)
-                    self.ui.syn()
-                else:
-                    logger.warning(f"Character '{char}' not supported")
-                    return
-            
-            # Regular character
-            elif char.lower() in self.CHAR_TO_KEY:
-                key_code = self.CHAR_TO_KEY[char.lower()]
-                
-                # Press and release
-                self.ui.write(e.EV_KEY, key_code, 1)
-                self.ui.syn()
-                time.sleep(0.01)
-                
-                self.ui.write(e.EV_KEY, key_code, 0)
-                self.ui.syn()
-            else:
-                logger.warning(f"Character '{char}' not supported")
-                return
-            
-            # Delay
-            if delay > 0:
-                time.sleep(delay)
-                
+            self.emit(self.compile_text(char), delay, gap)
         except Exception as ex:
-            logger.error(f"Error typing character '{char}': {ex}")
+            logger.error("Error typing character '%s': %s", char, ex)
             raise
     
-    def type_text(self, text, delay=0.05):
+    def type_text(self, text, delay=0.05, gap=DEFAULT_GAP, layout=None):
         """
         Type a string of text.
         
         Args:
             text: Text to type
             delay: Delay between characters in seconds
+            gap: Hold time between press and release in seconds
+            layout: Layout name overriding the emulator's layout
         """
-        for char in text:
-            self.type_char(char, delay)
-        logger.info(f"Typed {len(text)} characters")
+        units = self.emit(self.compile_text(text, layout), delay, gap)
+        logger.info("Typed %d characters", units)
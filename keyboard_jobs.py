@@ -0,0 +1,325 @@
+"""
+Keyboard Jobs Module
+Queues keyboard input so HTTP requests never wait for typing to finish
+"""
+
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from keyboard_emulator import EV_MARK
+from keyboard_layouts import get_layout
+from keyboard_timing import PacingStats
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job when it has been cancelled."""
+
+
+class KeyboardJob:
+    """
+    A queued keyboard input request with progress tracking.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+    def __init__(self, text=None, keys=None, delay=0.1, gap=None, layout=None, events=None, macro=None):
+        """
+        Initialize the job.
+
+        Args:
+            text: Text to type
+            keys: List of key names to send after the text
+            delay: Delay between characters/keys in seconds
+            gap: Hold time between press and release (None = emulator default)
+            layout: Keyboard layout for the text (None = emulator layout)
+            events: Pre-compiled event stream (used instead of text/keys)
+            macro: Name of the macro the events were rendered from
+        """
+        self.id = uuid.uuid4().hex
+        self.text = text or ''
+        self.keys = list(keys or [])
+        self.events = events
+        self.macro = macro
+        self.units_total = sum(1 for event in events if event[0] == EV_MARK) if events else 0
+        self.units_sent = 0
+        self.delay = delay
+        self.gap = gap
+        self.layout = layout
+        self.status = self.QUEUED
+        self.chars_sent = 0
+        self.keys_sent = 0
+        self.error = None
+        self.timing = PacingStats()
+        self.device = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def cancelled(self):
+        """True if cancellation has been requested."""
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation has been requested."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        """
+        Request cancellation.
+
+        Returns:
+            bool: False if the job had already finished
+        """
+        if self.status in self.FINISHED_STATES:
+            return False
+        self._cancel.set()
+        return True
+
+    def wait(self, timeout=None):
+        """
+        Wait for the job to finish.
+
+        Args:
+            timeout: Maximum time to wait in seconds
+
+        Returns:
+            bool: True if the job has finished
+        """
+        return self._done.wait(timeout)
+
+    def finish(self, status, error=None):
+        """Mark the job as finished."""
+        self.status = status
+        self.error = error
+        self.finished = time.time()
+        self._done.set()
+
+    def to_dict(self):
+        """Return a JSON-serializable job description."""
+        chars_total = len(self.text)
+        if self.events is not None:
+            progress = round(self.units_sent / max(self.units_total, 1), 3)
+        else:
+            progress = round((self.chars_sent + self.keys_sent) / max(chars_total + len(self.keys), 1), 3)
+        return {
+            'job_id': self.id,
+            'device': self.device,
+            'status': self.status,
+            'chars_total': chars_total,
+            'chars_sent': self.chars_sent,
+            'keys_total': len(self.keys),
+            'keys_sent': self.keys_sent,
+            'progress': progress,
+            'delay': self.delay,
+            'gap': self.gap,
+            'layout': self.layout,
+            **({'macro': self.macro, 'units_total': self.units_total, 'units_sent': self.units_sent}
+               if self.events is not None else {}),
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'timing': self.timing.to_dict(),
+            'error': self.error
+        }
+
+
+class KeyboardJobQueue:
+    """
+    Job queue with a single dedicated writer thread for one keyboard device.
+
+    Jobs run strictly in submission order, so keystrokes from different
+    requests never interleave.
+    """
+
+    def __init__(self, emulator, max_history=100, name='default'):
+        """
+        Initialize the queue and start the writer thread.
+
+        Args:
+            emulator: KeyboardEmulator used to send the input
+            max_history: Number of finished jobs kept for status queries
+            name: Device name recorded on the jobs
+        """
+        self.emulator = emulator
+        self.max_history = max_history
+        self.name = name
+        self.jobs = OrderedDict()  # Maps job IDs to jobs
+        self.current = None  # Job being typed
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f'keyboard-writer-{name}', daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self):
+        """Number of jobs waiting to run."""
+        return self._queue.qsize()
+
+    @property
+    def load(self):
+        """Number of jobs waiting or running."""
+        return self._queue.qsize() + (1 if self.current is not None else 0)
+
+    def submit(self, text=None, keys=None, delay=0.1, gap=None, layout=None):
+        """
+        Queue keyboard input.
+
+        Args:
+            text: Text to type
+            keys: List of key names to send after the text
+            delay: Delay between characters/keys in seconds
+            gap: Hold time between press and release (None = emulator default)
+            layout: Keyboard layout for the text (None = emulator layout)
+
+        Returns:
+            KeyboardJob: The queued job
+        """
+        if not text and not keys:
+            raise ValueError('Either "text" or "keys" must be provided')
+        if not isinstance(delay, (int, float)) or delay < 0:
+            raise ValueError('delay must be a non-negative number')
+        if gap is not None and (not isinstance(gap, (int, float)) or gap < 0):
+            raise ValueError('gap must be a non-negative number')
+        if keys is not None and not isinstance(keys, list):
+            raise ValueError('keys must be a list')
+        for key in keys or []:
+            self.emulator.resolve_key(key)
+        if layout is not None:
+            get_layout(layout)
+
+        return self._enqueue(KeyboardJob(text, keys, delay, gap, layout))
+
+    def submit_events(self, events, delay=0.0, gap=None, macro=None):
+        """
+        Queue a pre-compiled event stream (e.g. a rendered macro).
+
+        Args:
+            events: Event stream for KeyboardEmulator.emit()
+            delay: Delay between input units in seconds
+            gap: Hold time between press and release (None = emulator default)
+            macro: Name of the macro the events were rendered from
+
+        Returns:
+            KeyboardJob: The queued job
+        """
+        if not isinstance(delay, (int, float)) or delay < 0:
+            raise ValueError('delay must be a non-negative number')
+        if gap is not None and (not isinstance(gap, (int, float)) or gap < 0):
+            raise ValueError('gap must be a non-negative number')
+        return self._enqueue(KeyboardJob(delay=delay, gap=gap, events=events, macro=macro))
+
+    def _enqueue(self, job):
+        """Register a job and hand it to the writer thread."""
+        job.device = self.name
+        with self._lock:
+            self.jobs[job.id] = job
+            self._prune()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        """
+        Get a job by ID.
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            KeyboardJob or None
+        """
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        """Return all known jobs, oldest first."""
+        with self._lock:
+            return list(self.jobs.values())
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond max_history."""
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in KeyboardJob.FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self.jobs[job_id]
+
+    def _run(self):
+        """Writer loop."""
+        while True:
+            job = self._queue.get()
+            if job.cancelled:
+                job.finish(KeyboardJob.CANCELLED)
+                continue
+
+            job.status = KeyboardJob.RUNNING
+            job.started = time.time()
+            self.current = job
+            try:
+                with self.emulator.lock:
+                    self._execute(job)
+                job.finish(KeyboardJob.COMPLETED)
+                if job.events is not None:
+                    logger.info("Keyboard job %s completed (macro %s, %d units)", job.id, job.macro, job.units_sent)
+                else:
+                    logger.info("Keyboard job %s completed (%d chars, %d keys)", job.id, job.chars_sent, job.keys_sent)
+            except JobCancelled:
+                job.finish(KeyboardJob.CANCELLED)
+                logger.info("Keyboard job %s cancelled after %d chars", job.id, job.chars_sent)
+            except Exception as ex:
+                job.finish(KeyboardJob.FAILED, str(ex))
+                logger.error("Keyboard job %s failed: %s", job.id, ex)
+            finally:
+                self.current = None
+
+    def _execute(self, job):
+        """Send the input of a job, checking for cancellation in between."""
+        options = {'delay': job.delay, 'stats': job.timing}
+        if job.gap is not None:
+            options['gap'] = job.gap
+
+        if job.events is not None:
+            def unit_sent():
+                job.units_sent += 1
+                job.check_cancelled()
+
+            def wait(seconds):
+                # Waits inside macros stay cancellable
+                job._cancel.wait(seconds)
+                job.check_cancelled()
+
+            job.check_cancelled()
+            self.emulator.emit(job.events, on_mark=unit_sent, on_wait=wait, **options)
+            return
+
+        if job.text:
+            def char_sent():
+                job.chars_sent += 1
+                job.check_cancelled()
+
+            job.check_cancelled()
+            events = self.emulator.compile_text(job.text, job.layout)
+            self.emulator.emit(events, on_mark=char_sent, **options)
+            # Unsupported characters are skipped by the compiler
+            job.chars_sent = len(job.text)
+
+        if job.keys:
+            def key_sent():
+                job.keys_sent += 1
+                job.check_cancelled()
+
+            job.check_cancelled()
+            self.emulator.emit(self.emulator.compile_keys(job.keys), on_mark=key_sent, **options)
@@ -0,0 +1,205 @@
+"""
+Keyboard Layouts Module
+Layout definitions compiled into character -> (key code, modifier mask) tables
+"""
+
+import json
+import logging
+import os
+
+from evdev import ecodes as e
+
+logger = logging.getLogger(__name__)
+
+# Modifier mask bits
+MOD_SHIFT = 1
+MOD_ALTGR = 2
+MOD_CTRL = 4
+# Dead key: the character is produced by the key followed by Space
+MOD_DEAD = 8
+
+# Key codes pressed for each modifier bit
+MODIFIER_KEYS = (
+    (MOD_CTRL, e.KEY_LEFTCTRL),
+    (MOD_SHIFT, e.KEY_LEFTSHIFT),
+    (MOD_ALTGR, e.KEY_RIGHTALT),
+)
+
+# Unicode fallback methods for characters a layout lacks
+UNICODE_FALLBACKS = ('ctrl_shift_u',)
+
+_COMMON = {
+    ' ': 'KEY_SPACE', '\n': 'KEY_ENTER', '\t': 'KEY_TAB',
+}
+
+_LETTERS = {char: f'KEY_{char.upper()}' for char in 'abcdefghijklmnopqrstuvwxyz'}
+_DIGITS = {char: f'KEY_{char}' for char in '0123456789'}
+
+# Built-in layout definitions. Each level maps characters to evdev key
+# names; uppercase letters are derived from lowercase ones automatically.
+LAYOUTS = {
+    'us': {
+        'base': {**_COMMON, **_LETTERS, **_DIGITS, **{
+            '-': 'KEY_MINUS', '=': 'KEY_EQUAL', '[': 'KEY_LEFTBRACE',
+            ']': 'KEY_RIGHTBRACE', ';': 'KEY_SEMICOLON', "'": 'KEY_APOSTROPHE',
+            '`': 'KEY_GRAVE', '\\': 'KEY_BACKSLASH', ',': 'KEY_COMMA',
+            '.': 'KEY_DOT', '/': 'KEY_SLASH',
+        }},
+        'shift': {
+            '!': 'KEY_1', '@': 'KEY_2', '#': 'KEY_3', '$': 'KEY_4', '%': 'KEY_5',
+            '^': 'KEY_6', '&': 'KEY_7', '*': 'KEY_8', '(': 'KEY_9', ')': 'KEY_0',
+            '_': 'KEY_MINUS', '+': 'KEY_EQUAL', '{': 'KEY_LEFTBRACE',
+            '}': 'KEY_RIGHTBRACE', '|': 'KEY_BACKSLASH', ':': 'KEY_SEMICOLON',
+            '"': 'KEY_APOSTROPHE', '<': 'KEY_COMMA', '>': 'KEY_DOT',
+            '?': 'KEY_SLASH', '~': 'KEY_GRAVE',
+        },
+        'altgr': {},
+        'dead': [],
+    },
+    'de': {
+        'base': {**_COMMON, **_LETTERS, **_DIGITS, **{
+            'y': 'KEY_Z', 'z': 'KEY_Y',
+            'ß': 'KEY_MINUS', '´': 'KEY_EQUAL', 'ü': 'KEY_LEFTBRACE',
+            '+': 'KEY_RIGHTBRACE', 'ö': 'KEY_SEMICOLON', 'ä': 'KEY_APOSTROPHE',
+            '#': 'KEY_BACKSLASH', ',': 'KEY_COMMA', '.': 'KEY_DOT',
+            '-': 'KEY_SLASH', '<': 'KEY_102ND', '^': 'KEY_GRAVE',
+        }},
+        'shift': {
+            '!': 'KEY_1', '"': 'KEY_2', '§': 'KEY_3', '$': 'KEY_4', '%': 'KEY_5',
+            '&': 'KEY_6', '/': 'KEY_7', '(': 'KEY_8', ')': 'KEY_9', '=': 'KEY_0',
+            '?': 'KEY_MINUS', '`': 'KEY_EQUAL', '*': 'KEY_RIGHTBRACE',
+            "'": 'KEY_BACKSLASH', ';': 'KEY_COMMA', ':': 'KEY_DOT',
+            '_': 'KEY_SLASH', '>': 'KEY_102ND', '°': 'KEY_GRAVE',
+        },
+        'altgr': {
+            '²': 'KEY_2', '³': 'KEY_3', '{': 'KEY_7', '[': 'KEY_8', ']': 'KEY_9',
+            '}': 'KEY_0', '\\': 'KEY_MINUS', '@': 'KEY_Q', '€': 'KEY_E',
+            '~': 'KEY_RIGHTBRACE', '|': 'KEY_102ND', 'µ': 'KEY_M',
+        },
+        'dead': ['^', '´', '`'],
+    },
+    'fr': {
+        'base': {**_COMMON, **_LETTERS, **{
+            'a': 'KEY_Q', 'q': 'KEY_A', 'z': 'KEY_W', 'w': 'KEY_Z',
+            'm': 'KEY_SEMICOLON', ',': 'KEY_M', ';': 'KEY_COMMA', ':': 'KEY_DOT',
+            '!': 'KEY_SLASH', '&': 'KEY_1', 'é': 'KEY_2', '"': 'KEY_3',
+            "'": 'KEY_4', '(': 'KEY_5', '-': 'KEY_6', 'è': 'KEY_7', '_': 'KEY_8',
+            'ç': 'KEY_9', 'à': 'KEY_0', ')': 'KEY_MINUS', '=': 'KEY_EQUAL',
+            '^': 'KEY_LEFTBRACE', '$': 'KEY_RIGHTBRACE', 'ù': 'KEY_APOSTROPHE',
+            '*': 'KEY_BACKSLASH', '²': 'KEY_GRAVE', '<': 'KEY_102ND',
+        }},
+        'shift': {**_DIGITS, **{
+            '°': 'KEY_MINUS', '+': 'KEY_EQUAL', '¨': 'KEY_LEFTBRACE',
+            '£': 'KEY_RIGHTBRACE', '%': 'KEY_APOSTROPHE', 'µ': 'KEY_BACKSLASH',
+            '?': 'KEY_M', '.': 'KEY_COMMA', '/': 'KEY_DOT', '§': 'KEY_SLASH',
+            '>': 'KEY_102ND',
+        }},
+        'altgr': {
+            '~': 'KEY_2', '#': 'KEY_3', '{': 'KEY_4', '[': 'KEY_5', '|': 'KEY_6',
+            '`': 'KEY_7', '\\': 'KEY_8', '@': 'KEY_0', ']': 'KEY_MINUS',
+            '}': 'KEY_EQUAL', '€': 'KEY_E', '¤': 'KEY_RIGHTBRACE',
+        },
+        'dead': ['^', '¨', '~', '`'],
+    },
+}
+
+# Compiled tables by layout name
+_compiled = {}
+
+
+def _resolve(key_name):
+    """Resolve an evdev key name to its code."""
+    if not hasattr(e, key_name):
+        raise ValueError(f"Unknown key in layout: {key_name}")
+    return getattr(e, key_name)
+
+
+def compile_layout(definition):
+    """
+    Compile a layout definition into a lookup table.
+
+    Args:
+        definition: Dict with 'base', 'shift' and 'altgr' levels mapping
+            characters to evdev key names, and an optional 'dead' list
+
+    Returns:
+        dict: Maps characters to (key code, modifier mask)
+    """
+    table = {}
+    levels = (('base', 0), ('shift', MOD_SHIFT), ('altgr', MOD_ALTGR), ('shift_altgr', MOD_SHIFT | MOD_ALTGR))
+    for level, mask in levels:
+        for char, key_name in definition.get(level, {}).items():
+            table[char] = (_resolve(key_name), mask)
+
+    # Uppercase letters use the key of their lowercase form with Shift,
+    # unless the shifted key already produces another character
+    used = set(table.values())
+    for char, (key_code, mask) in list(table.items()):
+        upper = char.upper()
+        if (mask == 0 and char.isalpha() and len(upper) == 1 and upper != char
+                and upper not in table and (key_code, MOD_SHIFT) not in used):
+            table[upper] = (key_code, MOD_SHIFT)
+
+    for char in definition.get('dead', []):
+        if char in table:
+            key_code, mask = table[char]
+            table[char] = (key_code, mask | MOD_DEAD)
+    return table
+
+
+def load_layout_file(path):
+    """
+    Load a layout definition from a JSON file and register it.
+
+    The layout name is the 'name' field or the file name without extension.
+
+    Args:
+        path: Path of the JSON file
+
+    Returns:
+        str: Registered layout name
+    """
+    with open(path, encoding='utf-8') as f:
+        definition = json.load(f)
+    name = definition.get('name') or os.path.splitext(os.path.basename(path))[0]
+    LAYOUTS[name] = definition
+    _compiled.pop(name, None)
+    return name
+
+
+def load_layout_dir(directory):
+    """
+    Load all *.json layout definitions from a directory.
+
+    Args:
+        directory: Directory containing layout files
+
+    Returns:
+        list: Registered layout names
+    """
+    names = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.json'):
+            try:
+                names.append(load_layout_file(os.path.join(directory, filename)))
+            except (OSError, ValueError) as ex:
+                logger.error("Failed to load keyboard layout %s: %s", filename, ex)
+    return names
+
+
+def get_layout(name):
+    """
+    Get the compiled table of a layout, compiling it on first use.
+
+    Args:
+        name: Layout name
+
+    Returns:
+        dict: Maps characters to (key code, modifier mask)
+    """
+    table = _compiled.get(name)
+    if table is None:
+        if name not in LAYOUTS:
+            raise ValueError(f"Unknown keyboard layout: {name}")
+        table = _compiled[name] = compile_layout(LAYOUTS[name])
+    return table
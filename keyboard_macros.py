@@ -0,0 +1,394 @@
+"""
+Keyboard Macros Module
+Parses the key-sequence DSL and keeps compiled macros by name
+
+DSL statements (separated by newlines or ';', '#' starts a comment):
+    type "Hello {name}\\n"    Type text, {param} is substituted on invocation
+    key enter                 Press and release a key
+    key ctrl+alt+t            Press a chord, release in reverse order
+    wait 500ms                Pause (ms or s, e.g. 1.5s)
+    repeat 3 { key down }     Repeat a block
+"""
+
+import logging
+import os
+import re
+import string
+import threading
+import time
+
+from evdev import ecodes as e
+
+from keyboard_emulator import EV_MARK, EV_WAIT
+from keyboard_layouts import get_layout
+
+logger = logging.getLogger(__name__)
+
+# Friendly key names accepted in addition to evdev names (KEY_*)
+KEY_ALIASES = {
+    'ctrl': 'KEY_LEFTCTRL', 'control': 'KEY_LEFTCTRL', 'rctrl': 'KEY_RIGHTCTRL',
+    'shift': 'KEY_LEFTSHIFT', 'rshift': 'KEY_RIGHTSHIFT',
+    'alt': 'KEY_LEFTALT', 'altgr': 'KEY_RIGHTALT',
+    'super': 'KEY_LEFTMETA', 'meta': 'KEY_LEFTMETA', 'win': 'KEY_LEFTMETA',
+    'enter': 'KEY_ENTER', 'return': 'KEY_ENTER', 'esc': 'KEY_ESC', 'escape': 'KEY_ESC',
+    'del': 'KEY_DELETE', 'ins': 'KEY_INSERT', 'pgup': 'KEY_PAGEUP', 'pgdn': 'KEY_PAGEDOWN',
+}
+
+# Limits that keep a single macro bounded
+MAX_REPEAT = 1000
+MAX_EVENTS = 1000000
+MAX_WAIT_MS = 600000
+
+MACRO_NAME = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+# First line of a persisted macro file that records its layout
+LAYOUT_HEADER = '# layout: '
+
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{};\n]|[^\s{};"#]+|#[^\n]*|[ \t\r]+|.')
+_DURATION = re.compile(r'^(\d+(?:\.\d+)?)(ms|s)?$')
+_ESCAPES = {'n': '\n', 't': '\t', '"': '"', '\\': '\\'}
+
+
+class MacroSyntaxError(ValueError):
+    """Raised when a macro cannot be parsed or compiled."""
+
+    def __init__(self, message, line):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+
+
+def _tokenize(source):
+    """Split macro source into (token, line) pairs, dropping blanks and comments."""
+    tokens = []
+    line = 1
+    for match in _TOKEN.finditer(source):
+        token = match.group()
+        if token == '"':
+            raise MacroSyntaxError("Unterminated string", line)
+        if token == '\n':
+            tokens.append((';', line))
+            line += 1
+        elif token.startswith('"'):
+            tokens.append((token, line))
+            line += token.count('\n')
+        elif token.strip() and not token.startswith('#'):
+            tokens.append((token, line))
+    return tokens
+
+
+def _unquote(token, line):
+    """Decode a quoted string token."""
+    body = token[1:-1]
+    try:
+        return re.sub(r'\\(.)', lambda m: _ESCAPES[m.group(1)], body)
+    except KeyError as ex:
+        raise MacroSyntaxError(f"Unknown escape sequence \\{ex.args[0]}", line)
+
+
+def resolve_key_name(name, line=None):
+    """
+    Resolve a DSL key name to an evdev key code.
+
+    Args:
+        name: Alias (e.g. 'ctrl'), short name (e.g. 'f5', 'a') or KEY_* name
+        line: Source line for error messages (None = plain ValueError)
+
+    Returns:
+        int: Key code
+    """
+    key_name = KEY_ALIASES.get(name.lower())
+    if key_name is None:
+        key_name = name.upper() if name.upper().startswith('KEY_') else f"KEY_{name.upper()}"
+    key_code = getattr(e, key_name, None)
+    if not isinstance(key_code, int):
+        if line is None:
+            raise ValueError(f"Unknown key: {name}")
+        raise MacroSyntaxError(f"Unknown key: {name}", line)
+    return key_code
+
+
+def parse(source):
+    """
+    Parse macro source into a statement tree.
+
+    Args:
+        source: DSL source
+
+    Returns:
+        list: Statements as tuples ('type', text, line), ('key', [codes], line),
+            ('wait', ms, line) and ('repeat', count, [statements], line)
+    """
+    tokens = _tokenize(source)
+    position = 0
+
+    def block(closing):
+        nonlocal position
+        statements = []
+        while position < len(tokens):
+            token, line = tokens[position]
+            position += 1
+            if token == ';':
+                continue
+            if token == '}':
+                if closing:
+                    return statements
+                raise MacroSyntaxError("Unexpected '}'", line)
+
+            command = token.lower()
+            if command in ('type', 'key', 'wait', 'repeat'):
+                if position >= len(tokens) or tokens[position][0] in (';', '{', '}'):
+                    raise MacroSyntaxError(f"'{command}' needs an argument", line)
+                argument = tokens[position][0]
+                position += 1
+            else:
+                raise MacroSyntaxError(f"Unknown statement: {token}", line)
+
+            if command == 'type':
+                if not argument.startswith('"'):
+                    raise MacroSyntaxError("'type' needs a quoted string", line)
+                statements.append(('type', _unquote(argument, line), line))
+            elif command == 'key':
+                codes = [resolve_key_name(name, line) for name in argument.split('+') if name]
+                if not codes:
+                    raise MacroSyntaxError("'key' needs a key name", line)
+                statements.append(('key', codes, line))
+            elif command == 'wait':
+                match = _DURATION.match(argument.lower())
+                if not match:
+                    raise MacroSyntaxError(f"Invalid duration: {argument}", line)
+                value = float(match.group(1))
+                ms = int(value * 1000) if match.group(2) == 's' else int(value)
+                if ms > MAX_WAIT_MS:
+                    raise MacroSyntaxError(f"Wait longer than {MAX_WAIT_MS} ms", line)
+                statements.append(('wait', ms, line))
+            else:
+                if not argument.isdigit() or not 0 < int(argument) <= MAX_REPEAT:
+                    raise MacroSyntaxError(f"Repeat count must be 1-{MAX_REPEAT}", line)
+                if position >= len(tokens) or tokens[position][0] != '{':
+                    raise MacroSyntaxError("'repeat' needs a '{ ... }' block", line)
+                position += 1
+                statements.append(('repeat', int(argument), block(True), line))
+
+        if closing:
+            raise MacroSyntaxError("Missing '}'", tokens[-1][1] if tokens else 1)
+        return statements
+
+    return block(False)
+
+
+class Macro:
+    """
+    A parsed macro compiled to event stream segments.
+
+    Text without parameters is compiled at upload time. Text containing
+    {param} placeholders is kept as a template and compiled when the macro
+    is invoked; everything else is already a ready-to-emit event list. In
+    both, {{ and }} type a literal brace.
+    """
+
+    def __init__(self, name, source, emulator, layout=None):
+        """
+        Parse and compile a macro.
+
+        Args:
+            name: Macro name
+            source: DSL source
+            emulator: KeyboardEmulator used to compile text and keys
+            layout: Keyboard layout for text (None = emulator layout)
+        """
+        if layout is not None:
+            get_layout(layout)
+        self.name = name
+        self.source = source
+        self.layout = layout
+        self.created = time.time()
+        self.parameters = set()
+        self._emulator = emulator
+        self.segments = []  # Event lists and ('template', text) entries
+        self._events = 0
+        self._compile(parse(source))
+        self._flush()
+        self.parameters = sorted(self.parameters)
+
+    def _compile(self, statements):
+        """Compile statements into segments."""
+        for statement in statements:
+            kind, line = statement[0], statement[-1]
+            if kind == 'type':
+                fields = self._template_fields(statement[1], line)
+                if fields:
+                    self.parameters.update(fields)
+                    self._flush()
+                    self.segments.append(('template', statement[1]))
+                else:
+                    # Unescape {{ and }} like a template would
+                    self._extend(self._emulator.compile_text(statement[1].format(), self.layout), line)
+            elif kind == 'key':
+                codes = statement[1]
+                if len(codes) == 1:
+                    self._extend(self._emulator.compile_keys(codes), line)
+                else:
+                    self._extend(self._emulator.compile_combination(codes), line)
+            elif kind == 'wait':
+                self._extend([(EV_WAIT, 0, statement[1])], line)
+            else:
+                for _ in range(statement[1]):
+                    self._compile(statement[2])
+
+    def _extend(self, events, line):
+        """Append events to the current static segment."""
+        self._events += len(events)
+        if self._events > MAX_EVENTS:
+            raise MacroSyntaxError(f"Macro expands to more than {MAX_EVENTS} events", line)
+        if not self.segments or not isinstance(self.segments[-1], list):
+            self.segments.append([])
+        self.segments[-1].extend(events)
+
+    def _flush(self):
+        """Freeze the current static segment."""
+        if self.segments and isinstance(self.segments[-1], list):
+            self.segments[-1] = tuple(self.segments[-1])
+
+    @staticmethod
+    def _template_fields(text, line):
+        """Return the {param} names used in a text, validating the template."""
+        try:
+            fields = [field for _, field, _, _ in string.Formatter().parse(text) if field is not None]
+        except ValueError as ex:
+            raise MacroSyntaxError(f"Invalid template: {ex}", line)
+        for field in fields:
+            if not field.isidentifier():
+                raise MacroSyntaxError(f"Invalid parameter name: {{{field}}}", line)
+        return fields
+
+    def render(self, params=None):
+        """
+        Produce the event stream for an invocation.
+
+        Args:
+            params: Dict of parameter values for {param} placeholders
+
+        Returns:
+            list: Event stream for KeyboardEmulator.emit()
+        """
+        params = params or {}
+        missing = [name for name in self.parameters if name not in params]
+        if missing:
+            raise ValueError(f"Missing macro parameters: {missing}")
+
+        events = []
+        for segment in self.segments:
+            if isinstance(segment, tuple) and segment and segment[0] == 'template':
+                text = segment[1].format(**{key: str(value) for key, value in params.items()})
+                events.extend(self._emulator.compile_text(text, self.layout))
+            else:
+                events.extend(segment)
+        return events
+
+    def to_dict(self):
+        """Return a JSON-serializable macro description."""
+        static_units = sum(
+            1 for segment in self.segments if segment and segment[0] != 'template'
+            for event in segment if event[0] == EV_MARK
+        )
+        return {
+            'name': self.name,
+            'source': self.source,
+            'layout': self.layout,
+            'parameters': self.parameters,
+            'events': self._events,
+            'static_units': static_units,
+            'created': self.created
+        }
+
+
+class MacroStore:
+    """
+    Compiled macros cached by name, persisted as source files.
+    """
+
+    def __init__(self, emulator, directory=None):
+        """
+        Initialize the store and load persisted macros.
+
+        Args:
+            emulator: KeyboardEmulator used to compile macros
+            directory: Optional directory for <name>.macro source files
+        """
+        self.emulator = emulator
+        self.directory = directory
+        self.macros = {}
+        self._lock = threading.Lock()
+        if directory and os.path.isdir(directory):
+            self._load()
+
+    def _load(self):
+        """Compile all persisted macros."""
+        for filename in sorted(os.listdir(self.directory)):
+            name, extension = os.path.splitext(filename)
+            if extension != '.macro' or not MACRO_NAME.match(name):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), encoding='utf-8') as f:
+                    source = f.read()
+                layout = None
+                if source.startswith(LAYOUT_HEADER):
+                    header, _, source = source.partition('\n')
+                    layout = header[len(LAYOUT_HEADER):].strip()
+                self.macros[name] = Macro(name, source, self.emulator, layout)
+            except (OSError, ValueError) as ex:
+                logger.error("Failed to load macro %s: %s", name, ex)
+
+    def put(self, name, source, layout=None):
+        """
+        Compile and store a macro, replacing any macro with the same name.
+
+        Args:
+            name: Macro name
+            source: DSL source
+            layout: Keyboard layout for text (None = emulator layout)
+
+        Returns:
+            tuple: (Macro, True if it replaced an existing macro)
+        """
+        if not MACRO_NAME.match(name):
+            raise ValueError("Macro names may only contain letters, digits, '_', '-' and '.'")
+        macro = Macro(name, source, self.emulator, layout)
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, f"{name}.macro"), 'w', encoding='utf-8') as f:
+                if layout is not None:
+                    f.write(f"{LAYOUT_HEADER}{layout}\n")
+                f.write(source)
+
+        with self._lock:
+            replaced = name in self.macros
+            self.macros[name] = macro
+        return macro, replaced
+
+    def get(self, name):
+        """Return a macro by name or None."""
+        with self._lock:
+            return self.macros.get(name)
+
+    def list(self):
+        """Return all macros sorted by name."""
+        with self._lock:
+            return [self.macros[name] for name in sorted(self.macros)]
+
+    def delete(self, name):
+        """
+        Delete a macro.
+
+        Returns:
+            bool: False if no macro with that name exists
+        """
+        with self._lock:
+            if self.macros.pop(name, None) is None:
+                return False
+        if self.directory:
+            path = os.path.join(self.directory, f"{name}.macro")
+            if os.path.exists(path):
+                os.remove(path)
+        return True
@@ -0,0 +1,167 @@
+"""
+Keyboard Pool Module
+Named virtual keyboard devices, each typed by its own writer thread
+"""
+
+import logging
+import re
+import threading
+import time
+
+from keyboard_emulator import KeyboardEmulator
+from keyboard_jobs import KeyboardJob, KeyboardJobQueue
+
+logger = logging.getLogger(__name__)
+
+# Device names usable in URLs, JSON and uinput device names
+DEVICE_NAME = re.compile(r'^[A-Za-z0-9_.-]{1,32}$')
+
+# Device selector that picks the least busy device
+AUTO_DEVICE = 'auto'
+
+
+class KeyboardDevice:
+    """
+    One virtual keyboard with the writer queue that serializes its input.
+    """
+
+    def __init__(self, name, emulator, jobs):
+        """
+        Args:
+            name: Device name
+            emulator: KeyboardEmulator owning the uinput device
+            jobs: KeyboardJobQueue typing on the device
+        """
+        self.name = name
+        self.emulator = emulator
+        self.jobs = jobs
+
+    def to_dict(self):
+        """Return a JSON-serializable device description."""
+        current = self.jobs.current
+        return {
+            'name': self.name,
+            'layout': self.emulator.layout,
+            'queue_depth': self.jobs.depth,
+            'current_job': current.id if current is not None else None
+        }
+
+
+class KeyboardPool:
+    """
+    Pool of named virtual keyboards.
+
+    Jobs for one device run strictly in order; different devices type in
+    parallel. The first device is the default for requests that do not
+    name one.
+    """
+
+    def __init__(self, names=('default',), layout='us', unicode_fallback=None, emulator_factory=None,
+                 max_history=100):
+        """
+        Create the devices and start their writer threads.
+
+        Args:
+            names: Device names; the first one is the default device
+            layout: Keyboard layout of the targets
+            unicode_fallback: Fallback for characters the layout lacks
+            emulator_factory: Optional callable(name) returning a
+                KeyboardEmulator (e.g. with a fake sink for benchmarks)
+            max_history: Finished jobs kept per device for status queries
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            raise ValueError("At least one keyboard device is required")
+        for name in names:
+            if not DEVICE_NAME.match(name) or name == AUTO_DEVICE:
+                raise ValueError(f"Invalid keyboard device name: {name}")
+
+        if emulator_factory is None:
+            def emulator_factory(name):
+                # The default device keeps the evdev default device name
+                device_name = None if name == names[0] else f'virtual-keyboard-{name}'
+                return KeyboardEmulator(layout=layout, unicode_fallback=unicode_fallback,
+                                        device_name=device_name)
+
+        self.devices = {}
+        self.default = names[0]
+        self._lock = threading.Lock()
+        for name in names:
+            emulator = emulator_factory(name)
+            self.devices[name] = KeyboardDevice(name, emulator, KeyboardJobQueue(emulator, max_history, name=name))
+        logger.info("Keyboard pool initialized with devices %s", names)
+
+    @property
+    def emulator(self):
+        """Emulator of the default device (used for compiling input)."""
+        return self.devices[self.default].emulator
+
+    def get(self, name=None):
+        """
+        Select a device.
+
+        Args:
+            name: Device name, None for the default device or 'auto' for
+                the device with the fewest waiting and running jobs
+
+        Returns:
+            KeyboardDevice
+        """
+        if name is None:
+            return self.devices[self.default]
+        if name == AUTO_DEVICE:
+            with self._lock:
+                return min(self.devices.values(), key=lambda device: device.jobs.load)
+        device = self.devices.get(name)
+        if device is None:
+            raise KeyError(f"Unknown keyboard device: {name}")
+        return device
+
+    def list(self):
+        """Return all devices, default first."""
+        return list(self.devices.values())
+
+    def find_job(self, job_id):
+        """
+        Find a job on any device.
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            KeyboardJob or None
+        """
+        for device in self.devices.values():
+            job = device.jobs.get(job_id)
+            if job is not None:
+                return job
+        return None
+
+    def jobs(self):
+        """Return the jobs of all devices ordered by creation time."""
+        jobs = [job for device in self.devices.values() for job in device.jobs.list()]
+        return sorted(jobs, key=lambda job: job.created)
+
+    def wait_idle(self, timeout=None):
+        """
+        Wait for the queued and running jobs of all devices to finish.
+
+        Args:
+            timeout: Maximum time to wait in seconds
+
+        Returns:
+            bool: True if no job is left unfinished
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for job in self.jobs():
+            if job.status in KeyboardJob.FINISHED_STATES:
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not job.wait(remaining):
+                return False
+        return True
+
+    @property
+    def depth(self):
+        """Number of jobs waiting on all devices."""
+        return sum(device.jobs.depth for device in self.devices.values())
@@ -0,0 +1,117 @@
+"""
+Keyboard Timing Module
+Deadline scheduler that paces keyboard input against the monotonic clock
+"""
+
+import time
+
+# Remaining time below which the scheduler spins instead of sleeping;
+# covers the typical oversleep of time.sleep() on a loaded system
+SPIN_THRESHOLD = 0.0015
+
+# Lag after which the schedule is re-anchored instead of caught up, so a
+# long stall does not turn into a burst of back-to-back keystrokes
+MAX_LAG = 0.25
+
+# Lag below which a deadline counts as met
+LATE_TOLERANCE = 0.0005
+
+
+class PacingStats:
+    """
+    Requested versus achieved timing of one or more emissions.
+    """
+
+    def __init__(self):
+        """Initialize counters."""
+        self.requested = 0.0
+        self.achieved = 0.0
+        self.deadlines = 0
+        self.late = 0
+        self.resyncs = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+
+    def record(self, lag):
+        """Record the lag of a reached deadline in seconds."""
+        self.deadlines += 1
+        if lag > LATE_TOLERANCE:
+            self.late += 1
+        if lag > 0:
+            self.total_lag += lag
+            if lag > self.max_lag:
+                self.max_lag = lag
+
+    def to_dict(self):
+        """Return a JSON-serializable summary."""
+        drift = (self.achieved - self.requested) / self.requested * 100 if self.requested else None
+        return {
+            'requested_seconds': round(self.requested, 4),
+            'achieved_seconds': round(self.achieved, 4),
+            'drift_percent': round(drift, 2) if drift is not None else None,
+            'deadlines': self.deadlines,
+            'late': self.late,
+            'resyncs': self.resyncs,
+            'mean_lag_ms': round(self.total_lag / self.deadlines * 1000, 3) if self.deadlines else 0.0,
+            'max_lag_ms': round(self.max_lag * 1000, 3)
+        }
+
+
+class DeadlineScheduler:
+    """
+    Paces a sequence of pauses against absolute monotonic deadlines.
+
+    Each pause moves the deadline forward by its duration instead of
+    sleeping for it, so time spent writing events and sleep overshoot do
+    not accumulate. Waiting sleeps until shortly before the deadline and
+    spins for the rest; a late thread catches up by shortening the
+    following pauses.
+    """
+
+    def __init__(self, stats=None, spin=SPIN_THRESHOLD, max_lag=MAX_LAG):
+        """
+        Start the schedule at the current time.
+
+        Args:
+            stats: Optional PacingStats to update
+            spin: Seconds before a deadline to switch from sleeping to spinning
+            max_lag: Lag in seconds after which the schedule is re-anchored
+        """
+        self.stats = stats
+        self.spin = spin
+        self.max_lag = max_lag
+        self.started = self.deadline = time.monotonic()
+
+    def advance(self, seconds, sleep=None):
+        """
+        Move the deadline forward and wait until it is reached.
+
+        Args:
+            seconds: Duration of the pause
+            sleep: Optional replacement for time.sleep for the coarse part
+                of the wait (e.g. an interruptible wait); it may raise
+        """
+        monotonic = time.monotonic
+        sleep = sleep or time.sleep
+        self.deadline += seconds
+        if self.stats is not None:
+            self.stats.requested += seconds
+
+        remaining = self.deadline - monotonic()
+        if remaining > self.spin:
+            sleep(remaining - self.spin)
+        while monotonic() < self.deadline:
+            time.sleep(0)
+
+        lag = monotonic() - self.deadline
+        if lag > self.max_lag:
+            self.deadline += lag
+            if self.stats is not None:
+                self.stats.resyncs += 1
+        if self.stats is not None:
+            self.stats.record(lag)
+
+    def finish(self):
+        """Add the elapsed time of the schedule to the stats."""
+        if self.stats is not None:
+            self.stats.achieved += time.monotonic() - self.started
@@ -0,0 +1,296 @@
+"""
+Log Pipeline Module
+Non-blocking logging: request threads put records on a bounded queue and
+one background thread formats and writes them
+
+    request thread    merges the message, attaches the request ID, drops
+                      sampled-out debug records and enqueues without waiting
+    writer thread     formats (text or JSON lines) and writes to stderr or
+                      a log file
+
+When the queue is full (the disk cannot keep up), records are dropped and
+counted instead of blocking requests; the writer reports the number
+dropped once it catches up. Every request gets an ID (X-Request-ID, taken
+from the client if it sends a valid one) that is attached to all records
+logged while it is served.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+
+from werkzeug.wsgi import ClosingIterator
+
+import metrics
+
+# ID of the request served by the current thread
+REQUEST_ID = contextvars.ContextVar('request_id', default=None)
+
+# WSGI environ key holding the request ID
+REQUEST_ID_ENVIRON_KEY = 'api.request_id'
+
+# Request IDs accepted from clients
+REQUEST_ID_PATTERN = re.compile(r'[A-Za-z0-9._-]{1,64}')
+
+# Attributes of every LogRecord; anything else was passed with extra=
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'request_id'}
+
+access_logger = logging.getLogger('api.access')
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry['request_id'] = request_id
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class QueueingHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks: full queues drop records, and debug
+    records can be sampled.
+    """
+
+    def __init__(self, log_queue, debug_sample_rate=1.0):
+        """
+        Args:
+            log_queue: Bounded queue.Queue
+            debug_sample_rate: Fraction of DEBUG records kept (1 = all)
+        """
+        super().__init__(log_queue)
+        self.debug_sample_rate = debug_sample_rate
+        self.dropped = 0
+        self.sampled_out = 0
+        self._count_lock = threading.Lock()
+
+    def emit(self, record):
+        if record.levelno < logging.INFO and self.debug_sample_rate < 1 \
+                and random.random() >= self.debug_sample_rate:
+            self.sampled_out += 1
+            return
+        super().emit(record)
+
+    def prepare(self, record):
+        """
+        Make the record independent of the calling thread.
+
+        Only the message is merged here; formatting happens on the writer
+        thread.
+        """
+        record.request_id = REQUEST_ID.get()
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._count_lock:
+                self.dropped += 1
+            metrics.LOG_DROPPED.inc()
+
+
+class _Writer(logging.handlers.QueueListener):
+    """QueueListener that reports records dropped by the handler."""
+
+    def __init__(self, log_queue, target, handler):
+        super().__init__(log_queue, target, respect_handler_level=True)
+        self.source = handler
+        self.reported = 0
+
+    def handle(self, record):
+        dropped = self.source.dropped
+        if dropped > self.reported:
+            self.reported = dropped
+            notice = logging.LogRecord('log_pipeline', logging.WARNING, __file__, 0,
+                                       '%d log records dropped (log queue full)', (dropped,), None)
+            super().handle(notice)
+        super().handle(record)
+
+
+class _Pipeline:
+    """Handler, writer thread and owning process of the installed pipeline."""
+
+    def __init__(self, handler, writer):
+        self.handler = handler
+        self.writer = writer
+        self.pid = os.getpid()
+
+    def stop(self):
+        # After a fork the writer thread exists only in the parent
+        if self.pid == os.getpid() and self.writer._thread is not None:
+            self.writer.stop()
+            for target in self.writer.handlers:
+                target.close()
+
+    def restart(self):
+        """Start a writer with a new queue in a forked child."""
+        log_queue = queue.Queue(self.handler.queue.maxsize)
+        self.handler.queue = log_queue
+        self.writer = _Writer(log_queue, self.writer.handlers[0], self.handler)
+        self.writer.start()
+        self.pid = os.getpid()
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def configure(config):
+    """
+    Install the pipeline on the root logger, replacing its handlers.
+
+    Forked children get their own writer thread automatically.
+
+    Args:
+        config: Settings with LOG_LEVEL, LOG_FORMAT, LOG_JSON, LOG_FILE,
+            LOG_QUEUE_SIZE and LOG_DEBUG_SAMPLE_RATE
+    """
+    global _pipeline
+
+    if config['LOG_FILE']:
+        target = logging.handlers.WatchedFileHandler(config['LOG_FILE'])
+    else:
+        target = logging.StreamHandler()
+    target.setFormatter(JsonFormatter() if config['LOG_JSON'] else logging.Formatter(config['LOG_FORMAT']))
+
+    log_queue = queue.Queue(config['LOG_QUEUE_SIZE'])
+    handler = QueueingHandler(log_queue, config['LOG_DEBUG_SAMPLE_RATE'])
+    writer = _Writer(log_queue, target, handler)
+
+    with _pipeline_lock:
+        root = logging.getLogger()
+        previous = _pipeline
+        for old in root.handlers[:]:
+            root.removeHandler(old)
+        root.addHandler(handler)
+        root.setLevel(config['LOG_LEVEL'])
+        writer.start()
+        _pipeline = _Pipeline(handler, writer)
+    if previous is not None:
+        previous.stop()
+
+
+def update(config):
+    """Apply reloaded log settings to the installed pipeline."""
+    logging.getLogger().setLevel(config['LOG_LEVEL'])
+    if _pipeline is not None:
+        _pipeline.handler.debug_sample_rate = config['LOG_DEBUG_SAMPLE_RATE']
+
+
+def status():
+    """
+    Describe the installed pipeline.
+
+    Returns:
+        dict: Queue size and counts of dropped and sampled-out records
+    """
+    if _pipeline is None:
+        return None
+    handler = _pipeline.handler
+    return {
+        'queued': handler.queue.qsize(),
+        'queue_size': handler.queue.maxsize,
+        'dropped': handler.dropped,
+        'sampled_out': handler.sampled_out
+    }
+
+
+def _after_fork_in_child():
+    # The parent's queue lock may have been held by its writer at fork time
+    if _pipeline is not None:
+        _pipeline.restart()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+@atexit.register
+def shutdown():
+    """Write the records still queued before the process exits."""
+    if _pipeline is not None:
+        _pipeline.stop()
+
+
+class RequestLogMiddleware:
+    """
+    WSGI middleware assigning request IDs and writing access log records
+    with the request duration (until the response is closed).
+    """
+
+    def __init__(self, wsgi_app, config):
+        """
+        Args:
+            wsgi_app: Wrapped application
+            config: App config; LOG_ACCESS is read per request
+        """
+        self.wsgi_app = wsgi_app
+        self.config = config
+
+    def __call__(self, environ, start_response):
+        started = time.perf_counter()
+        request_id = environ.get('HTTP_X_REQUEST_ID', '')
+        if not REQUEST_ID_PATTERN.fullmatch(request_id):
+            request_id = uuid.uuid4().hex
+        environ[REQUEST_ID_ENVIRON_KEY] = request_id
+        REQUEST_ID.set(request_id)
+        status = []
+
+        def add_request_id(status_line, headers, exc_info=None):
+            status[:] = [status_line.split(' ', 1)[0]]
+            headers.append(('X-Request-ID', request_id))
+            return start_response(status_line, headers, exc_info)
+
+        def finish():
+            if self.config['LOG_ACCESS']:
+                duration_ms = round((time.perf_counter() - started) * 1000, 1)
+                code = status[0] if status else '500'
+                access_logger.info('%s %s %s %.1f ms', environ['REQUEST_METHOD'], environ.get('PATH_INFO', ''),
+                                   code, duration_ms, extra={
+                                       'method': environ['REQUEST_METHOD'],
+                                       'path': environ.get('PATH_INFO', ''),
+                                       'route': environ.get('api.route', 'unmatched'),
+                                       'status': int(code),
+                                       'duration_ms': duration_ms,
+                                       'remote_addr': environ.get('REMOTE_ADDR')
+                                   })
+            REQUEST_ID.set(None)
+
+        try:
+            response = self.wsgi_app(environ, add_request_id)
+        except BaseException:
+            finish()
+            raise
+        return ClosingIterator(response, finish)
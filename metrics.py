@@ -0,0 +1,340 @@
+"""
+Metrics Module
+Prometheus-compatible counters, gauges and histograms without dependencies
+
+Updates are lock-free: every thread writes to its own shard, and shards
+are only summed when the metrics are scraped. A lock is taken once per
+thread and metric (to register the shard) and while collecting.
+"""
+
+import bisect
+import math
+import threading
+import time
+import weakref
+
+# Default latency buckets in seconds (same as the Prometheus client)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+# Throughput buckets in bytes per second (1 MB/s to 2 GB/s)
+THROUGHPUT_BUCKETS = tuple(2 ** exponent * 1024 * 1024 for exponent in range(12))
+
+# Shards of finished threads are folded into the totals once a metric has
+# more than this many (per-request threads would grow the list otherwise)
+MAX_SHARDS = 64
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value):
+    """Format a sample value for the text exposition format."""
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    """Escape a label value."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values):
+    """Format a label set, e.g. {method="GET",route="/files"}."""
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class _Metric:
+    """
+    Base class holding the per-thread shards of a metric.
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        """
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: Names of the labels; values are passed positionally
+            function: Optional callable returning {label values: value} when
+                scraped, for values that are already counted elsewhere
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._local = threading.local()
+        self._shards = []  # (weak reference to the owning thread, shard)
+        self._totals = {}  # Folded values of finished threads
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        """Return the calling thread's shard, creating it on first use."""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                if len(self._shards) >= MAX_SHARDS:
+                    self._fold()
+                self._shards.append((weakref.ref(threading.current_thread()), shard))
+            return shard
+
+    def _fold(self):
+        """Merge the shards of finished threads into the totals (lock held)."""
+        alive = []
+        for thread_ref, shard in self._shards:
+            thread = thread_ref()
+            if thread is not None and thread.is_alive():
+                alive.append((thread_ref, shard))
+            else:
+                for labels, value in shard.copy().items():
+                    self._totals[labels] = self._merge(self._totals.get(labels), value)
+        self._shards = alive
+
+    @staticmethod
+    def _merge(total, value):
+        """Add a shard value to a total."""
+        return value if total is None else total + value
+
+    def values(self):
+        """
+        Sum all shards.
+
+        Returns:
+            dict: Maps label value tuples to values
+        """
+        if self.function is not None:
+            return self.function()
+        with self._lock:
+            self._fold()
+            result = dict(self._totals)
+            for _, shard in self._shards:
+                for labels, value in shard.copy().items():
+                    result[labels] = self._merge(result.get(labels), value)
+        return result
+
+    def samples(self):
+        """Yield (suffix, label names, label values, value) for exposition."""
+        for labels, value in sorted(self.values().items()):
+            yield '', self.labelnames, labels, value
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing counter.
+    """
+
+    type = 'counter'
+
+    def inc(self, amount=1, labels=()):
+        """
+        Increase the counter.
+
+        Args:
+            amount: Non-negative increment
+            labels: Tuple of label values in labelnames order
+        """
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down, or is read from a callback when scraped.
+    """
+
+    type = 'gauge'
+
+    def inc(self, amount=1, labels=()):
+        """Increase the gauge."""
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def dec(self, amount=1, labels=()):
+        """Decrease the gauge."""
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) - amount
+
+
+class _HistogramValue:
+    """Bucket counts (not cumulative), sum and count of one label set."""
+
+    __slots__ = ('buckets', 'sum', 'count')
+
+    def __init__(self, size):
+        self.buckets = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+    def __add__(self, other):
+        result = _HistogramValue(len(self.buckets))
+        result.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        result.sum = self.sum + other.sum
+        result.count = self.count + other.count
+        return result
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values in fixed buckets.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            buckets: Increasing upper bounds; +Inf is added
+        """
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, labels=()):
+        """
+        Record an observation.
+
+        Args:
+            value: Observed value
+            labels: Tuple of label values in labelnames order
+        """
+        shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            entry = shard[labels] = _HistogramValue(len(self.upper_bounds))
+        entry.buckets[bisect.bisect_left(self.upper_bounds, value)] += 1
+        entry.sum += value
+        entry.count += 1
+
+    def time(self, labels=()):
+        """Context manager observing the duration of its block in seconds."""
+        return _Timer(self, labels)
+
+    @staticmethod
+    def _merge(total, value):
+        """Add a shard value to a total without sharing the shard's object."""
+        return (total or _HistogramValue(len(value.buckets))) + value
+
+    def samples(self):
+        """Yield cumulative bucket, sum and count samples."""
+        names = self.labelnames + ('le',)
+        for labels, value in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds, value.buckets):
+                cumulative += count
+                yield '_bucket', names, labels + (_format_value(float(bound)),), cumulative
+            yield '_sum', self.labelnames, labels, value.sum
+            yield '_count', self.labelnames, labels, value.count
+
+
+class _Timer:
+    """Context manager used by Histogram.time()."""
+
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, self.labels)
+
+
+class Registry:
+    """
+    Collection of metrics rendered together.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """
+        Add a metric, returning the already registered one of the same name.
+
+        Args:
+            metric: Counter, Gauge or Histogram
+
+        Returns:
+            The registered metric
+        """
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=(), function=None):
+        """Create and register a Counter."""
+        return self.register(Counter(name, documentation, labelnames, function))
+
+    def gauge(self, name, documentation, labelnames=(), function=None):
+        """Create and register a Gauge."""
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Create and register a Histogram."""
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name):
+        """Return a registered metric by name (or None)."""
+        return self._metrics.get(name)
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str
+        """
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, names, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(names, labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'flask_http_requests_total', 'HTTP requests by route and status', ('method', 'route', 'status'))
+HTTP_DURATION = REGISTRY.histogram(
+    'flask_http_request_duration_seconds', 'HTTP request duration until the response is closed',
+    ('method', 'route'))
+HTTP_IN_FLIGHT = REGISTRY.gauge('flask_http_requests_in_flight', 'HTTP requests being served')
+
+TRANSFER_BYTES = REGISTRY.counter(
+    'flask_transfer_bytes_total', 'File bytes uploaded or downloaded', ('direction',))
+TRANSFER_THROUGHPUT = REGISTRY.histogram(
+    'flask_transfer_throughput_bytes_per_second', 'Throughput of single uploads and downloads',
+    ('direction',), THROUGHPUT_BUCKETS)
+
+HASH_BYTES = REGISTRY.counter('flask_hash_bytes_total', 'Bytes hashed by calculate_file_hash', ('algorithm',))
+HASH_DURATION = REGISTRY.histogram(
+    'flask_hash_duration_seconds', 'Time spent in calculate_file_hash', ('algorithm',))
+HASH_THROUGHPUT = REGISTRY.histogram(
+    'flask_hash_throughput_bytes_per_second', 'Hashing throughput per file', ('algorithm',), THROUGHPUT_BUCKETS)
+
+PROCESS_SCAN_DURATION = REGISTRY.histogram(
+    'flask_process_scan_duration_seconds', 'Duration of process table scans', ('kind',))
+
+ADMISSION_REJECTED = REGISTRY.counter(
+    'flask_admission_rejected_total', 'Requests shed by rate limits (429) or concurrency caps (503)',
+    ('route', 'reason'))
+
+LOG_DROPPED = REGISTRY.counter(
+    'flask_log_records_dropped_total', 'Log records dropped because the log queue was full')
+
+RESPONSE_CACHE = REGISTRY.counter(
+    'flask_response_cache_total', 'Cached read endpoint requests served from memory (hit) or built (miss)',
+    ('route', 'result'))
@@ -0,0 +1,268 @@
+"""
+Output Capture Module
+Captures stdout/stderr of managed processes into bounded buffers
+"""
+
+import os
+import selectors
+import threading
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Longest line kept in a buffer; longer lines are split
+MAX_LINE_LENGTH = 4096
+
+# Bytes read from a pipe per wakeup
+READ_CHUNK_SIZE = 65536
+
+
+class OutputBuffer:
+    """
+    Ring buffer of output lines with absolute offsets.
+
+    Every line gets a monotonically increasing offset so readers can resume
+    where they stopped. Old lines are dropped once max_lines is reached.
+    Optionally mirrors all lines into a size-bounded rotating log file.
+    """
+
+    def __init__(self, max_lines=1000, log_path=None, max_bytes=1024 * 1024, backup_count=3):
+        """
+        Initialize the buffer.
+
+        Args:
+            max_lines: Number of lines kept in memory
+            log_path: Optional path of a rotating log file
+            max_bytes: Maximum size of the log file before rotation
+            backup_count: Number of rotated log files to keep
+        """
+        self.lines = deque(maxlen=max_lines)
+        self.next_offset = 0
+        self.closed = False
+        self.log_path = log_path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._log_file = None
+        self._condition = threading.Condition()
+
+        if log_path:
+            os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+            self._log_file = open(log_path, 'ab')
+
+    def append(self, stream, text):
+        """
+        Append a line to the buffer.
+
+        Args:
+            stream: Name of the source stream ('stdout' or 'stderr')
+            text: Line content without trailing newline
+        """
+        with self._condition:
+            self.lines.append((self.next_offset, stream, text))
+            self.next_offset += 1
+            if self._log_file is not None:
+                self._write_log(stream, text)
+            self._condition.notify_all()
+
+    def _write_log(self, stream, text):
+        """Write a line to the log file, rotating it when it grows too large."""
+        try:
+            self._log_file.write(f"[{stream}] {text}\n".encode('utf-8', 'replace'))
+            self._log_file.flush()
+            if self._log_file.tell() >= self.max_bytes:
+                self._rotate_log()
+        except OSError as ex:
+            logger.error("Failed to write output log %s: %s", self.log_path, ex)
+
+    def _rotate_log(self):
+        """Rotate log files as log_path -> log_path.1 -> ... -> log_path.N."""
+        self._log_file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.log_path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.log_path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.log_path, f"{self.log_path}.1")
+        else:
+            os.remove(self.log_path)
+        self._log_file = open(self.log_path, 'ab')
+
+    def read(self, offset=0, limit=None):
+        """
+        Read lines starting at an offset.
+
+        Args:
+            offset: First offset to return
+            limit: Maximum number of lines to return
+
+        Returns:
+            dict: Lines, next offset to resume from and number of dropped lines
+        """
+        with self._condition:
+            first_offset = self.lines[0][0] if self.lines else self.next_offset
+            start = max(offset, first_offset)
+            lines = [
+                {'offset': line_offset, 'stream': stream, 'text': text}
+                for line_offset, stream, text in self.lines
+                if line_offset >= start
+            ]
+            if limit is not None:
+                lines = lines[:limit]
+            next_offset = lines[-1]['offset'] + 1 if lines else max(offset, start)
+            return {
+                'lines': lines,
+                'first_offset': first_offset,
+                'next_offset': next_offset,
+                'dropped': max(0, first_offset - offset),
+                'closed': self.closed
+            }
+
+    def wait(self, offset, timeout=None):
+        """
+        Block until a line at or after offset is available or the buffer closes.
+
+        Args:
+            offset: Offset the caller is waiting for
+            timeout: Maximum time to wait in seconds
+
+        Returns:
+            bool: True if new data is available or the buffer is closed
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self.next_offset > offset or self.closed,
+                timeout=timeout
+            )
+
+    def close(self):
+        """Mark the buffer as finished and close the log file."""
+        with self._condition:
+            self.closed = True
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+            self._condition.notify_all()
+
+
+class OutputCollector:
+    """
+    Drains the pipes of all captured processes from a single thread.
+
+    Pipes are read non-blocking through a selector so a chatty child can
+    never fill its pipe and stall while nobody is reading.
+    """
+
+    def __init__(self):
+        """Initialize the collector and start the reader thread."""
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._pending = {}  # Maps fd to partial line bytes
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+        self._thread = threading.Thread(target=self._run, name='output-collector', daemon=True)
+        self._thread.start()
+
+    def attach(self, process, buffer):
+        """
+        Start draining stdout/stderr of a process into a buffer.
+
+        Args:
+            process: subprocess.Popen object created with stdout/stderr pipes
+            buffer: OutputBuffer receiving the lines
+        """
+        streams = [(s, name) for s, name in ((process.stdout, 'stdout'), (process.stderr, 'stderr')) if s]
+        state = {'open': len(streams), 'buffer': buffer}
+        with self._lock:
+            for stream, name in streams:
+                fd = stream.fileno()
+                os.set_blocking(fd, False)
+                self._pending[fd] = b''
+                self._selector.register(fd, selectors.EVENT_READ, (stream, name, state))
+        os.write(self._wakeup_w, b'x')
+
+    def _run(self):
+        """Reader loop."""
+        while True:
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    try:
+                        os.read(self._wakeup_r, 4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                self._drain(key.fd, *key.data)
+
+    def _drain(self, fd, stream, name, state):
+        """Read available data from one pipe and split it into lines."""
+        buffer = state['buffer']
+        try:
+            data = os.read(fd, READ_CHUNK_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+
+        with self._lock:
+            pending = self._pending.get(fd, b'') + data
+            if data:
+                *complete, pending = pending.split(b'\n')
+                self._pending[fd] = pending
+            else:
+                complete = [pending] if pending else []
+                self._pending.pop(fd, None)
+
+        for raw in complete:
+            self._emit(buffer, name, raw)
+        # Flush overlong partial lines so memory stays bounded
+        while len(self._pending.get(fd, b'')) > MAX_LINE_LENGTH:
+            with self._lock:
+                pending = self._pending[fd]
+                self._pending[fd] = pending[MAX_LINE_LENGTH:]
+            self._emit(buffer, name, pending[:MAX_LINE_LENGTH])
+
+        if not data:
+            with self._lock:
+                self._selector.unregister(fd)
+            stream.close()
+            state['open'] -= 1
+            if state['open'] == 0:
+                buffer.close()
+
+    @staticmethod
+    def _emit(buffer, name, raw):
+        """Decode a raw line and append it, splitting overlong lines."""
+        text = raw.rstrip(b'\r').decode('utf-8', 'replace')
+        for start in range(0, max(len(text), 1), MAX_LINE_LENGTH):
+            buffer.append(name, text[start:start + MAX_LINE_LENGTH])
+
+
+def follow(buffer, offset=0, heartbeat=15.0, idle_timeout=None):
+    """
+    Generate lines from a buffer as they arrive.
+
+    Args:
+        buffer: OutputBuffer to follow
+        offset: Offset to resume from
+        heartbeat: Seconds between keep-alive None yields while idle
+        idle_timeout: Stop after this many idle seconds (None = never)
+
+    Yields:
+        dict: Line entries, or None as a keep-alive marker
+    """
+    idle_since = time.monotonic()
+    while True:
+        chunk = buffer.read(offset)
+        for line in chunk['lines']:
+            yield line
+        offset = chunk['next_offset']
+        if chunk['lines']:
+            idle_since = time.monotonic()
+        elif chunk['closed']:
+            return
+        elif idle_timeout is not None and time.monotonic() - idle_since >= idle_timeout:
+            return
+        if not buffer.wait(offset, timeout=heartbeat):
+            yield None
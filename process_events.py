@@ -0,0 +1,107 @@
+"""
+Process Events Module
+In-memory event bus for pushing process state transitions to listeners
+"""
+
+import time
+import threading
+from collections import deque
+
+
+class EventBus:
+    """
+    Publish/subscribe bus with a bounded event history.
+
+    Events get increasing IDs. Listeners keep their own position in the
+    history, so publishing never blocks and a slow listener only misses
+    events that have already been evicted.
+    """
+
+    def __init__(self, history=256):
+        """
+        Initialize the bus.
+
+        Args:
+            history: Number of recent events kept for listeners and resume
+        """
+        self._history = deque(maxlen=history)
+        self._next_id = 1
+        self._condition = threading.Condition()
+        self.listeners = 0
+
+    @property
+    def last_id(self):
+        """ID of the most recently published event (0 if none)."""
+        with self._condition:
+            return self._next_id - 1
+
+    def publish(self, event_type, **fields):
+        """
+        Publish an event.
+
+        Args:
+            event_type: Event type (e.g. 'started', 'exited')
+            **fields: Additional event fields
+
+        Returns:
+            dict: The published event
+        """
+        with self._condition:
+            event = {'id': self._next_id, 'type': event_type, 'time': time.time()}
+            event.update(fields)
+            self._next_id += 1
+            self._history.append(event)
+            self._condition.notify_all()
+        return event
+
+    def events_after(self, last_id):
+        """
+        Return events published after an event ID.
+
+        Args:
+            last_id: ID of the last event the caller has seen
+
+        Returns:
+            tuple: (list of events, number of events missed due to eviction)
+        """
+        with self._condition:
+            events = [event for event in self._history if event['id'] > last_id]
+            oldest = self._history[0]['id'] if self._history else self._next_id
+            missed = max(0, oldest - last_id - 1)
+            return events, missed
+
+    def listen(self, last_id=None, heartbeat=15.0, predicate=None):
+        """
+        Generate events as they are published.
+
+        Args:
+            last_id: Resume after this event ID (None = only new events)
+            heartbeat: Seconds between keep-alive None yields while idle
+            predicate: Optional filter function for events
+
+        Yields:
+            dict: Events, or None as a keep-alive marker
+        """
+        with self._condition:
+            if last_id is None:
+                last_id = self._next_id - 1
+            self.listeners += 1
+        try:
+            while True:
+                events, missed = self.events_after(last_id)
+                if missed:
+                    yield {'id': last_id + missed, 'type': 'dropped', 'count': missed}
+                for event in events:
+                    if predicate is None or predicate(event):
+                        yield event
+                if events:
+                    last_id = events[-1]['id']
+                with self._condition:
+                    notified = self._condition.wait_for(
+                        lambda: self._next_id - 1 > last_id, timeout=heartbeat
+                    )
+                if not notified:
+                    yield None
+        finally:
+            with self._condition:
+                self.listeners -= 1
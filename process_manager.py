@@ -7,6 +7,15 @@ import subprocess
 import logging
 import psutil
 import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import PROCESS_SCAN_DURATION
+from output_capture import OutputBuffer, OutputCollector
+from process_scheduling import validate_scheduling, make_preexec_fn, apply_ionice
+from process_events import EventBus
 
 logger = logging.getLogger(__name__)
 
@@ -17,24 +26,87 @@ class ProcessManager:
     Prevents duplicate process starts.
     """
     
-    def __init__(self):
-        """Initialize the process manager."""
+    # Supported output capture modes
+    CAPTURE_MODES = ('memory', 'file')
+    
+    # Supported stop scopes: the process only, its process group or its session
+    STOP_SCOPES = ('process', 'group', 'session')
+    
+    # Supported batch actions
+    BATCH_ACTIONS = ('start', 'stop', 'restart')
+    
+    def __init__(self, output_dir=None, output_max_lines=1000, output_max_bytes=1024 * 1024,
+                 default_cpu_affinity=None, monitor_interval=1.0, cpu_threshold=None,
+                 memory_threshold_mb=None, event_history=256):
+        """
+        Initialize the process manager.
+        
+        Args:
+            output_dir: Directory for captured output log files
+            output_max_lines: Lines kept in memory per captured process
+            output_max_bytes: Maximum size of a captured output log file
+            default_cpu_affinity: CPUs for started processes without an
+                explicit affinity (keeps them off cores reserved for the server)
+            monitor_interval: Seconds between state checks while processes
+                are managed or events are listened to
+            cpu_threshold: Default CPU percent threshold for threshold events
+            memory_threshold_mb: Default RSS threshold for threshold events
+            event_history: Events kept for listeners resuming a stream
+        """
         self.managed_processes = {}  # Maps process names to PIDs
+        self.outputs = {}  # Maps process names to OutputBuffers
+        self.output_dir = output_dir
+        self.output_max_lines = output_max_lines
+        self.output_max_bytes = output_max_bytes
+        self.default_cpu_affinity = default_cpu_affinity
+        self.monitor_interval = monitor_interval
+        self.default_thresholds = {'cpu_percent': cpu_threshold, 'memory_mb': memory_threshold_mb}
+        self.thresholds = {}  # Maps process names to threshold overrides
+        self.events = EventBus(event_history)
+        self._popens = {}  # Maps process names to Popen objects for exit codes
+        self._monitored = {}  # Maps PIDs to psutil.Process objects (CPU deltas)
+        self._exceeded = set()  # (process name, metric) pairs above threshold, guarded by _lock
+        self._stopping = set()  # Names being stopped by stop_process, guarded by _lock
+        self._monitor_thread = None
+        self._collector = None
+        self._lock = threading.RLock()
         logger.info("Process manager initialized")
     
-    def is_process_running(self, process_name):
+    def snapshot_processes(self):
+        """
+        Take a snapshot of the system process table.
+        
+        A snapshot can be shared by several lookups so that a batch of
+        operations scans the process table only once.
+        
+        Returns:
+            list: Process info dictionaries with pid, name and cmdline
+        """
+        snapshot = []
+        with PROCESS_SCAN_DURATION.time(('snapshot',)):
+            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+                try:
+                    snapshot.append(proc.info)
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    continue
+        return snapshot
+    
+    def is_process_running(self, process_name, snapshot=None):
         """
         Check if a process with the given name is running.
         
         Args:
             process_name: Name or path of the process
+            snapshot: Optional result of snapshot_processes() to search
+                instead of scanning the process table
             
         Returns:
             tuple: (is_running, pid or None)
         """
         # Check if we have it in our managed processes
-        if process_name in self.managed_processes:
-            pid = self.managed_processes[process_name]
+        with self._lock:
+            pid = self.managed_processes.get(process_name)
+        if pid is not None:
             if psutil.pid_exists(pid):
                 try:
                     proc = psutil.Process(pid)
@@ -42,28 +114,33 @@ class ProcessManager:
                         return True, pid
                 except (psutil.NoSuchProcess, psutil.AccessDenied):
                     pass
-            # Remove stale entry
-            del self.managed_processes[process_name]
+            # Remove stale entry and reap it if it is our child
+            with self._lock:
+                if self.managed_processes.get(process_name) == pid:
+                    del self.managed_processes[process_name]
+                    popen = self._popens.pop(process_name, None)
+                    if popen is not None:
+                        popen.poll()
         
         # Check system-wide for the process
+        if snapshot is None:
+            snapshot = self.snapshot_processes()
+        
         process_basename = os.path.basename(process_name)
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                # Check process name
-                if proc.info['name'] == process_basename:
-                    return True, proc.info['pid']
-                
-                # Check command line
-                cmdline = proc.info.get('cmdline')
-                if cmdline and any(process_name in arg for arg in cmdline):
-                    return True, proc.info['pid']
-                    
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                continue
+        for info in snapshot:
+            # Check process name
+            if info['name'] == process_basename:
+                return True, info['pid']
+            
+            # Check command line
+            cmdline = info.get('cmdline')
+            if cmdline and any(process_name in arg for arg in cmdline):
+                return True, info['pid']
         
         return False, None
     
-    def start_process(self, command, check_running=True, cwd=None, env=None):
+    def start_process(self, command, check_running=True, cwd=None, env=None, capture_output=None,
+                      scheduling=None, thresholds=None, snapshot=None):
         """
         Start a process.
         
@@ -72,6 +149,13 @@ class ProcessManager:
             check_running: If True, check if process is already running
             cwd: Working directory for the process
             env: Environment variables dictionary
+            capture_output: None to discard output, 'memory' for an in-memory
+                ring buffer or 'file' for a ring buffer plus rotating log file
+            scheduling: Optional dict with cpu_affinity, nice, ionice and
+                rlimits, applied at spawn time (see process_scheduling)
+            thresholds: Optional dict with cpu_percent and memory_mb limits
+                that trigger threshold events
+            snapshot: Optional process table snapshot for the running check
             
         Returns:
             dict: Status information including pid and whether it was started
@@ -85,13 +169,26 @@ class ProcessManager:
         if not cmd_list:
             raise ValueError("Command cannot be empty")
         
+        if capture_output and capture_output not in self.CAPTURE_MODES:
+            raise ValueError(f"Invalid capture_output mode: {capture_output}")
+        if capture_output == 'file' and not self.output_dir:
+            raise ValueError("File capture requires an output directory")
+        
+        scheduling = validate_scheduling(scheduling)
+        
+        if thresholds is not None:
+            if not isinstance(thresholds, dict) or set(thresholds) - set(self.default_thresholds):
+                raise ValueError(f"thresholds may only contain {sorted(self.default_thresholds)}")
+            if not all(isinstance(v, (int, float)) for v in thresholds.values()):
+                raise ValueError("threshold values must be numbers")
+        
         process_name = cmd_list[0]
         
         # Check if already running
         if check_running:
-            is_running, pid = self.is_process_running(process_name)
+            is_running, pid = self.is_process_running(process_name, snapshot)
             if is_running:
-                logger.info(f"Process {process_name} already running with PID {pid}")
+                logger.info("Process %s already running with PID %s", process_name, pid)
                 return {
                     'status': 'already_running',
                     'pid': pid,
@@ -111,50 +208,181 @@ class ProcessManager:
             if env:
                 proc_env.update(env)
             
-            # Use devnull for stdout/stderr to avoid zombie processes
+            # Use devnull for stdout/stderr to avoid zombie processes unless
+            # capture is requested; captured pipes are drained continuously
             # GUI applications need to run independently
             # start_new_session=True creates new process group AND session (better than setpgrp)
+            output = subprocess.PIPE if capture_output else subprocess.DEVNULL
             process = subprocess.Popen(
                 cmd_list,
                 cwd=cwd,
                 env=proc_env,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
+                stdout=output,
+                stderr=output,
                 stdin=subprocess.DEVNULL,
-                start_new_session=True  # Detach from parent, creates new process group & session
+                start_new_session=True,  # Detach from parent, creates new process group & session
+                preexec_fn=make_preexec_fn(scheduling, self.default_cpu_affinity)
             )
             
             pid = process.pid
-            self.managed_processes[process_name] = pid
+            with self._lock:
+                self.managed_processes[process_name] = pid
+                self._popens[process_name] = process
+                if thresholds is not None:
+                    self.thresholds[process_name] = thresholds
+                else:
+                    self.thresholds.pop(process_name, None)
             
-            logger.info(f"Started process {process_name} with PID {pid}")
+            if capture_output:
+                self._capture(process_name, process, capture_output)
             
-            return {
+            warnings = []
+            if 'ionice' in scheduling:
+                try:
+                    apply_ionice(pid, scheduling['ionice'])
+                except (psutil.Error, OSError) as ex:
+                    logger.warning("Failed to set I/O priority for %s: %s", process_name, ex)
+                    warnings.append(f"ionice not applied: {ex}")
+            
+            logger.info("Started process %s with PID %s", process_name, pid)
+            self.events.publish('started', process=process_name, pid=pid, command=' '.join(cmd_list))
+            self._ensure_monitor()
+            
+            result = {
                 'status': 'started',
                 'pid': pid,
                 'process': process_name,
                 'command': ' '.join(cmd_list),
+                'capture_output': capture_output,
                 'message': f'Process started successfully with PID {pid}'
             }
+            if scheduling:
+                result['scheduling'] = scheduling
+            if warnings:
+                result['warnings'] = warnings
+            return result
             
+        except subprocess.SubprocessError as ex:
+            # Raised when scheduling options cannot be applied in the child
+            logger.error("Failed to apply scheduling options for %s: %s", process_name, ex)
+            raise ValueError(f"Failed to apply scheduling options: {ex}")
         except FileNotFoundError:
-            logger.error(f"Command not found: {process_name}")
+            logger.error("Command not found: %s", process_name)
             raise FileNotFoundError(f"Command not found: {process_name}")
         except Exception as ex:
-            logger.error(f"Failed to start process {process_name}: {ex}")
+            logger.error("Failed to start process %s: %s", process_name, ex)
             raise
     
-    def stop_process(self, process_name):
+    def _capture(self, process_name, process, mode):
+        """
+        Attach output capture to a freshly started process.
+        
+        Args:
+            process_name: Name of the process
+            process: subprocess.Popen object with stdout/stderr pipes
+            mode: Capture mode ('memory' or 'file')
+        """
+        log_path = None
+        if mode == 'file':
+            safe_name = os.path.basename(process_name) or 'process'
+            log_path = os.path.join(self.output_dir, f"{safe_name}.log")
+        
+        buffer = OutputBuffer(
+            max_lines=self.output_max_lines,
+            log_path=log_path,
+            max_bytes=self.output_max_bytes
+        )
+        with self._lock:
+            previous = self.outputs.get(process_name)
+            if previous is not None:
+                previous.close()
+            self.outputs[process_name] = buffer
+            
+            if self._collector is None:
+                self._collector = OutputCollector()
+        self._collector.attach(process, buffer)
+    
+    def get_output(self, process_name):
+        """
+        Get the captured output buffer of a process.
+        
+        Args:
+            process_name: Name of the process
+            
+        Returns:
+            OutputBuffer or None if output is not captured
+        """
+        return self.outputs.get(process_name)
+    
+    def _signal_targets(self, pid, scope):
+        """
+        Resolve the processes to signal for a stop request.
+        
+        Group and session scopes only apply when the process leads its own
+        group/session (as processes started by start_process do), so a stop
+        can never reach the API server's own group.
+        
+        Args:
+            pid: PID of the process to stop
+            scope: One of STOP_SCOPES
+            
+        Returns:
+            tuple: (list of psutil.Process objects, effective scope)
+        """
+        leader = psutil.Process(pid)
+        if scope == 'group':
+            if os.getpgid(pid) != pid or pid == os.getpgid(0):
+                logger.warning("PID %s is not a process group leader, signalling process only", pid)
+                return [leader], 'process'
+            members = []
+            for proc in psutil.process_iter():
+                try:
+                    if os.getpgid(proc.pid) == pid:
+                        members.append(proc)
+                except (ProcessLookupError, psutil.NoSuchProcess):
+                    continue
+            return members or [leader], 'group'
+        if scope == 'session':
+            if os.getsid(pid) != pid or pid == os.getsid(0):
+                logger.warning("PID %s is not a session leader, signalling process only", pid)
+                return [leader], 'process'
+            members = []
+            for proc in psutil.process_iter():
+                try:
+                    if os.getsid(proc.pid) == pid:
+                        members.append(proc)
+                except (ProcessLookupError, PermissionError, psutil.NoSuchProcess):
+                    continue
+            return members or [leader], 'session'
+        return [leader], 'process'
+    
+    @staticmethod
+    def _wait_popen(popen, timeout):
+        """Wait for a child started by start_process; True once it has exited."""
+        try:
+            popen.wait(timeout)
+            return True
+        except subprocess.TimeoutExpired:
+            return False
+    
+    def stop_process(self, process_name, scope='process', timeout=5, snapshot=None):
         """
         Stop a managed process.
         
         Args:
             process_name: Name of the process to stop
+            scope: 'process' to signal only the process, 'group' to signal its
+                process group or 'session' to signal its whole session
+            timeout: Seconds to wait for termination before killing
+            snapshot: Optional process table snapshot for the running check
             
         Returns:
             dict: Status information
         """
-        is_running, pid = self.is_process_running(process_name)
+        if scope not in self.STOP_SCOPES:
+            raise ValueError(f"Invalid stop scope: {scope}")
+        
+        is_running, pid = self.is_process_running(process_name, snapshot)
         
         if not is_running:
             return {
@@ -163,41 +391,211 @@ class ProcessManager:
                 'message': 'Process is not running'
             }
         
+        # The monitor must not report the exit this stop causes as 'exited'
+        with self._lock:
+            self._stopping.add(process_name)
+            popen = self._popens.get(process_name)
+        # Our own child is reaped through its Popen, which keeps its exit code
+        # (a waitpid by psutil would leave Popen with ECHILD and code 0)
+        own = popen if popen is not None and popen.pid == pid else None
         try:
-            proc = psutil.Process(pid)
-            proc.terminate()
+            targets, scope = self._signal_targets(pid, scope)
+            if scope == 'group':
+                os.killpg(pid, signal.SIGTERM)
+            else:
+                for proc in targets:
+                    try:
+                        proc.terminate()
+                    except psutil.NoSuchProcess:
+                        pass
             
-            # Wait for process to terminate (max 5 seconds)
-            try:
-                proc.wait(timeout=5)
-            except psutil.TimeoutExpired:
-                # Force kill if not terminated
-                proc.kill()
-                proc.wait(timeout=2)
+            # Wait for processes to terminate, force kill the rest
+            deadline = time.monotonic() + timeout
+            others = [proc for proc in targets if own is None or proc.pid != pid]
+            own_alive = own is not None and not self._wait_popen(own, timeout)
+            _, alive = psutil.wait_procs(others, timeout=max(0.0, deadline - time.monotonic()))
+            if own_alive:
+                own.kill()
+                self._wait_popen(own, 2)
+            for proc in alive:
+                try:
+                    proc.kill()
+                except psutil.NoSuchProcess:
+                    pass
+            if alive:
+                psutil.wait_procs(alive, timeout=2)
+            
+            if own is not None:
+                exit_code = own.returncode
+            else:
+                # Set by wait_procs for children only
+                exit_code = next((getattr(proc, 'returncode', None) for proc in targets if proc.pid == pid), None)
             
             # Remove from managed processes
-            if process_name in self.managed_processes:
-                del self.managed_processes[process_name]
+            with self._lock:
+                if self.managed_processes.get(process_name) == pid:
+                    del self.managed_processes[process_name]
+                    self._popens.pop(process_name, None)
             
-            logger.info(f"Stopped process {process_name} (PID {pid})")
+            logger.info("Stopped process %s (PID %s, %s processes)", process_name, pid, len(targets))
+            self.events.publish('stopped', process=process_name, pid=pid, exit_code=exit_code)
             
             return {
                 'status': 'stopped',
                 'pid': pid,
                 'process': process_name,
+                'scope': scope,
+                'signalled': sorted(proc.pid for proc in targets),
                 'message': f'Process stopped successfully (PID {pid})'
             }
             
         except (psutil.NoSuchProcess, psutil.AccessDenied) as ex:
-            logger.error(f"Failed to stop process {process_name}: {ex}")
+            logger.error("Failed to stop process %s: %s", process_name, ex)
             raise
+        finally:
+            with self._lock:
+                self._stopping.discard(process_name)
+    
+    # Attributes collected per process for tree aggregation
+    TREE_ATTRS = ['pid', 'ppid', 'name', 'status', 'cpu_times', 'memory_info',
+                  'num_threads', 'create_time']
+    
+    def _scan_table(self, attrs):
+        """
+        Scan the process table once.
+        
+        Args:
+            attrs: psutil attribute names to collect
+            
+        Returns:
+            dict: Maps PIDs to process info dictionaries
+        """
+        table = {}
+        with PROCESS_SCAN_DURATION.time(('table',)):
+            for proc in psutil.process_iter(attrs):
+                try:
+                    table[proc.info['pid']] = proc.info
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    continue
+        return table
+    
+    @staticmethod
+    def _cpu_seconds(info):
+        """Return consumed CPU seconds from a process info dictionary."""
+        cpu_times = info.get('cpu_times')
+        if cpu_times is None:
+            return 0.0
+        return cpu_times.user + cpu_times.system
+    
+    def collect_trees(self, root_pids, interval=0.1, include_uss=False):
+        """
+        Collect aggregated resource usage of the descendant trees of PIDs.
+        
+        The process table is scanned twice, `interval` seconds apart, and
+        every tree is built from those shared snapshots: CPU usage comes
+        from the cpu_times delta, so one sleep covers all trees.
+        
+        Args:
+            root_pids: PIDs whose trees should be collected
+            interval: CPU sampling interval in seconds
+            include_uss: Also collect USS (unique set size, more expensive)
+            
+        Returns:
+            dict: Maps each root PID to its tree info (None if gone)
+        """
+        before = self._scan_table(['pid', 'cpu_times'])
+        started = time.monotonic()
+        time.sleep(interval)
+        table = self._scan_table(self.TREE_ATTRS)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        
+        children = {}
+        for pid, info in table.items():
+            children.setdefault(info['ppid'], []).append(pid)
+        
+        trees = {}
+        for root_pid in root_pids:
+            if root_pid not in table:
+                trees[root_pid] = None
+                continue
+            
+            members = []
+            pending = [root_pid]
+            while pending:
+                pid = pending.pop()
+                info = table[pid]
+                previous = before.get(pid)
+                cpu_delta = self._cpu_seconds(info) - (self._cpu_seconds(previous) if previous else 0.0)
+                member = {
+                    'pid': pid,
+                    'ppid': info['ppid'],
+                    'name': info['name'],
+                    'status': info['status'],
+                    'cpu_percent': round(max(cpu_delta, 0.0) / elapsed * 100, 1),
+                    'memory_mb': info['memory_info'].rss / 1024 / 1024 if info['memory_info'] else 0.0,
+                    'num_threads': info['num_threads'] or 0,
+                    'create_time': info['create_time']
+                }
+                if include_uss:
+                    try:
+                        member['uss_mb'] = psutil.Process(pid).memory_full_info().uss / 1024 / 1024
+                    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                        member['uss_mb'] = None
+                members.append(member)
+                pending.extend(children.get(pid, []))
+            
+            tree = {
+                'process_count': len(members),
+                'cpu_percent': round(sum(m['cpu_percent'] for m in members), 1),
+                'memory_mb': sum(m['memory_mb'] for m in members),
+                'num_threads': sum(m['num_threads'] for m in members),
+                'processes': members
+            }
+            if include_uss:
+                tree['uss_mb'] = sum(m['uss_mb'] for m in members if m['uss_mb'] is not None)
+            trees[root_pid] = tree
+        
+        return trees
+    
+    def _tree_status(self, process_name, pid, tree):
+        """
+        Build a status dictionary from collected tree info.
+        
+        Args:
+            process_name: Name of the process
+            pid: PID of the top process
+            tree: Tree info from collect_trees() or None
+            
+        Returns:
+            dict: Process status information including the tree
+        """
+        if tree is None:
+            return {
+                'running': False,
+                'process': process_name,
+                'pid': None
+            }
+        
+        root = tree['processes'][0]
+        return {
+            'running': True,
+            'process': process_name,
+            'pid': pid,
+            'status': root['status'],
+            'cpu_percent': root['cpu_percent'],
+            'memory_mb': root['memory_mb'],
+            'create_time': root['create_time'],
+            'tree': tree
+        }
     
-    def get_process_status(self, process_name):
+    def get_process_status(self, process_name, include_tree=False, include_uss=False):
         """
         Get status of a process.
         
         Args:
             process_name: Name of the process
+            include_tree: Include aggregated usage of all descendants
+            include_uss: Include USS in the tree (requires include_tree)
             
         Returns:
             dict: Process status information
@@ -211,6 +609,10 @@ class ProcessManager:
                 'pid': None
             }
         
+        if include_tree:
+            trees = self.collect_trees([pid], include_uss=include_uss)
+            return self._tree_status(process_name, pid, trees[pid])
+        
         try:
             proc = psutil.Process(pid)
             return {
@@ -223,7 +625,7 @@ class ProcessManager:
                 'create_time': proc.create_time()
             }
         except (psutil.NoSuchProcess, psutil.AccessDenied) as ex:
-            logger.error(f"Failed to get process status for {process_name}: {ex}")
+            logger.error("Failed to get process status for %s: %s", process_name, ex)
             return {
                 'running': False,
                 'process': process_name,
@@ -231,27 +633,326 @@ class ProcessManager:
                 'error': str(ex)
             }
     
-    def list_managed_processes(self):
+    def list_managed_processes(self, include_tree=False, include_uss=False):
         """
         List all managed processes and their status.
         
+        Args:
+            include_tree: Include aggregated usage of all descendants; all
+                trees are collected from one shared snapshot
+            include_uss: Include USS in the trees (requires include_tree)
+        
         Returns:
             list: List of process information dictionaries
         """
         processes = []
         
         # Clean up stale entries
-        stale_processes = []
-        for process_name, pid in list(self.managed_processes.items()):
-            if not psutil.pid_exists(pid):
-                stale_processes.append(process_name)
+        with self._lock:
+            stale_processes = []
+            for process_name, pid in list(self.managed_processes.items()):
+                if not psutil.pid_exists(pid):
+                    stale_processes.append(process_name)
+            
+            for process_name in stale_processes:
+                del self.managed_processes[process_name]
+            
+            managed = list(self.managed_processes.items())
         
-        for process_name in stale_processes:
-            del self.managed_processes[process_name]
+        if include_tree:
+            trees = self.collect_trees([pid for _, pid in managed], include_uss=include_uss)
+            return [self._tree_status(name, pid, trees[pid]) for name, pid in managed]
         
         # Get status for all managed processes
-        for process_name in list(self.managed_processes.keys()):
+        for process_name, _ in managed:
             status = self.get_process_status(process_name)
             processes.append(status)
         
         return processes
+    
+    def restart_process(self, command, process_name=None, scope='process', snapshot=None, **start_options):
+        """
+        Stop a process (if running) and start it again.
+        
+        Args:
+            command: Command to execute (string or list)
+            process_name: Name of the process to stop (default: first command word)
+            scope: Stop scope, see stop_process()
+            snapshot: Optional process table snapshot for the running check
+            **start_options: Additional keyword arguments for start_process()
+            
+        Returns:
+            dict: Status information of the stop and start steps
+        """
+        if process_name is None:
+            cmd_list = command.split() if isinstance(command, str) else command
+            if not cmd_list:
+                raise ValueError("Command cannot be empty")
+            process_name = cmd_list[0]
+        
+        stopped = self.stop_process(process_name, scope=scope, snapshot=snapshot)
+        start_options['check_running'] = False
+        started = self.start_process(command, **start_options)
+        self.events.publish('restarted', process=started['process'], pid=started['pid'],
+                            previous_pid=stopped.get('pid'))
+        
+        return {
+            'status': 'restarted',
+            'pid': started['pid'],
+            'process': started['process'],
+            'previous_pid': stopped.get('pid'),
+            'message': f"Process restarted with PID {started['pid']}"
+        }
+    
+    def _run_operation(self, operation, snapshot):
+        """
+        Run a single batch operation.
+        
+        Args:
+            operation: Operation dictionary (see run_batch)
+            snapshot: Shared process table snapshot
+            
+        Returns:
+            dict: Operation result
+        """
+        action = operation.get('action')
+        if action not in self.BATCH_ACTIONS:
+            raise ValueError(f"Invalid action: {action}")
+        
+        start_options = {
+            'cwd': operation.get('cwd'),
+            'env': operation.get('env'),
+            'capture_output': operation.get('capture_output'),
+            'scheduling': operation.get('scheduling'),
+            'thresholds': operation.get('thresholds')
+        }
+        
+        if action == 'stop':
+            process_name = operation.get('process')
+            if not process_name:
+                raise ValueError('"process" is required for stop')
+            return self.stop_process(
+                process_name,
+                scope=operation.get('scope', 'process'),
+                snapshot=snapshot
+            )
+        
+        command = operation.get('command')
+        if not command:
+            raise ValueError(f'"command" is required for {action}')
+        
+        if action == 'start':
+            return self.start_process(
+                command,
+                check_running=operation.get('check_running', True),
+                snapshot=snapshot,
+                **start_options
+            )
+        
+        return self.restart_process(
+            command,
+            process_name=operation.get('process'),
+            scope=operation.get('scope', 'process'),
+            snapshot=snapshot,
+            **start_options
+        )
+    
+    @staticmethod
+    def _operation_key(operation):
+        """Return the process name an operation targets, used for ordering."""
+        if operation.get('process'):
+            return operation['process']
+        command = operation.get('command') or ''
+        cmd_list = command.split() if isinstance(command, str) else command
+        return cmd_list[0] if cmd_list else None
+    
+    def run_batch(self, operations, max_workers=8):
+        """
+        Run several start/stop/restart operations concurrently.
+        
+        All operations share one process table snapshot, up to the first stop
+        or restart of a process: later operations on that process scan the
+        table again, so they see what the stop changed. Operations on the
+        same process run in request order; different processes run in
+        parallel.
+        
+        Args:
+            operations: List of operation dictionaries, each with an "action"
+                ('start', 'stop' or 'restart') and the parameters of the
+                corresponding single-process call
+            max_workers: Maximum number of concurrent operations
+            
+        Returns:
+            list: Per-operation results in request order
+        """
+        snapshot = self.snapshot_processes()
+        results = [None] * len(operations)
+        
+        # Group operations by target so each process sees its operations in order
+        groups = {}
+        for index, operation in enumerate(operations):
+            groups.setdefault(self._operation_key(operation), []).append(index)
+        
+        def run_group(indices):
+            group_snapshot = snapshot
+            for index in indices:
+                operation = operations[index]
+                entry = {'index': index, 'action': operation.get('action')}
+                try:
+                    if operation.get('action') in ('stop', 'restart'):
+                        # The snapshot predates this stop; drop it even if the stop fails
+                        current, group_snapshot = group_snapshot, None
+                    else:
+                        current = group_snapshot
+                    entry['result'] = self._run_operation(operation, current)
+                    entry['ok'] = True
+                except Exception as ex:
+                    logger.error("Batch operation %s failed: %s", index, ex)
+                    entry['error'] = str(ex)
+                    entry['ok'] = False
+                results[index] = entry
+        
+        workers = max(1, min(max_workers, len(groups)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='process-batch') as executor:
+            list(executor.map(run_group, groups.values()))
+        
+        return results
+    
+    def listen_events(self, last_event_id=None, processes=None):
+        """
+        Listen to process state events.
+        
+        Starts the state monitor if it is not running already (it runs while
+        processes are managed or listeners are connected); one monitor pass
+        serves all listeners.
+        
+        Args:
+            last_event_id: Resume after this event ID (None = only new events)
+            processes: Optional collection of process names to filter on
+            
+        Yields:
+            dict: Events, or None as a keep-alive marker
+        """
+        predicate = None
+        if processes:
+            names = set(processes)
+            
+            def predicate(event):
+                return event.get('process') in names or 'process' not in event
+        
+        if last_event_id is None:
+            last_event_id = self.events.last_id
+        
+        listener = self.events.listen(last_event_id, predicate=predicate)
+        self._ensure_monitor()
+        return listener
+    
+    def _ensure_monitor(self):
+        """Start the state monitor thread if it is not running."""
+        with self._lock:
+            if self._monitor_thread is None:
+                self._monitor_thread = threading.Thread(
+                    target=self._monitor_loop, name='process-monitor', daemon=True
+                )
+                self._monitor_thread.start()
+    
+    def _monitor_loop(self):
+        """
+        Check managed processes periodically while there are any or events
+        are listened to.
+        
+        Exits are published even without listeners, so the event ID (the
+        version of the cached /process/list) changes when a process ends.
+        """
+        idle_checks = 0
+        while True:
+            time.sleep(self.monitor_interval)
+            with self._lock:
+                # Listener generators register on first iteration, allow a few idle passes
+                idle = self.events.listeners == 0 and not self.managed_processes
+                idle_checks = idle_checks + 1 if idle else 0
+                if idle_checks > 3:
+                    self._monitor_thread = None
+                    self._monitored.clear()
+                    return
+            try:
+                self.check_processes()
+            except Exception as ex:
+                logger.error("Process monitor error: %s", ex)
+    
+    def check_processes(self):
+        """
+        Check managed processes once and publish state transitions.
+        
+        Publishes 'exited' (with exit code when known) for processes that
+        ended on their own, and 'threshold_exceeded'/'threshold_cleared'
+        when CPU or memory usage crosses its threshold.
+        """
+        with self._lock:
+            managed = list(self.managed_processes.items())
+        
+        alive_pids = set()
+        for process_name, pid in managed:
+            proc = self._monitored.get(pid)
+            try:
+                if proc is None:
+                    proc = psutil.Process(pid)
+                    proc.cpu_percent(None)  # Prime the CPU counter
+                    self._monitored[pid] = proc
+                    alive_pids.add(pid)
+                    continue
+                if not proc.is_running() or proc.status() == psutil.STATUS_ZOMBIE:
+                    raise psutil.NoSuchProcess(pid)
+                with proc.oneshot():
+                    usage = {
+                        'cpu_percent': proc.cpu_percent(None),
+                        'memory_mb': proc.memory_info().rss / 1024 / 1024
+                    }
+            except psutil.NoSuchProcess:
+                self._handle_exit(process_name, pid)
+                continue
+            except psutil.AccessDenied:
+                alive_pids.add(pid)
+                continue
+            
+            alive_pids.add(pid)
+            self._check_thresholds(process_name, pid, usage)
+        
+        for pid in list(self._monitored):
+            if pid not in alive_pids:
+                del self._monitored[pid]
+    
+    def _handle_exit(self, process_name, pid):
+        """Record a process that exited on its own and publish the event."""
+        with self._lock:
+            if self.managed_processes.get(process_name) != pid or process_name in self._stopping:
+                return  # Stopped or replaced in the meantime, or being stopped
+            del self.managed_processes[process_name]
+            popen = self._popens.pop(process_name, None)
+            self._exceeded = {key for key in self._exceeded if key[0] != process_name}
+        
+        exit_code = popen.poll() if popen is not None and popen.pid == pid else None
+        logger.info("Process %s (PID %s) exited with code %s", process_name, pid, exit_code)
+        self.events.publish('exited', process=process_name, pid=pid, exit_code=exit_code)
+    
+    def _check_thresholds(self, process_name, pid, usage):
+        """Publish events when usage crosses the configured thresholds."""
+        limits = dict(self.default_thresholds)
+        limits.update(self.thresholds.get(process_name, {}))
+        
+        for metric, value in usage.items():
+            limit = limits.get(metric)
+            key = (process_name, metric)
+            if limit is None:
+                continue
+            with self._lock:
+                if value > limit and key not in self._exceeded:
+                    self._exceeded.add(key)
+                    event_type = 'threshold_exceeded'
+                elif value <= limit and key in self._exceeded:
+                    self._exceeded.discard(key)
+                    event_type = 'threshold_cleared'
+                else:
+                    continue
+            self.events.publish(event_type, process=process_name, pid=pid,
+                                metric=metric, value=round(value, 1), threshold=limit)
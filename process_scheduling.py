@@ -0,0 +1,214 @@
+"""
+Process Scheduling Module
+CPU affinity, priority and resource limit controls for started processes
+"""
+
+import os
+import resource
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Resource limits accepted by name (see setrlimit(2))
+RLIMITS = {
+    'as': resource.RLIMIT_AS,
+    'core': resource.RLIMIT_CORE,
+    'cpu': resource.RLIMIT_CPU,
+    'data': resource.RLIMIT_DATA,
+    'fsize': resource.RLIMIT_FSIZE,
+    'memlock': resource.RLIMIT_MEMLOCK,
+    'nofile': resource.RLIMIT_NOFILE,
+    'nproc': resource.RLIMIT_NPROC,
+    'rss': resource.RLIMIT_RSS,
+    'stack': resource.RLIMIT_STACK,
+}
+
+# I/O scheduling classes accepted by name (see ioprio_set(2))
+IONICE_CLASSES = ('realtime', 'best_effort', 'idle')
+
+
+def parse_cpu_set(value):
+    """
+    Parse a CPU set.
+
+    Args:
+        value: List of CPU numbers or a string such as "0-3,6"
+
+    Returns:
+        list: Sorted CPU numbers
+    """
+    if isinstance(value, str):
+        cpus = set()
+        for part in value.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if '-' in part:
+                first, last = part.split('-', 1)
+                cpus.update(range(int(first), int(last) + 1))
+            else:
+                cpus.add(int(part))
+    elif isinstance(value, (list, tuple, set)):
+        cpus = {int(cpu) for cpu in value}
+    else:
+        raise ValueError(f"Invalid CPU set: {value!r}")
+
+    if not cpus:
+        raise ValueError("CPU set cannot be empty")
+
+    available = os.sched_getaffinity(0) | set(range(os.cpu_count() or 1))
+    unknown = cpus - available
+    if unknown:
+        raise ValueError(f"Unknown CPUs in set: {sorted(unknown)}")
+    return sorted(cpus)
+
+
+def _is_limit(value):
+    """True for values accepted as one rlimit bound (None and negative = unlimited)."""
+    return value is None or value == 'unlimited' or (isinstance(value, int) and not isinstance(value, bool))
+
+
+def validate_scheduling(options):
+    """
+    Validate and normalize scheduling options.
+
+    Args:
+        options: Dictionary with optional keys:
+            cpu_affinity: CPU set (list or "0-3,6" string)
+            nice: Nice value (-20 to 19)
+            ionice: {"class": "realtime"|"best_effort"|"idle", "value": 0-7}
+            rlimits: {"nofile": 1024, "as": [soft, hard], "core": "unlimited", ...}
+
+    Returns:
+        dict: Normalized options
+    """
+    if not options:
+        return {}
+    if not isinstance(options, dict):
+        raise ValueError("Scheduling options must be an object")
+
+    unknown = set(options) - {'cpu_affinity', 'nice', 'ionice', 'rlimits'}
+    if unknown:
+        raise ValueError(f"Unknown scheduling options: {sorted(unknown)}")
+
+    normalized = {}
+
+    if options.get('cpu_affinity') is not None:
+        normalized['cpu_affinity'] = parse_cpu_set(options['cpu_affinity'])
+
+    if options.get('nice') is not None:
+        nice = options['nice']
+        if not isinstance(nice, int) or not -20 <= nice <= 19:
+            raise ValueError("nice must be an integer between -20 and 19")
+        normalized['nice'] = nice
+
+    if options.get('ionice') is not None:
+        ionice = options['ionice']
+        if not isinstance(ionice, dict) or ionice.get('class') not in IONICE_CLASSES:
+            raise ValueError(f"ionice.class must be one of {list(IONICE_CLASSES)}")
+        value = ionice.get('value')
+        if ionice['class'] == 'idle':
+            value = None
+        elif value is None:
+            value = 4
+        elif not isinstance(value, int) or not 0 <= value <= 7:
+            raise ValueError("ionice.value must be an integer between 0 and 7")
+        normalized['ionice'] = {'class': ionice['class'], 'value': value}
+
+    if options.get('rlimits') is not None:
+        rlimits = options['rlimits']
+        if not isinstance(rlimits, dict):
+            raise ValueError("rlimits must be an object")
+        normalized['rlimits'] = {}
+        for name, limit in rlimits.items():
+            if name not in RLIMITS:
+                raise ValueError(f"Unknown rlimit: {name}")
+            if isinstance(limit, (list, tuple)) and len(limit) == 2:
+                soft, hard = limit
+            else:
+                soft = hard = limit
+            if not all(_is_limit(value) for value in (soft, hard)):
+                raise ValueError(f'rlimit {name} must be an integer, "unlimited" or [soft, hard] of those')
+            normalized['rlimits'][name] = tuple(
+                resource.RLIM_INFINITY if value in (None, 'unlimited') or value < 0 else value
+                for value in (soft, hard)
+            )
+
+    return normalized
+
+
+def make_preexec_fn(options, default_affinity=None):
+    """
+    Build a function applying scheduling options in the child before exec.
+
+    Everything is resolved up front so the child only performs plain
+    syscalls between fork and exec.
+
+    Args:
+        options: Normalized options from validate_scheduling()
+        default_affinity: CPU set applied when no affinity is requested
+
+    Returns:
+        callable or None
+    """
+    affinity = options.get('cpu_affinity') or default_affinity
+    nice = options.get('nice')
+    limits = [(RLIMITS[name], limit) for name, limit in options.get('rlimits', {}).items()]
+
+    if affinity is None and nice is None and not limits:
+        return None
+
+    affinity = set(affinity) if affinity is not None else None
+    sched_setaffinity = os.sched_setaffinity
+    setpriority = os.setpriority
+    prio_process = os.PRIO_PROCESS
+    setrlimit = resource.setrlimit
+
+    def preexec():
+        if affinity is not None:
+            sched_setaffinity(0, affinity)
+        if nice is not None:
+            setpriority(prio_process, 0, nice)
+        for limit_id, limit in limits:
+            setrlimit(limit_id, limit)
+
+    return preexec
+
+
+def apply_ionice(pid, ionice):
+    """
+    Apply an I/O priority to a freshly started process.
+
+    The stdlib has no ioprio_set wrapper, so this uses psutil right after
+    spawn instead of inside the child.
+
+    Args:
+        pid: PID of the process
+        ionice: Normalized ionice option
+    """
+    import psutil
+
+    ioclass = {
+        'realtime': psutil.IOPRIO_CLASS_RT,
+        'best_effort': psutil.IOPRIO_CLASS_BE,
+        'idle': psutil.IOPRIO_CLASS_IDLE,
+    }[ionice['class']]
+    psutil.Process(pid).ionice(ioclass, ionice['value'])
+
+
+def pin_current_process(cpus):
+    """
+    Pin the current process (the API server) to a set of CPUs.
+
+    Args:
+        cpus: CPU set (list or "0-3,6" string)
+
+    Returns:
+        tuple: (pinned CPUs, remaining CPUs for started processes)
+    """
+    all_cpus = os.sched_getaffinity(0)
+    pinned = parse_cpu_set(cpus)
+    os.sched_setaffinity(0, pinned)
+    remaining = sorted(all_cpus - set(pinned)) or sorted(all_cpus)
+    logger.info("API server pinned to CPUs %s, started processes use %s", pinned, remaining)
+    return pinned, remaining
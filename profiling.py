@@ -0,0 +1,218 @@
+"""
+Profiling Module
+Opt-in cProfile profiling of single requests
+
+Two modes, both only active when profiling is enabled in the config:
+    on demand   A request with the header "X-Profile: 1" or the query flag
+                "?profile=1" is profiled and its profile saved
+    sampled     A fraction of all requests is profiled; the slowest ones
+                per route are kept with their profiles
+
+Profiles are pstats files (python -m pstats <file>, snakeviz). On-demand
+profiles are rotated to a maximum count; sampled ones are bounded by the
+number kept per route.
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Prefix of sampled profiles, which are not rotated
+SLOW_PREFIX = 'slow-'
+
+# Characters allowed in profile file names
+UNSAFE_CHARS = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+class RequestProfiler:
+    """
+    Profiles requests and stores the profiles in a bounded directory.
+
+    Only one request is profiled at a time: cProfile hooks are per thread
+    (and process-wide on Python 3.12+), so overlapping requests are served
+    without a profile instead of waiting.
+    """
+
+    def __init__(self, directory, max_files=100, sample_rate=0.0, slowest=5):
+        """
+        Args:
+            directory: Directory for profile files (created if missing)
+            max_files: On-demand profiles kept; the oldest are deleted
+            sample_rate: Fraction of requests profiled in sampled mode (0 = off)
+            slowest: Sampled profiles kept per route
+        """
+        self.directory = directory
+        self.max_files = max_files
+        self.sample_rate = sample_rate
+        self.slowest = slowest
+        self.busy = 0  # Requests not profiled because another one was
+        self._active = threading.Lock()
+        self._lock = threading.Lock()
+        self._slow = {}  # Maps routes to entries sorted by duration, slowest first
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def requested(request):
+        """True if a request asks to be profiled."""
+        flag = request.headers.get('X-Profile') or request.args.get('profile')
+        return flag is not None and flag.lower() in ('1', 'true', 'yes')
+
+    def start(self, requested):
+        """
+        Start profiling the current request if it is requested or sampled.
+
+        Args:
+            requested: True if the client asked for a profile
+
+        Returns:
+            tuple: (cProfile.Profile, mode, start time) or None
+        """
+        if requested:
+            mode = 'request'
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            mode = 'sample'
+        else:
+            return None
+        if not self._active.acquire(blocking=False):
+            self.busy += 1
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is active
+            self._active.release()
+            self.busy += 1
+            return None
+        return profiler, mode, time.perf_counter()
+
+    def stop(self, state, method, route, path):
+        """
+        Stop profiling and store the profile.
+
+        Args:
+            state: Return value of start()
+            method: HTTP method
+            route: Route template (e.g. "/files")
+            path: Request path
+
+        Returns:
+            str: File name of the stored profile, or None if a sampled
+                request was not among the slowest
+        """
+        profiler, mode, started = state
+        try:
+            profiler.disable()
+        finally:
+            self._active.release()
+        duration = time.perf_counter() - started
+
+        if mode == 'sample':
+            return self._keep_slow(profiler, duration, method, route, path)
+        name = self._file_name('', method, route, duration)
+        profiler.dump_stats(os.path.join(self.directory, name))
+        self._rotate()
+        logger.info("Profiled %s %s in %.1f ms: %s", method, path, duration * 1000, name)
+        return name
+
+    def _file_name(self, prefix, method, route, duration):
+        """Build a unique, sortable profile file name."""
+        slug = UNSAFE_CHARS.sub('_', route.strip('/')) or 'root'
+        stamp = time.strftime('%Y%m%dT%H%M%S')
+        return f"{prefix}{stamp}-{time.time_ns() % 1000000:06d}-{method}-{slug}-{duration * 1000:.0f}ms.prof"
+
+    def _keep_slow(self, profiler, duration, method, route, path):
+        """Keep a sampled profile if it is among the slowest of its route."""
+        with self._lock:
+            entries = self._slow.setdefault(route, [])
+            if len(entries) >= self.slowest and duration <= entries[-1]['duration_ms'] / 1000:
+                return None
+            name = self._file_name(SLOW_PREFIX, method, route, duration)
+            profiler.dump_stats(os.path.join(self.directory, name))
+            entries.append({
+                'duration_ms': round(duration * 1000, 1),
+                'method': method,
+                'path': path,
+                'time': time.time(),
+                'file': name
+            })
+            entries.sort(key=lambda entry: entry['duration_ms'], reverse=True)
+            for evicted in entries[self.slowest:]:
+                self._remove(evicted['file'])
+            del entries[self.slowest:]
+        return name
+
+    def _rotate(self):
+        """Delete the oldest on-demand profiles beyond max_files."""
+        with self._lock:
+            names = sorted(name for name in os.listdir(self.directory)
+                           if name.endswith('.prof') and not name.startswith(SLOW_PREFIX))
+            for name in names[:max(0, len(names) - self.max_files)]:
+                self._remove(name)
+
+    def _remove(self, name):
+        """Delete a profile file, ignoring files that are already gone."""
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def path(self, name):
+        """
+        Resolve a stored profile by file name.
+
+        Returns:
+            str: Path of the file, or None if it does not exist
+        """
+        if os.path.basename(name) != name or not name.endswith('.prof'):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def list(self):
+        """
+        Describe the stored profiles.
+
+        Returns:
+            dict: On-demand profiles (newest first) and the slowest sampled
+                requests per route
+        """
+        files = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if name.endswith('.prof') and not name.startswith(SLOW_PREFIX):
+                stat = os.stat(os.path.join(self.directory, name))
+                files.append({'file': name, 'size': stat.st_size, 'created': stat.st_mtime})
+        with self._lock:
+            slowest = {route: list(entries) for route, entries in self._slow.items()}
+        return {
+            'profiles': files,
+            'slowest': slowest,
+            'sample_rate': self.sample_rate,
+            'busy': self.busy
+        }
+
+    @staticmethod
+    def summary(path, sort='cumulative', limit=40):
+        """
+        Render a stored profile as text.
+
+        Args:
+            path: Profile file
+            sort: pstats sort key
+            limit: Number of functions shown
+
+        Returns:
+            str
+        """
+        output = io.StringIO()
+        stats = pstats.Stats(path, stream=output)
+        stats.sort_stats(sort).print_stats(limit)
+        return output.getvalue()
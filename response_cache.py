@@ -0,0 +1,240 @@
+"""
+Response Cache Module
+Short-lived in-memory cache for the JSON responses of read endpoints
+
+Each cached route has a TTL in seconds. Entries are also dropped early
+when the route is invalidated (e.g. after an upload) or when the version
+of the route changes (e.g. the ID of the last process event), so a poll
+never sees a response older than the last change it could know about.
+The ETag of an entry is computed once when it is stored; clients sending
+If-None-Match get 304 without a body.
+"""
+
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, request
+
+import metrics
+
+# Default TTLs in seconds of the routes served from the cache
+DEFAULT_TTLS = {
+    '/': 60.0,
+    '/health': 1.0,
+    '/files': 5.0,
+    '/process/list': 2.0,
+}
+
+# Locks serializing the build of one key, so concurrent misses run the view once
+BUILD_LOCKS = 16
+
+
+def validate_ttls(ttls):
+    """
+    Check cache TTLs.
+
+    Args:
+        ttls: Maps route templates to seconds
+
+    Raises:
+        ValueError: If a TTL is not a non-negative number
+    """
+    for route, ttl in ttls.items():
+        if isinstance(ttl, bool) or not isinstance(ttl, (int, float)) or ttl < 0:
+            raise ValueError(f"TTL for {route} must be a non-negative number")
+    return ttls
+
+
+class CacheEntry:
+    """A stored response."""
+
+    __slots__ = ('body', 'status', 'headers', 'etag', 'version', 'expires')
+
+    def __init__(self, body, status, headers, version, expires):
+        self.body = body
+        self.status = status
+        self.headers = headers
+        self.etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self.version = version
+        self.expires = expires
+
+    def respond(self, state):
+        """
+        Build a response for the current request.
+
+        Args:
+            state: 'HIT' or 'MISS', sent as X-Cache
+
+        Returns:
+            flask.Response: The entry, or 304 if the client's ETag matches
+        """
+        response = current_app.response_class(self.body, status=self.status, headers=self.headers)
+        response.set_etag(self.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Cache'] = state
+        return response.make_conditional(request)
+
+
+class ResponseCache:
+    """
+    LRU cache of responses keyed by route and query string.
+    """
+
+    def __init__(self, ttls=None, max_entries=256):
+        """
+        Args:
+            ttls: Maps route templates to TTLs in seconds (default: DEFAULT_TTLS)
+            max_entries: Responses kept; the least recently used are dropped
+        """
+        self.max_entries = max_entries
+        self.ttls = {}
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._build_locks = [threading.Lock() for _ in range(BUILD_LOCKS)]
+        self.configure(DEFAULT_TTLS if ttls is None else ttls)
+
+    def configure(self, ttls):
+        """Replace the TTLs and drop all entries."""
+        validate_ttls(ttls)
+        with self._lock:
+            self.ttls = dict(ttls)
+            self._entries.clear()
+
+    def ttl(self, route):
+        """TTL of a route in seconds (0 = not cached)."""
+        return self.ttls.get(route, 0)
+
+    def generation(self, route):
+        """Counter of a route, increased by invalidate()."""
+        return self._generations.get(route, 0)
+
+    def invalidate(self, route=None):
+        """
+        Drop the entries of a route, or all entries.
+
+        Responses being built while a route is invalidated are not served
+        afterwards: their version includes the old generation.
+        """
+        with self._lock:
+            routes = set(self.ttls) if route is None else {route}
+            for name in routes:
+                self._generations[name] = self._generations.get(name, 0) + 1
+            for key in [key for key in self._entries if key[0] in routes]:
+                del self._entries[key]
+
+    def get(self, key, version):
+        """
+        Look up a fresh entry.
+
+        Args:
+            key: (route, query string)
+            version: Current version of the route
+
+        Returns:
+            CacheEntry or None
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= now or entry.version != version:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, version, ttl, response):
+        """
+        Store a response.
+
+        Args:
+            key: (route, query string)
+            version: Version of the route when the response was built
+            ttl: Seconds the entry is served
+            response: flask.Response (not streamed)
+
+        Returns:
+            CacheEntry
+        """
+        headers = [(name, value) for name, value in response.headers.items()
+                   if name.lower() not in ('content-length', 'etag')]
+        entry = CacheEntry(response.get_data(), response.status_code, headers, version,
+                           time.monotonic() + ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def build_lock(self, key):
+        """Lock held while the response for a key is built."""
+        return self._build_locks[hash(key) % BUILD_LOCKS]
+
+    def status(self):
+        """
+        Describe the cache.
+
+        Returns:
+            dict: TTLs, number of entries, hits and misses
+        """
+        return {
+            'ttls': self.ttls,
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+def cached(version=None):
+    """
+    Serve a GET view from the app's response cache.
+
+    Only 200 responses that are not streamed are stored. Requests that are
+    being profiled, or that send "Cache-Control: no-cache", run the view.
+
+    Args:
+        version: Optional function returning a value that changes whenever
+            the response would; checked on every hit
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get('response_cache')
+            route = request.url_rule.rule
+            if (cache is None or not current_app.config['CACHE_ENABLED'] or cache.ttl(route) <= 0
+                    or request.method != 'GET' or g.get('profile') is not None):
+                return view(*args, **kwargs)
+
+            key = (route, request.query_string)
+            current = (cache.generation(route), version() if version is not None else None)
+            refresh = request.cache_control.no_cache
+            entry = None if refresh else cache.get(key, current)
+            if entry is not None:
+                cache.hits += 1
+                metrics.RESPONSE_CACHE.inc(1, (route, 'hit'))
+                return entry.respond('HIT')
+
+            with cache.build_lock(key):
+                entry = None if refresh else cache.get(key, current)
+                if entry is not None:
+                    # Built by a concurrent request while this one waited
+                    cache.hits += 1
+                    metrics.RESPONSE_CACHE.inc(1, (route, 'hit'))
+                    return entry.respond('HIT')
+                cache.misses += 1
+                metrics.RESPONSE_CACHE.inc(1, (route, 'miss'))
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                entry = cache.put(key, current, cache.ttl(route), response)
+            return entry.respond('MISS')
+        return wrapper
+    return decorator
@@ -0,0 +1,359 @@
+"""
+Production Server Launcher
+Runs the API under a production WSGI server instead of the Werkzeug
+development server
+
+Servers, in order of preference for --server auto:
+    gunicorn   Pre-forking, gthread workers (Linux, pip install gunicorn)
+    waitress   Single process, thread pool (pip install waitress)
+    werkzeug   Threaded development server (fallback)
+
+Usage:
+    python server.py [--workers 2] [--threads 8] [--keepalive 5] [--timeout 120]
+    python server.py --unix-socket /run/flask-api/api.sock [--socket-mode 660] [--no-tcp]
+    python server.py --fd 3 [--fd 4]
+
+The listening sockets are bound here and handed to the server, so every
+server can listen on TCP, on a Unix domain socket for local clients, or
+on both. Sockets passed by systemd socket activation (flask-api.socket)
+or inherited as file descriptors are used instead of binding: they stay
+open while the service restarts, so connections wait instead of being
+refused.
+
+SIGTERM drains: no new requests are accepted, requests in flight and
+queued keyboard jobs finish (up to --drain-timeout seconds), then the
+server exits.
+
+With more than one worker, the keyboard devices and the process registry
+stay in a single worker; the others forward those requests to it over an
+internal Unix socket (see worker_state.py).
+"""
+
+import _thread
+import argparse
+import logging
+import math
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import time
+
+import log_pipeline
+import settings
+
+logger = logging.getLogger(__name__)
+
+SERVERS = ('auto', 'gunicorn', 'waitress', 'werkzeug')
+
+# First file descriptor passed by systemd socket activation
+SD_LISTEN_FDS_START = 3
+
+
+def parse_args(argv=None, config=None):
+    """Parse command line options, defaulting to config.json and environment variables."""
+    config = settings.load(settings.config_path()) if config is None else config
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=config['HOST'], help='Bind address')
+    parser.add_argument('--port', type=int, default=config['PORT'], help='Port')
+    parser.add_argument('--no-tcp', dest='tcp', action='store_false', default=config['TCP_ENABLED'],
+                        help='Only listen on the Unix socket')
+    parser.add_argument('--unix-socket', default=config['UNIX_SOCKET'],
+                        help='Also listen on this Unix domain socket')
+    parser.add_argument('--socket-mode', default=config['UNIX_SOCKET_MODE'],
+                        help='Permissions of the Unix socket (octal)')
+    parser.add_argument('--socket-group', default=config['UNIX_SOCKET_GROUP'],
+                        help='Group owning the Unix socket')
+    parser.add_argument('--fd', dest='fds', type=int, action='append', default=[],
+                        help='Serve on this inherited listening socket instead of binding (repeatable)')
+    parser.add_argument('--server', choices=SERVERS, default=config['SERVER'], help='WSGI server')
+    parser.add_argument('--workers', type=int, default=config['WORKERS'],
+                        help='Worker processes (gunicorn only)')
+    parser.add_argument('--threads', type=int, default=config['THREADS'],
+                        help='Threads per worker')
+    parser.add_argument('--keepalive', type=int, default=config['KEEPALIVE'],
+                        help='Seconds to keep idle client connections open')
+    parser.add_argument('--timeout', type=int, default=config['TIMEOUT'],
+                        help='Worker timeout / idle channel timeout in seconds')
+    parser.add_argument('--drain-timeout', type=float, default=config['DRAIN_TIMEOUT'],
+                        help='Seconds to finish requests and keyboard jobs on SIGTERM')
+    parser.add_argument('--state-socket', default=config['STATE_SOCKET'],
+                        help='Internal socket of the state-owning worker (default: temporary file)')
+    return parser.parse_args(argv)
+
+
+def resolve_server(name):
+    """Pick the WSGI server, falling back when one is not installed."""
+    candidates = SERVERS[1:] if name == 'auto' else (name,)
+    for candidate in candidates:
+        if candidate == 'werkzeug':
+            return candidate
+        try:
+            __import__(candidate)
+            return candidate
+        except ImportError:
+            if name != 'auto':
+                raise SystemExit(f"{candidate} is not installed (pip install {candidate})")
+    return 'werkzeug'
+
+
+def bind_unix_socket(path, mode, group=None, backlog=2048):
+    """
+    Bind a listening Unix domain socket.
+
+    A socket file left behind by a crashed server is replaced; one that
+    still accepts connections is not.
+
+    Args:
+        path: Socket path (parent directories are created)
+        mode: Permissions as an octal string (e.g. '660')
+        group: Optional group owning the socket
+
+    Returns:
+        socket.socket
+    """
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.remove(path)
+        else:
+            raise SystemExit(f"{path} is in use by another server")
+        finally:
+            probe.close()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    os.chmod(path, int(mode, 8))
+    if group:
+        shutil.chown(path, group=group)
+    sock.listen(backlog)
+    return sock
+
+
+def inherited_listeners(options):
+    """
+    Listening sockets passed by systemd socket activation (LISTEN_FDS) or
+    with --fd.
+
+    The systemd variables are removed so that child processes do not take
+    the sockets for their own.
+
+    Returns:
+        list: Sockets, empty if none were passed
+    """
+    fds = list(options.fds)
+    if os.environ.get('LISTEN_PID') == str(os.getpid()):
+        fds += range(SD_LISTEN_FDS_START, SD_LISTEN_FDS_START + int(os.environ.get('LISTEN_FDS', 0)))
+    for name in ('LISTEN_PID', 'LISTEN_FDS', 'LISTEN_FDNAMES'):
+        os.environ.pop(name, None)
+    listeners = []
+    for fd in fds:
+        try:
+            sock = socket.socket(fileno=fd)
+        except OSError as ex:
+            raise SystemExit(f"File descriptor {fd} is not a socket: {ex}")
+        if sock.type != socket.SOCK_STREAM:
+            raise SystemExit(f"File descriptor {fd} is not a stream socket")
+        listeners.append(sock)
+    return listeners
+
+
+def create_listeners(options, backlog=2048):
+    """
+    Bind the TCP and Unix sockets the server accepts connections on, unless
+    listening sockets were inherited.
+
+    Returns:
+        tuple: (listening sockets, True if they were inherited)
+    """
+    listeners = inherited_listeners(options)
+    if listeners:
+        return listeners, True
+    if options.tcp:
+        family = socket.AF_INET6 if ':' in options.host else socket.AF_INET
+        listeners.append(socket.create_server((options.host, options.port), family=family, backlog=backlog))
+    if options.unix_socket:
+        listeners.append(bind_unix_socket(options.unix_socket, options.socket_mode, options.socket_group, backlog))
+    if not listeners:
+        raise SystemExit("Nothing to listen on: set --unix-socket or enable TCP")
+    return listeners, False
+
+
+def describe(sock):
+    """Address of a listening socket for log messages."""
+    address = sock.getsockname()
+    if sock.family == socket.AF_UNIX:
+        return f"unix:{address}"
+    return f"{address[0]}:{address[1]}"
+
+
+def run_gunicorn(options, config, listeners, inherited=False):
+    """Serve with gunicorn gthread workers, creating the app after fork."""
+    from gunicorn.app.base import BaseApplication
+
+    from app import create_app
+
+    def when_ready(arbiter):
+        # Inherited Unix sockets must outlive the arbiter: gunicorn removes
+        # socket files on exit unless it thinks systemd passed them
+        if inherited:
+            arbiter.systemd = True
+
+    def worker_exit(arbiter, worker):
+        # gunicorn finished the requests of the worker (graceful_timeout);
+        # keyboard jobs still queued run in background threads
+        app = getattr(worker, 'wsgi', None)
+        if app is not None and 'drain' in getattr(app, 'extensions', {}):
+            drain = app.extensions['drain']
+            drain.begin()
+            drain.wait(options.drain_timeout)
+
+    class Application(BaseApplication):
+        def load_config(self):
+            settings = {
+                # Sockets bound by create_listeners()
+                'bind': [f"fd://{sock.fileno()}" for sock in listeners],
+                'workers': options.workers,
+                'threads': options.threads,
+                'worker_class': 'gthread',
+                'keepalive': options.keepalive,
+                'timeout': options.timeout,
+                # SIGTERM: stop accepting, finish requests in flight
+                'graceful_timeout': math.ceil(options.drain_timeout),
+                'when_ready': when_ready,
+                'worker_exit': worker_exit,
+                # Each worker builds its own app so no device or lock is
+                # inherited across fork
+                'preload_app': False,
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return create_app(config)
+
+    Application().run()
+
+
+def run_waitress(options, config, listeners, inherited=False):
+    """Serve with waitress (threads only, a single process)."""
+    from waitress.server import create_server
+
+    from app import create_app
+
+    if options.workers > 1:
+        logger.warning("waitress runs a single process, ignoring --workers")
+    app = create_app(config)
+    # waitress refuses TCP and Unix sockets in one server; one server per
+    # family shares the socket map (one event loop) and the thread pool
+    socket_map = {}
+    servers = []
+    for family in (socket.AF_INET, socket.AF_INET6, socket.AF_UNIX):
+        sockets = [sock for sock in listeners if sock.family == family]
+        if sockets:
+            servers.append(create_server(
+                app, map=socket_map, sockets=sockets, threads=options.threads, channel_timeout=options.timeout,
+                _dispatcher=servers[0].task_dispatcher if servers else None
+            ))
+    drain = app.extensions['drain']
+
+    def wait_channels(busy, deadline):
+        # Channels are served by the event loop of the main thread
+        while time.monotonic() < deadline and any(busy(channel) for channel in list(socket_map.values())):
+            time.sleep(0.1)
+
+    def finish_drain():
+        deadline = time.monotonic() + options.drain_timeout
+        # waitress reads a request in full before the app sees it; uploads
+        # still being received are let in before requests are refused
+        wait_channels(lambda channel: getattr(channel, 'request', None) is not None, deadline)
+        drain.begin()
+        drain.wait(max(0.0, deadline - time.monotonic()))
+        wait_channels(lambda channel: getattr(channel, 'total_outbufs_len', 0), deadline)
+        # run() returns on KeyboardInterrupt
+        _thread.interrupt_main()
+
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        if stopping.is_set():
+            return
+        stopping.set()
+        for server in servers:
+            server.accepting = False
+        threading.Thread(target=finish_drain, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        servers[0].run()
+    finally:
+        for server in servers:
+            server.close()
+
+
+def run_werkzeug(options, config, listeners, inherited=False):
+    """Serve with the threaded Werkzeug server, one server per listening socket."""
+    from werkzeug.serving import make_server
+
+    from app import create_app
+
+    if options.workers > 1:
+        logger.warning("werkzeug runs a single process, ignoring --workers")
+    app = create_app(config)
+    servers = []
+    for sock in listeners:
+        if sock.family == socket.AF_UNIX:
+            host, port = f"unix://{sock.getsockname()}", 0
+        else:
+            host, port = sock.getsockname()[:2]
+        servers.append(make_server(host, port, app, threaded=True, fd=sock.fileno()))
+    drain = app.extensions['drain']
+
+    def stop(signum, frame):
+        if drain.draining:
+            return
+        drain.begin()
+        # shutdown() waits for serve_forever(), which runs in this thread
+        for server in servers:
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    for server in servers[:-1]:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    servers[-1].serve_forever()
+    if drain.draining:
+        # Connections kept alive are still served by their threads
+        drain.wait(options.drain_timeout)
+
+
+def main(argv=None):
+    """Start the configured server."""
+    try:
+        config = settings.load(settings.config_path())
+    except settings.ConfigError as ex:
+        raise SystemExit(str(ex))
+    log_pipeline.configure(config)
+    options = parse_args(argv, config)
+    server = resolve_server(options.server)
+
+    # Settings passed to create_app() explicitly
+    overrides = {}
+    if server == 'gunicorn' and options.workers > 1:
+        overrides['STATE_SOCKET'] = options.state_socket or os.path.join(
+            tempfile.mkdtemp(prefix='flask-api-'), 'state.sock'
+        )
+
+    listeners, inherited = create_listeners(options)
+    logger.info("Starting Flask REST API with %s on %s %s(%d workers x %d threads)", server,
+                ', '.join(map(describe, listeners)), '(inherited) ' if inherited else '', options.workers,
+                options.threads)
+    run = {'gunicorn': run_gunicorn, 'waitress': run_waitress, 'werkzeug': run_werkzeug}[server]
+    run(options, overrides, listeners, inherited)
+
+
+if __name__ == '__main__':
+    main()
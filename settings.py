@@ -0,0 +1,415 @@
+"""
+Settings Module
+Loads and validates config.json with environment overrides, and reloads
+safe settings on SIGHUP or when the file changes
+
+Precedence: environment variable > config file > default. The config file
+is FLASK_CONFIG, or config.json next to the application if it exists.
+Relative paths are resolved against the application directory.
+"""
+
+import json
+import logging
+import os
+import signal
+import threading
+import time
+
+from admission import DEFAULT_RULES, validate_rules
+from json_provider import BACKENDS
+from response_cache import DEFAULT_TTLS, validate_ttls
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+
+class ConfigError(ValueError):
+    """Invalid configuration file or environment override."""
+
+
+class Setting:
+    """
+    One configuration value.
+    """
+
+    __slots__ = ('key', 'path', 'kind', 'default', 'env', 'reloadable', 'minimum', 'maximum', 'choices',
+                 'check')
+
+    def __init__(self, key, path, kind, default, env=None, reloadable=False, minimum=None, maximum=None,
+                 choices=None, check=None):
+        """
+        Args:
+            key: Flask config key (e.g. 'UPLOAD_FOLDER')
+            path: Dotted location in config.json (e.g. 'keyboard_emulation.layout')
+            kind: 'str', 'optional_str', 'path', 'optional_path', 'int', 'float', 'bool', 'list' or 'dict'
+            default: Value used when neither the file nor the environment sets it
+            env: Environment variable overriding the file
+            reloadable: True if the value can change while the server runs
+            minimum: Lower bound of numeric values
+            maximum: Upper bound of numeric values
+            choices: Allowed values of strings
+            check: Optional callable validating a value (raises ValueError)
+        """
+        self.key = key
+        self.path = path
+        self.kind = kind
+        self.default = default
+        self.env = env
+        self.reloadable = reloadable
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = choices
+        self.check = check
+
+    def from_env(self, value):
+        """Convert an environment variable to the JSON type of the setting."""
+        if self.kind == 'bool':
+            return value.strip().lower() in ('1', 'true', 'yes', 'on')
+        if self.kind == 'int':
+            return int(value)
+        if self.kind == 'float':
+            return float(value)
+        if self.kind == 'list':
+            return [item.strip() for item in value.split(',') if item.strip()]
+        if self.kind == 'dict':
+            return json.loads(value)
+        if self.kind in ('optional_str', 'optional_path'):
+            return value or None
+        return value
+
+    def validate(self, value):
+        """
+        Check a value and normalize it.
+
+        Raises:
+            ValueError: With a description of the problem
+        """
+        kind = self.kind
+        if kind in ('optional_str', 'optional_path') and value is None:
+            return None
+        if kind in ('str', 'optional_str', 'path', 'optional_path') and not isinstance(value, str):
+            raise ValueError("expected a string")
+        if kind == 'bool' and not isinstance(value, bool):
+            raise ValueError("expected true or false")
+        if kind == 'int' and (isinstance(value, bool) or not isinstance(value, int)):
+            raise ValueError("expected an integer")
+        if kind == 'float':
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError("expected a number")
+            value = float(value)
+        if kind == 'list' and not (isinstance(value, list) and all(isinstance(item, str) for item in value)):
+            raise ValueError("expected a list of strings")
+        if kind == 'dict' and not isinstance(value, dict):
+            raise ValueError("expected an object")
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError(f"must be at least {self.minimum}")
+        if self.maximum is not None and value > self.maximum:
+            raise ValueError(f"must be at most {self.maximum}")
+        if self.choices is not None and value not in self.choices:
+            raise ValueError(f"must be one of {', '.join(map(str, self.choices))}")
+        if self.check is not None:
+            self.check(value)
+        if kind in ('path', 'optional_path'):
+            value = os.path.join(BASE_DIR, value)
+        return value
+
+
+SETTINGS = (
+    # Server (used by server.py and the development server)
+    Setting('HOST', 'host', 'str', '0.0.0.0', 'FLASK_HOST'),
+    Setting('PORT', 'port', 'int', 5000, 'FLASK_PORT', minimum=0),
+    Setting('TCP_ENABLED', 'tcp', 'bool', True, 'FLASK_TCP'),
+    Setting('UNIX_SOCKET', 'unix_socket', 'str', '', 'FLASK_UNIX_SOCKET'),
+    Setting('UNIX_SOCKET_MODE', 'unix_socket_mode', 'str', '660', 'FLASK_UNIX_SOCKET_MODE',
+            check=lambda value: int(value, 8)),
+    Setting('UNIX_SOCKET_GROUP', 'unix_socket_group', 'optional_str', None, 'FLASK_UNIX_SOCKET_GROUP'),
+    Setting('DEBUG', 'debug', 'bool', False, 'FLASK_DEBUG'),
+    Setting('SERVER', 'server', 'str', 'auto', 'FLASK_SERVER',
+            choices=('auto', 'gunicorn', 'waitress', 'werkzeug')),
+    Setting('WORKERS', 'workers', 'int', 1, 'FLASK_WORKERS', minimum=1),
+    Setting('THREADS', 'threads', 'int', 8, 'FLASK_THREADS', minimum=1),
+    Setting('KEEPALIVE', 'keepalive', 'int', 5, 'FLASK_KEEPALIVE', minimum=0),
+    Setting('TIMEOUT', 'timeout', 'int', 120, 'FLASK_TIMEOUT', minimum=1),
+    Setting('DRAIN_TIMEOUT', 'drain_timeout', 'float', 30.0, 'FLASK_DRAIN_TIMEOUT', minimum=0),
+    Setting('STATE_SOCKET', 'state_socket', 'str', '', 'FLASK_STATE_SOCKET'),
+    Setting('SERVER_CPU_AFFINITY', 'cpu_affinity', 'str', '', 'FLASK_CPU_AFFINITY'),
+    Setting('CONFIG_WATCH_INTERVAL', 'config_watch_interval', 'float', 2.0, 'FLASK_CONFIG_WATCH', minimum=0),
+
+    # Files
+    Setting('UPLOAD_FOLDER', 'upload_folder', 'path', 'uploads', 'FLASK_UPLOAD_FOLDER'),
+    Setting('MAX_CONTENT_LENGTH', 'max_content_length', 'int', 100 * 1024 * 1024,
+            'FLASK_MAX_CONTENT_LENGTH', reloadable=True, minimum=1),
+    Setting('ALLOWED_EXTENSIONS', 'allowed_extensions', 'list', [], 'FLASK_ALLOWED_EXTENSIONS', reloadable=True),
+    Setting('PROCESS_LOG_FOLDER', 'process_log_folder', 'path', 'process_logs', 'FLASK_PROCESS_LOG_FOLDER'),
+
+    # Keyboard emulation
+    Setting('KEYBOARD_ENABLED', 'keyboard_emulation.enabled', 'bool', True, 'KEYBOARD_ENABLED'),
+    Setting('KEYBOARD_DEFAULT_DELAY', 'keyboard_emulation.default_delay', 'float', 0.1,
+            'KEYBOARD_DEFAULT_DELAY', reloadable=True, minimum=0),
+    Setting('KEYBOARD_DEFAULT_GAP', 'keyboard_emulation.default_gap', 'float', 0.01,
+            'KEYBOARD_DEFAULT_GAP', reloadable=True, minimum=0),
+    Setting('KEYBOARD_LAYOUT', 'keyboard_emulation.layout', 'str', 'us', 'KEYBOARD_LAYOUT'),
+    Setting('KEYBOARD_DEVICES', 'keyboard_emulation.devices', 'list', ['default'], 'KEYBOARD_DEVICES'),
+    Setting('KEYBOARD_LAYOUT_FOLDER', 'keyboard_emulation.layout_dir', 'path', 'layouts', 'KEYBOARD_LAYOUT_DIR'),
+    Setting('KEYBOARD_MACRO_FOLDER', 'keyboard_emulation.macro_dir', 'path', 'macros', 'KEYBOARD_MACRO_DIR'),
+    Setting('KEYBOARD_UNICODE_FALLBACK', 'keyboard_emulation.unicode_fallback', 'optional_str', None,
+            'KEYBOARD_UNICODE_FALLBACK', choices=(None, 'ctrl_shift_u')),
+
+    # Input channel
+    Setting('INPUT_CHANNEL_HOST', 'input_channel.host', 'str', '127.0.0.1', 'INPUT_CHANNEL_HOST'),
+    Setting('INPUT_CHANNEL_PORT', 'input_channel.port', 'int', 0, 'INPUT_CHANNEL_PORT', minimum=0, maximum=65535),
+    Setting('INPUT_CHANNEL_SOCKET', 'input_channel.socket', 'str', '', 'INPUT_CHANNEL_SOCKET'),
+
+    # Performance tuning
+    Setting('HASH_BUFFER_SIZE', 'tuning.hash_buffer_size', 'int', 1024 * 1024,
+            'FLASK_HASH_BUFFER_SIZE', reloadable=True, minimum=4096),
+    Setting('BATCH_MAX_WORKERS', 'tuning.batch_max_workers', 'int', 8,
+            'FLASK_BATCH_MAX_WORKERS', reloadable=True, minimum=1),
+    Setting('KEYBOARD_JOB_HISTORY', 'tuning.keyboard_job_history', 'int', 100,
+            'KEYBOARD_JOB_HISTORY', minimum=1),
+    Setting('PROCESS_EVENT_HISTORY', 'tuning.process_event_history', 'int', 256,
+            'FLASK_PROCESS_EVENT_HISTORY', minimum=1),
+    Setting('PROCESS_OUTPUT_MAX_LINES', 'tuning.output_max_lines', 'int', 1000,
+            'FLASK_OUTPUT_MAX_LINES', minimum=1),
+    Setting('PROCESS_OUTPUT_MAX_BYTES', 'tuning.output_max_bytes', 'int', 1024 * 1024,
+            'FLASK_OUTPUT_MAX_BYTES', minimum=4096),
+
+    # Admission control (per-client token buckets and concurrency caps)
+    Setting('RATE_LIMIT_ENABLED', 'rate_limit.enabled', 'bool', True, 'FLASK_RATE_LIMIT', reloadable=True),
+    Setting('RATE_LIMIT_ROUTES', 'rate_limit.routes', 'dict', DEFAULT_RULES, 'FLASK_RATE_LIMIT_ROUTES',
+            reloadable=True, check=validate_rules),
+    Setting('RATE_LIMIT_TRUST_FORWARDED', 'rate_limit.trust_forwarded', 'bool', False,
+            'FLASK_TRUST_FORWARDED', reloadable=True),
+
+    # Response cache and JSON serialization
+    Setting('CACHE_ENABLED', 'cache.enabled', 'bool', True, 'FLASK_CACHE', reloadable=True),
+    Setting('CACHE_TTLS', 'cache.ttl', 'dict', DEFAULT_TTLS, 'FLASK_CACHE_TTL',
+            reloadable=True, check=validate_ttls),
+    Setting('CACHE_MAX_ENTRIES', 'cache.max_entries', 'int', 256, 'FLASK_CACHE_MAX_ENTRIES',
+            reloadable=True, minimum=1),
+    Setting('JSON_BACKEND', 'json_backend', 'str', 'auto', 'FLASK_JSON_BACKEND', choices=BACKENDS),
+
+    # Profiling
+    Setting('PROFILING', 'profiling.enabled', 'bool', False, 'FLASK_PROFILING'),
+    Setting('PROFILE_FOLDER', 'profiling.dir', 'path', 'profiles', 'FLASK_PROFILE_DIR'),
+    Setting('PROFILE_MAX_FILES', 'profiling.max_files', 'int', 100,
+            'FLASK_PROFILE_MAX_FILES', reloadable=True, minimum=1),
+    Setting('PROFILE_SAMPLE_RATE', 'profiling.sample_rate', 'float', 0.0,
+            'FLASK_PROFILE_SAMPLE_RATE', reloadable=True, minimum=0),
+    Setting('PROFILE_SLOWEST', 'profiling.slowest', 'int', 5,
+            'FLASK_PROFILE_SLOWEST', reloadable=True, minimum=1),
+
+    # Logging
+    Setting('LOG_LEVEL', 'logging.level', 'str', 'INFO', 'FLASK_LOG_LEVEL', reloadable=True, choices=LOG_LEVELS),
+    Setting('LOG_FORMAT', 'logging.format', 'str', '%(asctime)s - %(name)s - %(levelname)s - %(message)s'),
+    Setting('LOG_JSON', 'logging.json', 'bool', False, 'FLASK_LOG_JSON'),
+    Setting('LOG_FILE', 'logging.file', 'optional_path', None, 'FLASK_LOG_FILE'),
+    Setting('LOG_QUEUE_SIZE', 'logging.queue_size', 'int', 10000, 'FLASK_LOG_QUEUE_SIZE', minimum=1),
+    Setting('LOG_DEBUG_SAMPLE_RATE', 'logging.debug_sample_rate', 'float', 1.0,
+            'FLASK_LOG_DEBUG_SAMPLE_RATE', reloadable=True, minimum=0),
+    Setting('LOG_ACCESS', 'logging.access', 'bool', False, 'FLASK_LOG_ACCESS', reloadable=True),
+)
+
+# Top-level keys of config.json that are documented but not settings
+IGNORED_KEYS = {'$schema', 'comment'}
+
+
+def config_path(environ=None):
+    """
+    Locate the config file.
+
+    Returns:
+        str: FLASK_CONFIG, else config.json next to the application if it
+            exists, else None
+    """
+    environ = os.environ if environ is None else environ
+    if environ.get('FLASK_CONFIG'):
+        return environ['FLASK_CONFIG']
+    path = os.path.join(BASE_DIR, 'config.json')
+    return path if os.path.exists(path) else None
+
+
+def _lookup(document, path):
+    """Return the value at a dotted path, or raise KeyError."""
+    value = document
+    for part in path.split('.'):
+        if not isinstance(value, dict):
+            raise KeyError(path)
+        value = value[part]
+    return value
+
+
+def _unknown_keys(document):
+    """Yield dotted paths in a config document that no setting uses."""
+    known = {setting.path for setting in SETTINGS}
+    sections = {path.split('.')[0] for path in known if '.' in path}
+    for key, value in document.items():
+        if key in IGNORED_KEYS or key in known:
+            continue
+        if key in sections and isinstance(value, dict):
+            for name in value:
+                if f'{key}.{name}' not in known:
+                    yield f'{key}.{name}'
+        else:
+            yield key
+
+
+def load(path=None, environ=None):
+    """
+    Load the configuration.
+
+    Args:
+        path: Config file (None = no file, only defaults and environment)
+        environ: Environment mapping (default: os.environ)
+
+    Returns:
+        dict: Maps Flask config keys to validated values
+
+    Raises:
+        ConfigError: If the file cannot be parsed or a value is invalid
+    """
+    environ = os.environ if environ is None else environ
+    document = {}
+    if path is not None:
+        try:
+            with open(path) as f:
+                document = json.load(f)
+        except json.JSONDecodeError as ex:
+            raise ConfigError(f"{path}: invalid JSON: {ex}")
+        if not isinstance(document, dict):
+            raise ConfigError(f"{path}: expected a JSON object")
+        for key in _unknown_keys(document):
+            logger.warning("%s: unknown setting %s", path, key)
+
+    values = {}
+    errors = []
+    for setting in SETTINGS:
+        source = setting.path
+        try:
+            value = _lookup(document, setting.path)
+        except KeyError:
+            value = setting.default
+        if setting.env and environ.get(setting.env) is not None:
+            source = setting.env
+            try:
+                value = setting.from_env(environ[setting.env])
+            except ValueError:
+                errors.append(f"{source}: invalid value {environ[setting.env]!r}")
+                continue
+        try:
+            values[setting.key] = setting.validate(value)
+        except ValueError as ex:
+            errors.append(f"{source}: {ex}")
+    if errors:
+        raise ConfigError("Invalid configuration:\n  " + "\n  ".join(errors))
+    return values
+
+
+class ConfigReloader:
+    """
+    Applies changed reloadable settings to a running application.
+
+    Settings that are not reloadable keep their value until the server is
+    restarted; a change to them is only logged.
+    """
+
+    def __init__(self, config, path, environ=None, pinned=(), interval=2.0):
+        """
+        Args:
+            config: Flask config to update
+            path: Config file (None = environment only)
+            environ: Environment mapping (default: os.environ)
+            pinned: Keys set explicitly by the caller, never reloaded
+            interval: Seconds between file change checks (0 = off)
+        """
+        self.config = config
+        self.path = path
+        self.environ = environ
+        self.pinned = set(pinned)
+        self.interval = interval
+        self.reloads = 0
+        self.last_error = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stamp = self._file_stamp()
+
+    def add_listener(self, callback):
+        """Call callback(changed) after each reload that changed settings."""
+        self._listeners.append(callback)
+
+    def _file_stamp(self):
+        """Identify the current file contents by inode, size and mtime."""
+        if self.path is None:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def reload(self):
+        """
+        Load the configuration again and apply reloadable changes.
+
+        An invalid file is rejected as a whole and the running values kept.
+
+        Returns:
+            dict: Changed settings, or None if the file was invalid
+        """
+        with self._lock:
+            self._stamp = self._file_stamp()
+            try:
+                values = load(self.path, self.environ)
+            except (ConfigError, OSError) as ex:
+                self.last_error = str(ex)
+                logger.error("Config reload failed, keeping current settings: %s", ex)
+                return None
+            self.last_error = None
+
+            changed = {}
+            restart = []
+            for setting in SETTINGS:
+                key = setting.key
+                if key in self.pinned or values[key] == self.config.get(key):
+                    continue
+                if setting.reloadable:
+                    changed[key] = values[key]
+                else:
+                    restart.append(setting.path)
+            self.config.update(changed)
+            self.reloads += 1
+
+        if changed:
+            logger.info("Config reloaded: %s", ', '.join(f'{key}={value!r}' for key, value in changed.items()))
+        if restart:
+            logger.warning("Changed settings need a restart: %s", ', '.join(restart))
+        for callback in self._listeners:
+            try:
+                callback(changed)
+            except Exception as ex:
+                logger.error("Config reload listener failed: %s", ex)
+        return changed
+
+    def start(self):
+        """Watch the file for changes and reload on SIGHUP (main thread only)."""
+        if self.path is not None and self.interval > 0:
+            threading.Thread(target=self._watch, name='config-watch', daemon=True).start()
+        if (threading.current_thread() is threading.main_thread()
+                and signal.getsignal(signal.SIGHUP) in (signal.SIG_DFL, None)):
+            # Reload outside the signal handler so it never runs while the
+            # interrupted code holds a lock (e.g. of the logging module)
+            signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(target=self.reload).start())
+
+    def _watch(self):
+        """Poll the file stamp and reload when it changes."""
+        while True:
+            time.sleep(self.interval)
+            if self._file_stamp() != self._stamp:
+                self.reload()
+
+    def status(self):
+        """Describe the config source for /health."""
+        return {'path': self.path, 'reloads': self.reloads, 'error': self.last_error}
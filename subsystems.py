@@ -0,0 +1,130 @@
+"""
+Subsystems Module
+Registry that initializes the server's subsystems lazily on first use
+"""
+
+import importlib.util
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def module_available(name):
+    """
+    Check whether an optional dependency is installed without importing it.
+
+    Args:
+        name: Top-level module name (e.g. 'evdev')
+
+    Returns:
+        bool
+    """
+    return importlib.util.find_spec(name) is not None
+
+
+class Registry:
+    """
+    Named, lazily created process-wide singletons.
+
+    A subsystem is created by its factory on first get(). A factory that
+    fails is not retried; its error is reported by status(). After fork the
+    child starts with no instances, so devices and threads are recreated in
+    the process that uses them instead of being shared with the parent.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._factories = {}  # Maps names to (factory, requires)
+        self._instances = {}
+        self._errors = {}
+        self._init_seconds = {}
+        # Instances inherited over fork; kept referenced so their finalizers
+        # never run in the child (e.g. closing the parent's uinput device)
+        self._inherited = []
+        self._lock = threading.RLock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def register(self, name, factory, requires=()):
+        """
+        Register a subsystem factory, replacing any previous registration.
+
+        Args:
+            name: Subsystem name
+            factory: Callable returning the instance (or raising)
+            requires: Optional modules that must be installed
+        """
+        with self._lock:
+            self._factories[name] = (factory, tuple(requires))
+            self._errors.pop(name, None)
+            if name in self._instances:
+                self._inherited.append(self._instances.pop(name))
+
+    def available(self, name):
+        """True if a subsystem is registered and its dependencies are installed."""
+        entry = self._factories.get(name)
+        return entry is not None and all(module_available(module) for module in entry[1])
+
+    def get(self, name):
+        """
+        Get a subsystem, creating it on first use.
+
+        Args:
+            name: Subsystem name
+
+        Returns:
+            The instance, or None if it is unavailable or failed to start
+        """
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if name in self._instances:
+                return self._instances[name]
+            if name in self._errors or not self.available(name):
+                return None
+            factory = self._factories[name][0]
+            started = time.perf_counter()
+            try:
+                instance = factory()
+            except Exception as ex:
+                self._errors[name] = str(ex)
+                logger.error("Failed to initialize %s: %s", name, ex)
+                return None
+            self._init_seconds[name] = time.perf_counter() - started
+            self._instances[name] = instance
+            logger.info("Initialized %s in %.1f ms", name, self._init_seconds[name] * 1000)
+            return instance
+
+    def peek(self, name):
+        """Return a subsystem only if it has already been created."""
+        return self._instances.get(name)
+
+    def status(self):
+        """
+        Describe all registered subsystems.
+
+        Returns:
+            dict: Maps names to {available, initialized, init_ms, error}
+        """
+        with self._lock:
+            return {
+                name: {
+                    'available': self.available(name),
+                    'initialized': name in self._instances,
+                    'init_ms': round(self._init_seconds[name] * 1000, 1) if name in self._init_seconds else None,
+                    'error': self._errors.get(name)
+                }
+                for name in self._factories
+            }
+
+    def _after_fork(self):
+        """Drop instances inherited from the parent process."""
+        self._lock = threading.RLock()
+        self._inherited.extend(self._instances.values())
+        self._instances = {}
+        self._errors = {}
+        self._init_seconds = {}
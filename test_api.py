@@ -5,6 +5,7 @@ Simple test script to verify Flask REST API functionality
 
 import requests
 import hashlib
+import json
 import os
 import sys
 import time
@@ -18,8 +19,18 @@ def test_health():
     print(f"Status: {response.status_code}")
     print(f"Response: {response.json()}")
     assert response.status_code == 200
+    assert response.json()['config']['error'] is None
     print("✓ Health check passed\n")
 
+def test_request_id():
+    """Test request IDs in responses"""
+    print("Testing request IDs...")
+    response = requests.get(f"{API_URL}/health", headers={"X-Request-ID": "test-request-1"})
+    assert response.headers['X-Request-ID'] == 'test-request-1'
+    response = requests.get(f"{API_URL}/health", headers={"X-Request-ID": "not valid!"})
+    assert response.headers['X-Request-ID'] not in ('', 'not valid!')
+    print("✓ Request IDs passed\n")
+
 def test_api_info():
     """Test root endpoint"""
     print("Testing API info endpoint...")
@@ -91,6 +102,55 @@ def test_file_download(filename):
     else:
         print(f"Download failed: {response.json()}\n")
 
+def test_file_lookup(filename):
+    """Test indexed lookup by hash and by name prefix"""
+    print(f"Testing file lookup for {filename}...")
+    file_hash = hashlib.sha256(b"This is a test file for Flask REST API").hexdigest()
+    response = requests.get(f"{API_URL}/files/by-hash/{file_hash}")
+    print(f"Status: {response.status_code}")
+    result = response.json()
+    print(f"Response: {result}")
+    assert response.status_code == 200
+    assert filename in [f['filename'] for f in result['files']]
+    
+    response = requests.get(f"{API_URL}/files/search", params={'prefix': filename[:4], 'limit': 1000})
+    result = response.json()
+    assert response.status_code == 200
+    assert filename in [f['filename'] for f in result['files']]
+    
+    response = requests.get(f"{API_URL}/files/by-hash/{'0' * 64}")
+    assert response.status_code == 404
+    response = requests.get(f"{API_URL}/files/search", params={'min_size': 'big'})
+    assert response.status_code == 400
+    print("✓ File lookup passed\n")
+
+def test_client_sdk():
+    """Test streaming upload and parallel ranged download with api_client"""
+    print("Testing client SDK...")
+    from api_client import Client
+    
+    test_filename = "test_sdk_upload.bin"
+    content = os.urandom(300 * 1024)
+    with open(test_filename, 'wb') as f:
+        f.write(content)
+    
+    with Client(API_URL, chunk_size=64 * 1024, workers=4) as client:
+        result = client.upload(test_filename)
+        print(f"Upload: {result}")
+        assert result.hash == hashlib.sha256(content).hexdigest()
+        assert result.hash_verified == True
+        
+        downloaded = client.download(result.filename, "test_sdk_download.bin")
+        print(f"Download: {downloaded}")
+        assert downloaded.ranges == 5
+        assert downloaded.hash_verified == True
+    
+    with open("test_sdk_download.bin", 'rb') as f:
+        assert f.read() == content
+    os.remove(test_filename)
+    os.remove("test_sdk_download.bin")
+    print("✓ Client SDK passed\n")
+
 def test_keyboard_emulation():
     """Test keyboard emulation (if available)"""
     print("Testing keyboard emulation...")
@@ -105,9 +165,313 @@ def test_keyboard_emulation():
     if response.status_code == 503:
         print("⚠ Keyboard emulation not available (evdev not installed or no permissions)")
     else:
-        assert response.status_code == 200
+        assert response.status_code == 202
+        job_id = result['job_id']
+        
+        # Wait for the queued job to finish
+        for _ in range(50):
+            result = requests.get(f"{API_URL}/keyboard/jobs/{job_id}").json()
+            if result['status'] not in ('queued', 'running'):
+                break
+            time.sleep(0.1)
+        print(f"Job: {result}")
+        assert result['status'] == 'completed'
+        assert result['chars_sent'] == 4
+        
+        response = requests.get(f"{API_URL}/keyboard/devices")
+        assert result['device'] in [device['name'] for device in response.json()['devices']]
+        
+        response = requests.post(f"{API_URL}/keyboard", json={"text": "x", "wait": True, "timeout": "5"})
+        assert response.status_code == 400
         print("✓ Keyboard emulation passed\n")
 
+def test_keyboard_cancel():
+    """Test that cancelling a job mid-way leaves no key held (if available)"""
+    print("Testing keyboard job cancel...")
+    
+    # Shift stays down across the capitals, so the cancel lands while it is held
+    response = requests.post(f"{API_URL}/keyboard", json={"text": "ABCDEFGH", "delay": 0.2})
+    if response.status_code == 503:
+        print("⚠ Keyboard emulation not available (evdev not installed or no permissions)\n")
+        return
+    assert response.status_code == 202
+    job_id = response.json()['job_id']
+    time.sleep(0.3)
+    requests.delete(f"{API_URL}/keyboard/jobs/{job_id}")
+    for _ in range(50):
+        result = requests.get(f"{API_URL}/keyboard/jobs/{job_id}").json()
+        if result['status'] not in ('queued', 'running'):
+            break
+        time.sleep(0.1)
+    print(f"Job: {result}")
+    assert result['status'] == 'cancelled'
+    
+    # Read the key state of the virtual devices where this host can see them
+    try:
+        import evdev
+        devices = [evdev.InputDevice(path) for path in evdev.list_devices()]
+    except (ImportError, OSError):
+        devices = []
+    for device in devices:
+        if device.name == 'py-evdev-uinput' or device.name.startswith('virtual-keyboard-'):
+            assert device.active_keys() == [], f"{device.name} has keys held: {device.active_keys()}"
+    print("✓ Keyboard job cancel passed\n")
+
+def test_keyboard_macro():
+    """Test stored keyboard macros (if available)"""
+    print("Testing keyboard macros...")
+    
+    source = 'repeat 2 { type "{word}" }\nwait 10ms\nkey ctrl+a'
+    response = requests.put(f"{API_URL}/keyboard/macro/test_macro", json={"source": source})
+    print(f"Status: {response.status_code}")
+    
+    if response.status_code == 503:
+        print("⚠ Keyboard emulation not available (evdev not installed or no permissions)\n")
+        return
+    
+    assert response.status_code in (200, 201)
+    assert response.json()['parameters'] == ['word']
+    
+    # Syntax errors are reported with their line
+    response = requests.put(f"{API_URL}/keyboard/macro/bad_macro", json={"source": "type \"x\"\nkey nosuchkey"})
+    assert response.status_code == 400
+    assert response.json()['line'] == 2
+    
+    response = requests.post(f"{API_URL}/keyboard/macro/test_macro",
+                             json={"params": {"word": "ab"}, "wait": True, "timeout": 10})
+    result = response.json()
+    print(f"Response: {result}")
+    assert response.status_code == 200
+    assert result['units_sent'] == result['units_total'] == 5
+    
+    # {{ and }} type literal braces, with and without placeholders
+    for name, source in (("brace_macro", 'type "{{}}"'), ("brace_template", 'type "{{{word}}}"')):
+        response = requests.put(f"{API_URL}/keyboard/macro/{name}", json={"source": source})
+        assert response.status_code in (200, 201)
+        response = requests.post(f"{API_URL}/keyboard/macro/{name}",
+                                 json={"params": {"word": "ab"}, "wait": True, "timeout": 10})
+        assert response.status_code == 200
+        assert response.json()['units_sent'] == (2 if name == "brace_macro" else 4)
+        requests.delete(f"{API_URL}/keyboard/macro/{name}")
+    
+    response = requests.delete(f"{API_URL}/keyboard/macro/test_macro")
+    assert response.status_code == 200
+    print("✓ Keyboard macros passed\n")
+
+def test_process_output():
+    """Test captured process output (if available)"""
+    print("Testing process output capture...")
+    
+    data = {
+        "command": ["echo", "captured output"],
+        "check_running": False,
+        "capture_output": "memory"
+    }
+    response = requests.post(f"{API_URL}/process/start", json=data)
+    print(f"Status: {response.status_code}")
+    
+    if response.status_code == 503:
+        print("⚠ Process management not available (psutil not installed)\n")
+        return
+    
+    assert response.status_code == 200
+    time.sleep(0.5)
+    
+    response = requests.get(f"{API_URL}/process/output/echo")
+    result = response.json()
+    print(f"Response: {result}")
+    assert response.status_code == 200
+    assert result['lines'][0]['text'] == 'captured output'
+    
+    # Resume after the last line - nothing new
+    response = requests.get(f"{API_URL}/process/output/echo", params={'offset': result['next_offset']})
+    assert response.json()['lines'] == []
+    print("✓ Process output capture passed\n")
+
+def test_process_scheduling():
+    """Test scheduling options for started processes (if available)"""
+    print("Testing process scheduling options...")
+    
+    data = {
+        "command": ["sleep", "5"],
+        "check_running": False,
+        "scheduling": {"cpu_affinity": [0], "nice": 5, "rlimits": {"nofile": 256}}
+    }
+    response = requests.post(f"{API_URL}/process/start", json=data)
+    print(f"Status: {response.status_code}")
+    
+    if response.status_code == 503:
+        print("⚠ Process management not available (psutil not installed)\n")
+        return
+    
+    result = response.json()
+    print(f"Response: {result}")
+    assert response.status_code == 200
+    assert result['scheduling']['cpu_affinity'] == [0]
+    requests.post(f"{API_URL}/process/stop", json={"process": "sleep"})
+    
+    # Invalid options are rejected
+    data['scheduling'] = {"nice": 99}
+    response = requests.post(f"{API_URL}/process/start", json=data)
+    assert response.status_code == 400
+    data['scheduling'] = {"rlimits": {"nofile": ["a", "b"]}}
+    response = requests.post(f"{API_URL}/process/start", json=data)
+    assert response.status_code == 400
+    assert 'nofile' in response.json()['error']
+    print("✓ Process scheduling passed\n")
+
+def test_process_tree():
+    """Test process tree aggregation (if available)"""
+    print("Testing process tree status...")
+    
+    data = {"command": ["sh", "-c", "sleep 5 & sleep 5"], "check_running": False}
+    response = requests.post(f"{API_URL}/process/start", json=data)
+    
+    if response.status_code == 503:
+        print("⚠ Process management not available (psutil not installed)\n")
+        return
+    
+    time.sleep(0.3)
+    response = requests.get(f"{API_URL}/process/status/sh", params={'tree': 'true'})
+    print(f"Status: {response.status_code}")
+    result = response.json()
+    print(f"Response: {result}")
+    assert response.status_code == 200
+    assert result['tree']['process_count'] == 3
+    assert result['tree']['memory_mb'] >= result['memory_mb']
+    requests.post(f"{API_URL}/process/stop", json={"process": "sh", "scope": "session"})
+    print("✓ Process tree status passed\n")
+
+def test_process_events():
+    """Test process event stream (if available)"""
+    print("Testing process event stream...")
+    
+    response = requests.get(f"{API_URL}/process/events", stream=True, timeout=10)
+    print(f"Status: {response.status_code}")
+    
+    if response.status_code == 503:
+        print("⚠ Process management not available (psutil not installed)\n")
+        return
+    
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/event-stream')
+    
+    data = {"command": ["sh", "-c", "exit 3"], "check_running": False}
+    requests.post(f"{API_URL}/process/start", json=data)
+    
+    events = []
+    lines = response.iter_lines(decode_unicode=True)
+    for line in lines:
+        if line.startswith('event: '):
+            events.append(line[len('event: '):])
+        if 'exited' in events:
+            break
+    
+    # A stop reports the signal, and no 'exited' for the process it stops
+    data = {"command": ["sleep", "30"], "check_running": False}
+    pid = requests.post(f"{API_URL}/process/start", json=data).json()['pid']
+    requests.post(f"{API_URL}/process/stop", json={"process": "sleep"})
+    for line in lines:
+        if line.startswith('event: '):
+            events.append(line[len('event: '):])
+        elif line.startswith('data: ') and events[-1] == 'stopped':
+            stopped = json.loads(line[len('data: '):])
+            if stopped['pid'] == pid:
+                break
+    response.close()
+    print(f"Events: {events}")
+    assert events[:2] == ['started', 'exited']
+    assert events[2:] == ['started', 'stopped']
+    assert stopped['exit_code'] == -15
+    print("✓ Process event stream passed\n")
+
+def test_process_batch():
+    """Test batch process operations (if available)"""
+    print("Testing process batch...")
+    
+    data = {"operations": [
+        {"action": "start", "command": ["sleep", "30"], "check_running": False},
+        {"action": "stop", "process": "sleep", "scope": "group"},
+        {"action": "unknown"}
+    ]}
+    response = requests.post(f"{API_URL}/process/batch", json=data)
+    print(f"Status: {response.status_code}")
+    
+    if response.status_code == 503:
+        print("⚠ Process management not available (psutil not installed)\n")
+        return
+    
+    result = response.json()
+    print(f"Response: {result}")
+    assert response.status_code == 200
+    assert result['count'] == 3
+    assert result['results'][0]['result']['status'] == 'started'
+    assert result['results'][1]['result']['status'] == 'stopped'
+    assert result['results'][2]['ok'] == False
+    print("✓ Process batch passed\n")
+
+def test_metrics():
+    """Test Prometheus metrics endpoint"""
+    print("Testing metrics endpoint...")
+    response = requests.get(f"{API_URL}/metrics")
+    print(f"Status: {response.status_code}")
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain')
+    text = response.text
+    assert 'flask_http_requests_total{method="POST",route="/upload",status="201"}' in text
+    assert 'flask_transfer_bytes_total{direction="upload"}' in text
+    assert 'flask_hash_duration_seconds_bucket{algorithm="sha256",le="+Inf"}' in text
+    print("✓ Metrics passed\n")
+
+def test_profiling():
+    """Test on-demand request profiling (if enabled)"""
+    print("Testing request profiling...")
+    response = requests.get(f"{API_URL}/files", params={"profile": "1"})
+    name = response.headers.get('X-Profile-File')
+    if name is None:
+        print("⚠ Profiling not enabled (FLASK_PROFILING=true)\n")
+        return
+    print(f"Profile: {name}")
+    
+    response = requests.get(f"{API_URL}/profiles")
+    assert response.status_code == 200
+    assert name in [entry['file'] for entry in response.json()['profiles']]
+    response = requests.get(f"{API_URL}/profiles/{name}", params={"format": "text"})
+    assert response.status_code == 200
+    assert 'list_files' in response.text
+    print("✓ Request profiling passed\n")
+
+def test_response_cache():
+    """Test cached responses and ETags of /files"""
+    print("Testing response cache...")
+    response = requests.get(f"{API_URL}/files")
+    etag = response.headers.get('ETag')
+    if etag is None:
+        print("⚠ Response cache not enabled\n")
+        return
+    response = requests.get(f"{API_URL}/files")
+    print(f"X-Cache: {response.headers['X-Cache']}")
+    assert response.headers['X-Cache'] == 'HIT'
+    assert response.headers['ETag'] == etag
+    response = requests.get(f"{API_URL}/files", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    print("✓ Response cache passed\n")
+
+def test_rate_limit():
+    """Test admission control on /process/batch (if enabled)"""
+    print("Testing rate limit...")
+    for _ in range(10):
+        response = requests.post(f"{API_URL}/process/batch", json={"operations": []})
+        if response.status_code == 429:
+            break
+    else:
+        print("⚠ Rate limit not enabled for /process/batch\n")
+        return
+    print(f"Response: {response.json()}")
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.json()['retry_after'] >= 1
+    print("✓ Rate limit passed\n")
+
 def main():
     """Run all tests"""
     print("=" * 60)
@@ -126,11 +490,25 @@ def main():
         
         # Run tests
         test_health()
+        test_request_id()
         test_api_info()
         uploaded_filename = test_file_upload()
         test_file_list()
         test_file_download(uploaded_filename)
+        test_file_lookup(uploaded_filename)
+        test_client_sdk()
         test_keyboard_emulation()
+        test_keyboard_cancel()
+        test_keyboard_macro()
+        test_process_output()
+        test_process_scheduling()
+        test_process_tree()
+        test_process_events()
+        test_process_batch()
+        test_metrics()
+        test_profiling()
+        test_response_cache()
+        test_rate_limit()
         
         print("=" * 60)
         print("All tests completed successfully! ✓")
@@ -0,0 +1,145 @@
+"""
+Unix Socket Adapter
+requests transport adapter for the API listening on a Unix domain socket
+
+URLs use the http+unix scheme with the percent-encoded socket path as the
+host, e.g. http+unix://%2Frun%2Fflask-api%2Fapi.sock/health. api_url()
+picks the local socket when a server listens on it and TCP otherwise, so
+clients on the same board skip the TCP/IP stack without configuration.
+"""
+
+import os
+import socket
+import threading
+from urllib.parse import quote, unquote, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool
+
+SCHEME = 'http+unix'
+
+# Socket of the systemd unit (flask-api.service)
+DEFAULT_SOCKET = '/run/flask-api/api.sock'
+
+DEFAULT_TCP_URL = 'http://localhost:5000'
+
+
+class UnixHTTPConnection(HTTPConnection):
+    """urllib3 connection over a Unix domain socket."""
+
+    def __init__(self, socket_path, **kwargs):
+        super().__init__('localhost', **kwargs)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if isinstance(self.timeout, (int, float)):
+            sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class UnixHTTPConnectionPool(HTTPConnectionPool):
+    """Keep-alive connection pool for one socket path."""
+
+    def __init__(self, socket_path, **kwargs):
+        super().__init__('localhost', **kwargs)
+        self.socket_path = socket_path
+
+    def _new_conn(self):
+        self.num_connections += 1
+        return UnixHTTPConnection(self.socket_path, timeout=self.timeout.connect_timeout)
+
+
+class UnixAdapter(HTTPAdapter):
+    """
+    requests adapter for http+unix:// URLs, with one pool per socket.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+
+    def _pool(self, url):
+        socket_path = unquote(urlsplit(url).netloc)
+        with self._pools_lock:
+            pool = self._pools.get(socket_path)
+            if pool is None:
+                pool = self._pools[socket_path] = UnixHTTPConnectionPool(
+                    socket_path, maxsize=self._pool_maxsize, block=self._pool_block
+                )
+            return pool
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        return self._pool(request.url)
+
+    def get_connection(self, url, proxies=None):
+        # requests < 2.32
+        return self._pool(url)
+
+    def request_url(self, request, proxies):
+        return request.path_url
+
+    def add_headers(self, request, **kwargs):
+        # The socket path is not a meaningful Host
+        request.headers['Host'] = 'localhost'
+
+    def close(self):
+        super().close()
+        with self._pools_lock:
+            for pool in self._pools.values():
+                pool.close()
+            self._pools.clear()
+
+
+def unix_url(socket_path):
+    """Base URL of an API listening on a Unix socket."""
+    return f"{SCHEME}://{quote(socket_path, safe='')}"
+
+
+def socket_reachable(socket_path, timeout=0.2):
+    """True if a server accepts connections on a Unix socket."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def api_url(default=DEFAULT_TCP_URL):
+    """
+    Base URL of the API.
+
+    FLASK_API_URL wins; otherwise the Unix socket (FLASK_UNIX_SOCKET or
+    DEFAULT_SOCKET) is used if a server listens on it, else default.
+    """
+    url = os.environ.get('FLASK_API_URL')
+    if url:
+        return url
+    socket_path = os.environ.get('FLASK_UNIX_SOCKET') or DEFAULT_SOCKET
+    if socket_reachable(socket_path):
+        return unix_url(socket_path)
+    return default
+
+
+def session(**adapter_options):
+    """
+    requests.Session that also handles http+unix:// URLs.
+
+    Args:
+        **adapter_options: Passed to the adapters of all schemes, e.g.
+            pool_maxsize or max_retries
+    """
+    result = requests.Session()
+    if adapter_options:
+        for prefix in ('http://', 'https://'):
+            result.mount(prefix, HTTPAdapter(**adapter_options))
+    result.mount(f"{SCHEME}://", UnixAdapter(**adapter_options))
+    return result
@@ -0,0 +1,156 @@
+"""
+Worker State Module
+Keeps stateful subsystems in one worker process when serving with several
+
+The keyboard devices and the process registry live in memory and cannot be
+shared between worker processes. One worker wins an exclusive file lock
+and becomes the state owner: it initializes the subsystems and serves the
+application on an internal Unix socket. The other workers forward
+requests for stateful routes to that socket.
+"""
+
+import fcntl
+import http.client
+import logging
+import os
+import socket
+import threading
+
+from log_pipeline import REQUEST_ID_ENVIRON_KEY
+
+logger = logging.getLogger(__name__)
+
+# Route prefixes served by the state owner
+STATEFUL_PREFIXES = ('/keyboard', '/process')
+
+# Hop-by-hop headers that must not be forwarded (RFC 7230, section 6.1)
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'transfer-encoding', 'upgrade',
+}
+
+# WSGI environ key marking requests that arrived on the internal socket
+INTERNAL_ENVIRON_KEY = 'worker_state.internal'
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix domain socket."""
+
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class StateOwner:
+    """
+    Elects the state-owning worker and forwards requests to it.
+    """
+
+    def __init__(self, socket_path, timeout=300):
+        """
+        Args:
+            socket_path: Internal socket of the owner; the lock file is
+                the same path with a '.lock' suffix
+            timeout: Socket timeout for forwarded requests in seconds
+        """
+        self.socket_path = socket_path
+        self.lock_path = f"{socket_path}.lock"
+        self.timeout = timeout
+        self.is_owner = False
+        self._lock_file = None
+        self._server = None
+
+    def acquire(self):
+        """
+        Try to become the state owner.
+
+        The lock is held for the lifetime of the process, so a restarted
+        worker takes over when the owner dies.
+
+        Returns:
+            bool: True if this process is the owner
+        """
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        self.is_owner = True
+        logger.info("Worker %s owns keyboard and process state", os.getpid())
+        return True
+
+    def serve(self, app):
+        """
+        Serve an application on the internal socket (owner only).
+
+        Args:
+            app: WSGI application
+        """
+        from werkzeug.serving import make_server
+
+        def internal_app(environ, start_response):
+            # Forwarded requests were already admitted by the forwarding worker
+            environ[INTERNAL_ENVIRON_KEY] = True
+            return app(environ, start_response)
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._server = make_server(f"unix://{self.socket_path}", 0, internal_app, threaded=True)
+        os.chmod(self.socket_path, 0o600)
+        threading.Thread(target=self._server.serve_forever, name='state-owner', daemon=True).start()
+
+    @staticmethod
+    def is_stateful(path):
+        """True if a request path must be handled by the owner."""
+        return any(path == prefix or path.startswith(prefix + '/') for prefix in STATEFUL_PREFIXES)
+
+    def forward(self, request):
+        """
+        Forward a request to the owner and stream back its response.
+
+        Args:
+            request: Flask request
+
+        Returns:
+            flask.Response
+        """
+        from flask import Response, jsonify
+
+        headers = {key: value for key, value in request.headers.items()
+                   if key.lower() not in HOP_BY_HOP_HEADERS and key.lower() != 'x-request-id'}
+        # The owner logs the request under the same ID
+        headers['X-Request-ID'] = request.environ[REQUEST_ID_ENVIRON_KEY]
+        connection = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        try:
+            connection.request(request.method, request.full_path if request.query_string else request.path,
+                               body=request.get_data(), headers=headers)
+            upstream = connection.getresponse()
+        except OSError as ex:
+            connection.close()
+            logger.error("State owner unavailable: %s", ex)
+            response = jsonify({'error': 'State owner unavailable', 'message': str(ex)})
+            response.status_code = 503
+            response.headers['Retry-After'] = '1'
+            return response
+
+        def stream():
+            try:
+                while True:
+                    chunk = upstream.read1(65536)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                connection.close()
+
+        response_headers = [(key, value) for key, value in upstream.getheaders()
+                            if key.lower() not in HOP_BY_HOP_HEADERS and key.lower() != 'x-request-id']
+        return Response(stream(), status=upstream.status, headers=response_headers, direct_passthrough=True)